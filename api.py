@@ -1,20 +1,38 @@
-from flask import Flask, request, jsonify, render_template
+# Patch the standard library before anything else is imported: requests, twilio and the Google client
+# bind sockets, locks and queues at import time, and unpatched ones block every greenlet at once.
+import eventlet
+eventlet.monkey_patch()
+
+from flask import Flask, request, jsonify, render_template, g, got_request_exception
 import datetime
-import pytz
 import requests
 import hmac
 import hashlib
-from flask_socketio import SocketIO, emit
-from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse
+from flask_socketio import SocketIO, join_room, leave_room, emit
 import urllib.parse
 from flask_cors import CORS # Import CORS
-import eventlet
 import eventlet.wsgi
 import logging
-
-from google_calendar import find_free_slots, book_meeting, get_calendar_service_instance, update_appointment, delete_appointment
-from config import BLAND_AI_API_KEY, BLAND_AI_WEBHOOK_SECRET, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, BLAND_AI_INBOUND_NUMBER
+import time
+
+from google_calendar import find_free_slots, find_free_slots_batch, find_common_slots, book_meeting, is_slot_free, get_calendar_service_instance, bulk_update_appointments, delete_appointments, keep_calendar_watch, FreeBusyError
+from bland_client import build_call_data, get_bland_client
+from call_control import call_already_ended, get_call_controller, message_and_hangup_twiml
+from campaigns import CampaignDispatcher, numbers_from_csv, parse_call_overrides
+from webhook_queue import WebhookQueue, DUPLICATE, FULL
+from call_registry import create_call_registry
+from transcript_store import TranscriptStore
+from transcript_cache import TranscriptCache
+from call_store import create_call_store
+from phone_index import is_e164
+from event_cache import parse_event_span
+from slot_locks import create_slot_lock_table, is_reservation_id, REPLAY, IN_PROGRESS, MISMATCH
+from concurrency import run_concurrently
+from time_parsing import UTC, UnknownTimeZoneError, get_timezone, parse_datetimes
+from config import BLAND_AI_WEBHOOK_SECRET
+import config
+import metrics
+import profiling
 
 app = Flask(__name__)
 
@@ -28,19 +46,146 @@ origins = [
     # Add your ngrok URL if you're accessing backend from Next.js via ngrok, e.g., "https://your-unique-id.ngrok-free.app"
 ]
 
-socketio = SocketIO(app, cors_allowed_origins=origins) # Use defined origins for SocketIO
+# With several workers behind a load balancer, set SOCKETIO_MESSAGE_QUEUE (e.g. the Redis URL) so emits reach every worker's clients
+socketio = SocketIO(app, cors_allowed_origins=origins, message_queue=config.SOCKETIO_MESSAGE_QUEUE) # Use defined origins for SocketIO
 
 # Apply CORS middleware to Flask app.
 # Changed to a simpler global CORS application to debug recursion
 CORS(app, origins=origins)
 
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-# IST = pytz.timezone('Asia/Kolkata') # Keeping this as it's used in calendar logic
-# Removed active_calls global variable for debugging recursion
+# Bland AI call_id -> Twilio CallSid, numbers and status; in memory or shared through Redis (CALL_REGISTRY_BACKEND)
+active_calls = create_call_registry()
+# Transcript lines per call, fed by the webhook and pushed to each call's Socket.IO room
+transcripts = TranscriptStore()
+# Bland AI call details for /bland-ai/transcript: finished calls cached for good, live calls for TRANSCRIPT_CACHE_TTL_SECONDS
+transcript_cache = TranscriptCache(lambda call_id: get_bland_client().get_call(call_id), ttl=config.TRANSCRIPT_CACHE_TTL_SECONDS)
+# Local SQLite history of call events, transcripts and booking outcomes (writes are batched)
+call_store = create_call_store()
+socketio.start_background_task(call_store.run_flusher, socketio.sleep)
+
+
+def record_history(record, *args, **kwargs):
+    """Call a call_store.record_* method; the history is a log, so failing to write it must not fail the caller."""
+    try:
+        record(*args, **kwargs)
+    except Exception:
+        logging.exception(f"Failed to write call history ({record.__name__})")
+
+
+# Slots held for callers after /calendar/v3/freeBusy offers them, booking locks and Idempotency-Key responses
+slot_locks = create_slot_lock_table()
+# On-demand cProfile and stack-sampling profiles; inert unless PROFILING_TOKEN is set
+profiles, request_profiler, stack_sampler = profiling.create_profilers()
+# Calendar push notifications keep the availability grid current without polling Google
+if config.CALENDAR_WEBHOOK_URL:
+    socketio.start_background_task(
+        keep_calendar_watch, socketio.sleep,
+        config.CALENDAR_WEBHOOK_URL, config.CALENDAR_WEBHOOK_TOKEN, config.CALENDAR_WATCH_TTL_SECONDS
+    )
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by URL rule, not path, so /bland-ai/transcript/<call_id> stays one series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.http_request_duration.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+def record_unhandled_exception(sender, exception, **extra):
+    metrics.errors.inc(source='flask', type=type(exception).__name__)
+
+got_request_exception.connect(record_unhandled_exception, app)
+
+def profiling_authorized():
+    return profiling.authorized(request.headers.get('X-Profile-Token'))
+
+@app.before_request
+def start_request_profile():
+    if request.headers.get('X-Profile') != '1' and request.args.get('_profile') != '1':
+        return
+    if profiling_authorized():
+        g.profiler = request_profiler.start()
+        g.profile_started = time.perf_counter()
+
+@app.after_request
+def finish_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        profile = request_profiler.stop(profiler, f"{request.method} {route}", time.perf_counter() - g.profile_started)
+        response.headers['X-Profile-Id'] = profile.id
+        response.headers['X-Profile-Url'] = f"/admin/profiles/{profile.id}"
+    return response
+
+@app.teardown_request
+def abandon_request_profile(exception=None):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        request_profiler.abandon(profiler)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@app.route('/admin/profile/sample', methods=['POST'])
+def sample_profile():
+    """Sample every greenlet's stacks for ?seconds= (default 10) and return the stored profile's summary."""
+    if not profiling_authorized():
+        return jsonify({"error": "Not found"}), 404
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args['interval_ms']) if 'interval_ms' in request.args else None
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not 0 < seconds <= config.PROFILING_MAX_SECONDS:
+        return jsonify({"error": f"seconds must be between 0 and {config.PROFILING_MAX_SECONDS:g}"}), 400
+    if interval_ms is not None and not 1 <= interval_ms <= 1000:
+        return jsonify({"error": "interval_ms must be between 1 and 1000"}), 400
+    profile = stack_sampler.sample(seconds, interval_ms / 1000 if interval_ms else None)
+    if profile is None:
+        return jsonify({"error": "A sampling session is already running"}), 409
+    return jsonify(profile.summary()), 200
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not profiling_authorized():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": profiles.list()}), 200
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """?format=pstats (a .prof file) or text for request profiles, collapsed (flame graph input) for samples."""
+    profile = profiles.get(profile_id) if profiling_authorized() else None
+    if profile is None:
+        return jsonify({"error": "Not found"}), 404
+    file_format = request.args.get('format', 'pstats' if profile.kind == profiling.CPROFILE else 'collapsed')
+    if file_format not in profile.summary()['formats']:
+        return jsonify({"error": f"{profile.kind} profiles are available as {', '.join(profile.summary()['formats'])}"}), 400
+    if file_format == 'pstats':
+        return profile.pstats_bytes(), 200, {
+            'Content-Type': 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{profile_id}.prof"',
+        }
+    if file_format == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'ncalls'):
+            return jsonify({"error": "sort must be cumulative, tottime or ncalls"}), 400
+        return profile.text(sort), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    return profile.collapsed(), 200, {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'Content-Disposition': f'attachment; filename="{profile_id}.collapsed.txt"',
+    }
+
 def get_base_url():
     if request.headers.get('X-Forwarded-Proto'):
         return f"{request.headers['X-Forwarded-Proto']}://{request.headers['Host']}"
@@ -53,10 +198,25 @@ def inbound_calls():
 @app.route('/twilio/message_and_hangup', methods=['POST'])
 def twilio_message_and_hangup():
     message = request.args.get('message', 'we will issue a call back to your number soon.')
-    response_twiml = VoiceResponse()
-    response_twiml.say(message)
-    response_twiml.hangup()
-    return str(response_twiml), 200, {'Content-Type': 'text/xml'}
+    return message_and_hangup_twiml(message), 200, {'Content-Type': 'text/xml'}
+
+def message_and_hangup_url(message):
+    return f"{get_base_url()}/twilio/message_and_hangup?message={urllib.parse.quote(message)}"
+
+def hold_offered_slots(response, slots, reservation_id, tz):
+    """
+    Hold the offered slots for the caller and add the reservation to the response:
+    `reservation_id`, and `reserved_until` (when the holds lapse, in the caller's zone). Echoing
+    reservation_id is optional. A caller asking again with it swaps its earlier holds for these (or
+    drops them if nothing was found this time); booking with it refuses slots held for others.
+    """
+    if not slots:
+        if reservation_id:
+            slot_locks.release_offers(reservation_id)
+        return
+    reservation_id, expires_at = slot_locks.hold_offers(slots, reservation_id)
+    response["reservation_id"] = reservation_id
+    response["reserved_until"] = datetime.datetime.fromtimestamp(expires_at, tz).isoformat()
 
 @app.route('/calendar/v3/freeBusy', methods=['POST'])
 def get_free_busy_slots():
@@ -68,11 +228,13 @@ def get_free_busy_slots():
     time_max_str = data.get('timeMax')
     duration_minutes = data.get('meeting_duration', 30) # Default to 30 minutes if not provided
     time_zone_str = data.get('timeZone', 'Asia/Kolkata') # Default to Asia/Kolkata if not provided
+    calendar_ids = data.get('calendar_ids', ['primary']) # All of these calendars must be free for a slot to be offered
+    reservation_id = data.get('reservation_id') # From an earlier response: that offer is replaced, not treated as busy
 
     # Get the timezone object
     try:
-        requested_timezone = pytz.timezone(time_zone_str)
-    except pytz.UnknownTimeZoneError:
+        requested_timezone = get_timezone(time_zone_str)
+    except UnknownTimeZoneError:
         return jsonify({"error": f"Invalid timeZone: {time_zone_str}"}), 400
 
     if not time_min_str or not time_max_str:
@@ -80,96 +242,281 @@ def get_free_busy_slots():
 
     if not isinstance(duration_minutes, int) or duration_minutes <= 0:
         return jsonify({"error": "meeting_duration must be a positive integer"}), 400
-    # parsing logic to follow
-    try:
-        if time_min_str.endswith('Z'):
-            naive_start_dt = datetime.datetime.fromisoformat(time_min_str.replace('Z', ''))
-            start_dt_localized = requested_timezone.localize(naive_start_dt)
-        else:
-            start_dt_localized = datetime.datetime.fromisoformat(time_min_str)
-            if start_dt_localized.tzinfo is None:
-                start_dt_localized = requested_timezone.localize(start_dt_localized)
-            else:
-                start_dt_localized = start_dt_localized.astimezone(requested_timezone)
 
-        if time_max_str.endswith('Z'):
-            naive_end_dt = datetime.datetime.fromisoformat(time_max_str.replace('Z', ''))
-            end_dt_localized = requested_timezone.localize(naive_end_dt)
-        else:
-            end_dt_localized = datetime.datetime.fromisoformat(time_max_str)
-            if end_dt_localized.tzinfo is None:
-                end_dt_localized = requested_timezone.localize(end_dt_localized)
-            else:
-                end_dt_localized = end_dt_localized.astimezone(requested_timezone)
+    if not isinstance(calendar_ids, list) or not calendar_ids or not all(isinstance(c, str) and c for c in calendar_ids):
+        return jsonify({"error": "calendar_ids must be a non-empty list of calendar IDs"}), 400
 
-        
-        free_slots = find_free_slots(start_dt_localized, end_dt_localized, duration_minutes=duration_minutes)
+    if reservation_id is not None and not is_reservation_id(reservation_id):
+        return jsonify({"error": "reservation_id must be one returned by an earlier availability request"}), 400
+    try:
+        start_dt_localized, end_dt_localized = parse_datetimes(requested_timezone, time_min_str, time_max_str)
 
-        top_3_free_slots = free_slots[:3]
+        # Slots offered to other callers in the last SLOT_HOLD_TTL_SECONDS are not offered again
+        held = None
+        if 'primary' in calendar_ids:
+            held = slot_locks.held_intervals(start_dt_localized, end_dt_localized, reservation_id)
+        top_3_free_slots = find_free_slots(start_dt_localized, end_dt_localized, duration_minutes=duration_minutes, limit=3,
+                                           calendar_ids=calendar_ids, also_busy=held)
 
         formatted_slots = [
             {"start": slot_start.isoformat(), "end": slot_end.isoformat(), "timeZone": time_zone_str}
             for slot_start, slot_end in top_3_free_slots
         ]
-        return jsonify({"free_slots": formatted_slots}), 200
+        response = {"free_slots": formatted_slots}
+        # Pass reservation_id when booking one of these slots, or when asking again
+        hold_offered_slots(response, top_3_free_slots, reservation_id, requested_timezone)
+        return jsonify(response), 200
 
+    except FreeBusyError as e:
+        return jsonify({"error": f"Could not read availability: {e}"}), 400
     except ValueError as e:
         return jsonify({"error": f"Invalid date/time format: {e}"}), 400
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
-@app.route('/calendar/v3/events', methods=['POST'])
-def book_new_meeting():
+MAX_BATCH_QUERIES = 20
+
+@app.route('/calendar/v3/freeBusy/batch', methods=['POST'])
+def get_free_busy_slots_batch():
+    """
+    Several freeBusy questions (e.g. candidate days) in one request: `queries` is a list of
+    {timeMin, timeMax, meeting_duration, timeZone}. Busy times are fetched once for the span of
+    all of them, and the top 3 slots of each query come back in `results`, in query order. The
+    offered slots (the first SLOT_HOLD_MAX_PER_RESERVATION) are held under one reservation_id.
+    """
     data = request.json
     if not data:
         return jsonify({"error": "Invalid JSON payload"}), 400
 
-    start_time_str = data.get('start')
-    end_time_str = data.get('end')
-    summary = data.get('summary', 'Appointment') 
-    phone_number = data.get('phone_number') 
+    queries = data.get('queries')
+    calendar_ids = data.get('calendar_ids', ['primary'])
+    reservation_id = data.get('reservation_id')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+    if not isinstance(calendar_ids, list) or not calendar_ids or not all(isinstance(c, str) and c for c in calendar_ids):
+        return jsonify({"error": "calendar_ids must be a non-empty list of calendar IDs"}), 400
+    if reservation_id is not None and not is_reservation_id(reservation_id):
+        return jsonify({"error": "reservation_id must be one returned by an earlier availability request"}), 400
+
+    windows = []
+    for index, query in enumerate(queries):
+        if not isinstance(query, dict):
+            return jsonify({"error": f"queries[{index}] must be an object"}), 400
+        time_zone_str = query.get('timeZone', 'Asia/Kolkata')
+        duration_minutes = query.get('meeting_duration', 30)
+        try:
+            requested_timezone = get_timezone(time_zone_str)
+        except UnknownTimeZoneError:
+            return jsonify({"error": f"queries[{index}]: Invalid timeZone: {time_zone_str}"}), 400
+        if not query.get('timeMin') or not query.get('timeMax'):
+            return jsonify({"error": f"queries[{index}]: timeMin and timeMax are required"}), 400
+        if not isinstance(duration_minutes, int) or duration_minutes <= 0:
+            return jsonify({"error": f"queries[{index}]: meeting_duration must be a positive integer"}), 400
+        try:
+            start_dt_localized, end_dt_localized = parse_datetimes(requested_timezone, query['timeMin'], query['timeMax'])
+        except ValueError as e:
+            return jsonify({"error": f"queries[{index}]: Invalid date/time format: {e}"}), 400
+        windows.append((start_dt_localized, end_dt_localized, duration_minutes))
+
+    try:
+        held = None
+        if 'primary' in calendar_ids:
+            held = slot_locks.held_intervals(min(start for start, _, _ in windows), max(end for _, end, _ in windows), reservation_id)
+        slots_per_query = find_free_slots_batch(windows, limit=3, calendar_ids=calendar_ids, also_busy=held)
+
+        results = [
+            {"free_slots": [
+                {"start": slot_start.isoformat(), "end": slot_end.isoformat(), "timeZone": query.get('timeZone', 'Asia/Kolkata')}
+                for slot_start, slot_end in slots
+            ]}
+            for query, slots in zip(queries, slots_per_query)
+        ]
+        response = {"results": results}
+        offered = list(dict.fromkeys(slot for slots in slots_per_query for slot in slots))
+        hold_offered_slots(response, offered, reservation_id, windows[0][0].tzinfo)
+        return jsonify(response), 200
+
+    except FreeBusyError as e:
+        return jsonify({"error": f"Could not read availability: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
+
+MAX_COMMON_SLOTS = 50
+
+def _parse_preferred_windows(windows):
+    """[{"start": "HH:MM", "end": "HH:MM"}, ...] as (datetime.time, datetime.time) pairs; raises ValueError."""
+    if not isinstance(windows, list):
+        raise ValueError("preferred_windows must be a list")
+    parsed = []
+    for window in windows:
+        if not isinstance(window, dict):
+            raise ValueError("each preferred window needs 'start' and 'end'")
+        start, end = datetime.time.fromisoformat(window.get('start', '')), datetime.time.fromisoformat(window.get('end', ''))
+        if start >= end:
+            raise ValueError(f"preferred window {window['start']}-{window['end']} is empty")
+        parsed.append((start, end))
+    return parsed
+
+@app.route('/calendar/v3/availability', methods=['POST'])
+def get_common_availability():
+    """
+    Slots free across several calendars: all of `calendar_ids` (people who must attend) and one
+    calendar from each group in `any_of` (e.g. any of these rooms). Optional `preferred_windows`
+    ranks slots by how close they fall to those times of day instead of earliest first.
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    time_min_str = data.get('timeMin')
+    time_max_str = data.get('timeMax')
+    duration_minutes = data.get('meeting_duration', 30)
     time_zone_str = data.get('timeZone', 'Asia/Kolkata')
+    calendar_ids = data.get('calendar_ids', [])
+    any_of = data.get('any_of', [])
+    limit = data.get('limit', 3)
+    step_minutes = data.get('step_minutes')
+    reservation_id = data.get('reservation_id')
 
-    
     try:
-        requested_timezone = pytz.timezone(time_zone_str)
-    except pytz.UnknownTimeZoneError:
+        requested_timezone = get_timezone(time_zone_str)
+    except UnknownTimeZoneError:
         return jsonify({"error": f"Invalid timeZone: {time_zone_str}"}), 400
 
-    if not start_time_str or not end_time_str:
-        return jsonify({"error": "'start' and 'end' are required"}), 400
+    if not time_min_str or not time_max_str:
+        return jsonify({"error": "timeMin and timeMax are required"}), 400
+
+    if not isinstance(duration_minutes, int) or duration_minutes <= 0:
+        return jsonify({"error": "meeting_duration must be a positive integer"}), 400
+
+    if not isinstance(limit, int) or not 0 < limit <= MAX_COMMON_SLOTS:
+        return jsonify({"error": f"limit must be an integer between 1 and {MAX_COMMON_SLOTS}"}), 400
+
+    if step_minutes is not None and (not isinstance(step_minutes, int) or step_minutes <= 0):
+        return jsonify({"error": "step_minutes must be a positive integer"}), 400
+
+    def is_id_list(value):
+        return isinstance(value, list) and all(isinstance(c, str) and c for c in value)
+
+    if not is_id_list(calendar_ids) or not isinstance(any_of, list) or not all(is_id_list(group) and group for group in any_of):
+        return jsonify({"error": "calendar_ids must be a list of calendar IDs and any_of a list of non-empty lists of them"}), 400
+    if not calendar_ids and not any_of:
+        return jsonify({"error": "calendar_ids or any_of is required"}), 400
+    if reservation_id is not None and not is_reservation_id(reservation_id):
+        return jsonify({"error": "reservation_id must be one returned by an earlier availability request"}), 400
 
     try:
-       
-        if start_time_str.endswith('Z'):
-            naive_start_dt = datetime.datetime.fromisoformat(start_time_str.replace('Z', ''))
-            start_dt_localized = requested_timezone.localize(naive_start_dt)
-        else:
-            start_dt_localized = datetime.datetime.fromisoformat(start_time_str)
-            if start_dt_localized.tzinfo is None:
-                start_dt_localized = requested_timezone.localize(start_dt_localized)
-            else:
-                start_dt_localized = start_dt_localized.astimezone(requested_timezone)
+        preferred_windows = _parse_preferred_windows(data.get('preferred_windows', []))
+        start_dt_localized, end_dt_localized = parse_datetimes(requested_timezone, time_min_str, time_max_str)
 
-        if end_time_str.endswith('Z'):
-            naive_end_dt = datetime.datetime.fromisoformat(end_time_str.replace('Z', ''))
-            end_dt_localized = requested_timezone.localize(naive_end_dt)
-        else:
-            end_dt_localized = datetime.datetime.fromisoformat(end_time_str)
-            if end_dt_localized.tzinfo is None:
-                end_dt_localized = requested_timezone.localize(end_dt_localized)
-            else:
-                end_dt_localized = end_dt_localized.astimezone(requested_timezone)
+        # The primary calendar is the one bookings go to, so its offered slots are held as freeBusy's are
+        primary_required = 'primary' in calendar_ids
+        held = slot_locks.held_intervals(start_dt_localized, end_dt_localized, reservation_id) if primary_required else None
+        common_slots = find_common_slots(start_dt_localized, end_dt_localized, duration_minutes=duration_minutes,
+                                         calendar_ids=calendar_ids, any_of=any_of, limit=limit, step_minutes=step_minutes,
+                                         preferred_windows=preferred_windows, also_busy=held)
 
-        
-        event_link = book_meeting(start_dt_localized, end_dt_localized, summary, phone_number)
-        return jsonify({"message": "Meeting booked successfully", "event_link": event_link}), 200
+        formatted_slots = [
+            {"start": slot_start.isoformat(), "end": slot_end.isoformat(), "timeZone": time_zone_str, "calendars": used}
+            for slot_start, slot_end, used in common_slots
+        ]
+        response = {"free_slots": formatted_slots}
+        if primary_required:
+            hold_offered_slots(response, [(slot_start, slot_end) for slot_start, slot_end, _ in common_slots], reservation_id, requested_timezone)
+        return jsonify(response), 200
 
+    except FreeBusyError as e:
+        return jsonify({"error": f"Could not read availability: {e}"}), 400
     except ValueError as e:
-        return jsonify({"error": f"Invalid date/time format: {e}"}), 400
+        return jsonify({"error": f"Invalid request: {e}"}), 400
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
+@app.route('/calendar/v3/events', methods=['POST'])
+def book_new_meeting():
+    # Retries carrying the same Idempotency-Key get the first response back instead of a second event
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        outcome, stored = slot_locks.begin_request(idempotency_key, hashlib.sha256(request.get_data()).hexdigest())
+        if outcome == REPLAY:
+            body, status = stored
+            return jsonify(body), status, {'Idempotent-Replayed': 'true'}
+        if outcome == IN_PROGRESS:
+            return jsonify({"error": "A request with this Idempotency-Key is still in progress."}), 409
+        if outcome == MISMATCH:
+            return jsonify({"error": "This Idempotency-Key was already used for a different request."}), 422
+
+    try:
+        body, status = book_requested_slot(request.get_json(silent=True))
+    except BaseException:
+        # Free the key, or every retry carrying it would be told the request is still in progress
+        if idempotency_key:
+            slot_locks.abandon_request(idempotency_key)
+        raise
+    if idempotency_key:
+        if status < 500:
+            slot_locks.finish_request(idempotency_key, body, status)
+        else:
+            slot_locks.abandon_request(idempotency_key)
+    return jsonify(body), status
+
+def book_requested_slot(data):
+    """Book the slot in a /calendar/v3/events request; returns (response body, status)."""
+    if not data:
+        return {"error": "Invalid JSON payload"}, 400
+
+    start_time_str = data.get('start')
+    end_time_str = data.get('end')
+    summary = data.get('summary', 'Appointment') 
+    phone_number = data.get('phone_number') 
+    time_zone_str = data.get('timeZone', 'Asia/Kolkata')
+
+    try:
+        requested_timezone = get_timezone(time_zone_str)
+    except UnknownTimeZoneError:
+        return {"error": f"Invalid timeZone: {time_zone_str}"}, 400
+
+    if not start_time_str or not end_time_str:
+        return {"error": "'start' and 'end' are required"}, 400
+
+    try:
+        start_dt_localized, end_dt_localized = parse_datetimes(requested_timezone, start_time_str, end_time_str)
+    except ValueError as e:
+        return {"error": f"Invalid date/time format: {e}"}, 400
+
+    if end_dt_localized <= start_dt_localized:
+        return {"error": "'end' must be after 'start'"}, 400
+
+    # Optional: the reservation_id from the availability response that offered this slot. With it,
+    # slots held for other callers are refused; without it only other bookings are.
+    reservation_id = data.get('reservation_id')
+    if reservation_id is not None and not is_reservation_id(reservation_id):
+        return {"error": "reservation_id must be one returned by an earlier availability request"}, 400
+
+    # Lock first, then check the calendar: a concurrent booking of this slot either holds the lock
+    # or, once it has released it, is already in the cache. The lock is kept until it expires so
+    # other workers whose caches have not synced the new event yet still see the slot as taken.
+    lock_id = slot_locks.acquire_booking(start_dt_localized, end_dt_localized, reservation_id)
+    if lock_id is None:
+        return {"error": "This slot is being held for another caller. Please pick another slot."}, 409
+    try:
+        if not is_slot_free(start_dt_localized, end_dt_localized):
+            slot_locks.release(lock_id)
+            return {"error": "This slot is no longer free. Please pick another slot."}, 409
+        event_link = book_meeting(start_dt_localized, end_dt_localized, summary, phone_number)
+    except Exception as e:
+        slot_locks.release(lock_id)
+        return {"error": f"An unexpected error occurred: {e}"}, 500
+    if reservation_id:
+        slot_locks.release_offers(reservation_id)
+
+    record_history(call_store.record_booking, 'booked', phone_number, event_link=event_link, summary=summary,
+                   start_time=start_dt_localized, end_time=end_dt_localized)
+    return {"message": "Meeting booked successfully", "event_link": event_link}, 200
+
+
 @app.route('/calendar/v3/appointments/update', methods=['POST'])
 def update_existing_appointment():
     data = request.json
@@ -186,10 +533,18 @@ def update_existing_appointment():
         return jsonify({"error": "Phone number and old_summary are required."}), 400
 
     try:
-        requested_timezone = pytz.timezone(time_zone_str)
-    except pytz.UnknownTimeZoneError:
+        requested_timezone = get_timezone(time_zone_str)
+    except UnknownTimeZoneError:
         return jsonify({"error": f"Invalid timeZone: {time_zone_str}"}), 400
 
+    # Parsed once here rather than once per matched event
+    new_start_dt = None
+    if new_start_time_str:
+        try:
+            new_start_dt, = parse_datetimes(requested_timezone, new_start_time_str)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid date/time format: {e}"}), 400
+
     service_instance = get_calendar_service_instance()
     matching_events = service_instance.get_events_by_phone_number(phone_number)
 
@@ -206,57 +561,49 @@ def update_existing_appointment():
     if not filtered_events:
         return jsonify({"message": "No appointments found with that phone number and matching title."}), 200
 
-    updated_count = 0
+    updates = []
     for event in filtered_events:
         event_id = event['id']
         
-        # Get original start and end times
-        original_start_str = event['start'].get('dateTime')
-        original_end_str = event['end'].get('dateTime')
-
-        if not original_start_str or not original_end_str:
+        # Original start and end times, as the event cache already parsed them
+        original_span = parse_event_span(event)
+        if original_span is None:
             print(f"Skipping event {event_id}: Missing start or end time.")
             continue
 
-        original_start_dt_utc = datetime.datetime.fromisoformat(original_start_str.replace('Z', '+00:00'))
-        original_end_dt_utc = datetime.datetime.fromisoformat(original_end_str.replace('Z', '+00:00'))
+        original_start_dt_utc, original_end_dt_utc = original_span
         original_duration = original_end_dt_utc - original_start_dt_utc
-        current_start_dt = original_start_dt_utc.astimezone(requested_timezone)
-        current_end_dt = original_end_dt_utc.astimezone(requested_timezone)
-        new_effective_start_dt = current_start_dt
-        
-        if new_start_time_str:
-            # Parse new_start_time_str, handling 'Z' suffix and localizing
-            if new_start_time_str.endswith('Z'):
-                naive_new_start_dt = datetime.datetime.fromisoformat(new_start_time_str.replace('Z', ''))
-                new_effective_start_dt = requested_timezone.localize(naive_new_start_dt)
-            else:
-                new_effective_start_dt = datetime.datetime.fromisoformat(new_start_time_str)
-                if new_effective_start_dt.tzinfo is None:
-                    new_effective_start_dt = requested_timezone.localize(new_effective_start_dt)
-                else:
-                    new_effective_start_dt = new_effective_start_dt.astimezone(requested_timezone)
-        
+        new_effective_start_dt = new_start_dt or original_start_dt_utc.astimezone(requested_timezone)
+
         new_effective_end_dt = new_effective_start_dt + original_duration
         effective_new_summary = new_summary if new_summary is not None else event.get('summary', 'Appointment')
 
-    
-        update_result = update_appointment(
-            event_id,
-            new_effective_start_dt,
-            new_effective_end_dt,
-            effective_new_summary,
-            phone_number # Pass phone number to ensure it's kept in description
+        updates.append({
+            "event_id": event_id,
+            "start": new_effective_start_dt,
+            "end": new_effective_end_dt,
+            "summary": effective_new_summary,
+            "phone_number": phone_number # Pass phone number to ensure it's kept in description
+        })
+
+    # All matched events go to Google in one batch request instead of one round trip each
+    results = bulk_update_appointments(updates)
+    for update, result in zip(updates, results):
+        record_history(
+            call_store.record_booking, 'updated' if result['status'] == 'updated' else 'failed', phone_number,
+            event_id=update['event_id'], summary=update['summary'],
+            start_time=update['start'], end_time=update['end'], error=result.get('error')
         )
-        if "successfully" in update_result.lower():
-            updated_count += 1
-        else:
-            print(f"Failed to update event {event_id}: {update_result}")
+    updated_count = sum(1 for result in results if result['status'] == 'updated')
+    failed_count = len(results) - updated_count
 
     if updated_count > 0:
-        return jsonify({"message": f"Successfully updated {updated_count} appointment(s)."}), 200
+        message = f"Successfully updated {updated_count} appointment(s)."
+        if failed_count:
+            message += f" Failed to update {failed_count} appointment(s)."
+        return jsonify({"message": message, "results": results}), 200
     else:
-        return jsonify({"message": "No matching appointments were updated."}), 200
+        return jsonify({"message": "No matching appointments were updated.", "results": results}), 200
 
 @app.route('/calendar/v3/appointments/delete', methods=['POST'])
 def delete_existing_appointment():
@@ -271,12 +618,38 @@ def delete_existing_appointment():
         return jsonify({"error": "Phone number is required for verification."}), 400
 
     try:
-        message = delete_appointment(phone_number, summary) # Pass summary to the function
-        return jsonify({"message": message}), 200
+        message, results = delete_appointments(phone_number, summary) # Pass summary to the function
+        for result in results:
+            record_history(
+                call_store.record_booking, 'deleted' if result['status'] == 'deleted' else 'failed', phone_number,
+                event_id=result['event_id'], summary=summary, error=result.get('error')
+            )
+        return jsonify({"message": message, "results": results}), 200
 
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {e}"}), 500
 
+@app.route('/calendar/v3/notifications', methods=['POST'])
+def calendar_push_notification():
+    # Google Calendar push notification: headers only, and it expects a quick 2xx
+    token = request.headers.get('X-Goog-Channel-Token', '')
+    if not config.CALENDAR_WEBHOOK_TOKEN or not hmac.compare_digest(token, config.CALENDAR_WEBHOOK_TOKEN):
+        return jsonify({"error": "Invalid channel token"}), 403
+    resource_state = request.headers.get('X-Goog-Resource-State', '')
+    get_calendar_service_instance().handle_push_notification(resource_state)
+    return '', 204
+
+@app.route('/calendar/v3/bookings/per_day', methods=['GET'])
+def bookings_per_day():
+    start_day = request.args.get('start')
+    end_day = request.args.get('end', start_day)
+    try:
+        datetime.date.fromisoformat(start_day or '')
+        datetime.date.fromisoformat(end_day or '')
+    except ValueError:
+        return jsonify({"error": "'start' (and optionally 'end') must be dates in YYYY-MM-DD format"}), 400
+    return jsonify({"days": call_store.bookings_per_day(start_day, end_day)}), 200
+
 @app.route('/bland-ai/call', methods=['POST'])
 def make_bland_ai_call():
     data = request.json
@@ -287,37 +660,87 @@ def make_bland_ai_call():
     if not phone_number:
         return jsonify({"error": "Phone number is required."}), 400
 
-    headers = {
-        'Authorization': BLAND_AI_API_KEY,
-        'Content-Type': 'application/json'
-    }
-
-    call_data = {
-        "phone_number": phone_number,
-        "voice": "June",
-        "wait_for_greeting": False,
-        "record": True,
-        "answered_by_enabled": True,
-        "noise_cancellation": False,
-        "interruption_threshold": 100,
-        "block_interruptions": False,
-        "max_duration": 12,
-        "model": "base",
-        "language": "en",
-        "background_track": "none",
-        "endpoint": "https://api.bland.ai",
-        "voicemail_action": "hangup",
-        "pathway_id": "c1496235-5736-44c5-b940-f10e37fd0d5b",
-        "pathway_version": 2
-    }
+    try:
+        call_data = build_call_data(phone_number, parse_call_overrides(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        response = requests.post('https://api.bland.ai/v1/calls', json=call_data, headers=headers)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        return jsonify(response.json()), 200
+        # Raises for HTTP errors (4xx or 5xx), timeouts and an open circuit breaker
+        return jsonify(get_bland_client().create_call(call_data)), 200
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Failed to make Bland AI call: {e}"}), 500
 
+# Outbound call campaigns: numbers are queued and placed by background workers within Bland AI's limits
+campaign_dispatcher = CampaignDispatcher(
+    lambda call_data: get_bland_client().create_call(call_data),
+    calls_per_second=config.CAMPAIGN_CALLS_PER_SECOND,
+    burst=config.CAMPAIGN_BURST,
+    max_concurrent_calls=config.CAMPAIGN_MAX_CONCURRENT_CALLS,
+    workers=config.CAMPAIGN_WORKERS,
+    max_attempts=config.CAMPAIGN_MAX_ATTEMPTS,
+    retry_backoff=config.CAMPAIGN_RETRY_BACKOFF_SECONDS,
+    start_worker=socketio.start_background_task,
+    create_queue=socketio.server.eio.create_queue,
+    sleep=socketio.sleep,
+)
+
+@app.route('/bland-ai/campaigns', methods=['POST'])
+def create_campaign():
+    # Either JSON {"phone_numbers": [...], ...overrides} or a multipart form with a CSV "file" and override fields
+    if request.files.get('file'):
+        try:
+            phone_numbers = numbers_from_csv(request.files['file'].read().decode('utf-8-sig'))
+        except UnicodeDecodeError:
+            return jsonify({"error": "The CSV file must be UTF-8 encoded."}), 400
+        data = request.form
+    else:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Invalid JSON payload"}), 400
+        phone_numbers = data.get('phone_numbers')
+        if not isinstance(phone_numbers, list) or not all(isinstance(number, str) for number in phone_numbers):
+            return jsonify({"error": "phone_numbers must be a list of phone numbers"}), 400
+
+    if not phone_numbers:
+        return jsonify({"error": "At least one phone number is required."}), 400
+    if len(phone_numbers) > config.CAMPAIGN_MAX_NUMBERS:
+        return jsonify({"error": f"A campaign can have at most {config.CAMPAIGN_MAX_NUMBERS} phone numbers."}), 400
+    # Dialing a national number with a guessed country code would call the wrong person
+    not_e164 = [number for number in phone_numbers if not is_e164(number)]
+    if not_e164:
+        return jsonify({
+            "error": "Phone numbers must be in E.164 format: '+', the country code, then the number.",
+            "invalid_numbers": not_e164,
+        }), 400
+    try:
+        overrides = parse_call_overrides(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    campaign = campaign_dispatcher.start(phone_numbers, overrides, name=data.get('name'))
+    return jsonify(campaign.summary()), 202
+
+@app.route('/bland-ai/campaigns', methods=['GET'])
+def list_campaigns():
+    return jsonify({"campaigns": campaign_dispatcher.list_campaigns(), "live_calls": campaign_dispatcher.live_calls()}), 200
+
+@app.route('/bland-ai/campaigns/<campaign_id>', methods=['GET'])
+def get_campaign(campaign_id):
+    campaign = campaign_dispatcher.get(campaign_id)
+    if campaign is None:
+        return jsonify({"error": "No campaign found for the given ID."}), 404
+    status = request.args.get('status')
+    numbers = [entry for entry in campaign.numbers.values() if status is None or entry['status'] == status]
+    return jsonify({**campaign.summary(), "numbers": numbers}), 200
+
+@app.route('/bland-ai/campaigns/<campaign_id>/cancel', methods=['POST'])
+def cancel_campaign(campaign_id):
+    campaign = campaign_dispatcher.cancel(campaign_id)
+    if campaign is None:
+        return jsonify({"error": "No campaign found for the given ID."}), 404
+    return jsonify(campaign.summary()), 200
+
 @app.route('/bland-ai/redirect_and_end_call', methods=['POST'])
 def redirect_and_end_call():
     data = request.json
@@ -327,63 +750,121 @@ def redirect_and_end_call():
     if not bland_ai_call_id:
         return jsonify({"error": "Bland AI Call ID is required."}), 400
 
-    # Removed active_calls logic for debugging recursion
-    # call_info = active_calls.get(bland_ai_call_id)
-
-    # if not call_info:
-    #     return jsonify({"error": "No active call found for the given Bland AI Call ID."}), 404
+    call_info = active_calls.get(bland_ai_call_id)
 
-    # twilio_call_sid = call_info.get('twilio_sid')
-    # from_number = call_info.get('from_number')
+    if not call_info:
+        return jsonify({"error": "No active call found for the given Bland AI Call ID."}), 404
 
-    # Using a placeholder Twilio SID for now as active_calls is removed
-    twilio_call_sid = "REMOVED_FOR_DEBUGGING_TWILIO_SID"
+    twilio_call_sid = call_info.get('twilio_call_sid')
 
     if not twilio_call_sid:
         return jsonify({"error": "Twilio CallSid not found for this Bland AI Call ID. Cannot redirect or end Twilio leg."}), 400
 
-    bland_ai_stop_successful = False
-    bland_ai_error_message = ""
+    redirect_url = message_and_hangup_url(message_to_speak)
 
-    try:
-        # Step 1: Attempt to stop the Bland AI call
+    def stop_bland_ai_call():
         print(f"Attempting to stop Bland AI call {bland_ai_call_id}.")
-        stop_bland_headers = {
-            'Authorization': BLAND_AI_API_KEY,
-            'Content-Type': 'application/json'
-        }
-        stop_bland_response = requests.post(f'https://api.bland.ai/v1/calls/{bland_ai_call_id}/stop', headers=stop_bland_headers)
-        stop_bland_response.raise_for_status()
+        get_bland_client().stop_call(bland_ai_call_id)
         print(f"Bland AI call {bland_ai_call_id} stopped successfully.")
-        bland_ai_stop_successful = True
-    except requests.exceptions.RequestException as e:
-        bland_ai_error_message = f"Failed to stop Bland AI call: {e}"
-        if e.response is not None:
+
+    def redirect_twilio_call():
+        print(f"Attempting to redirect Twilio CallSid {twilio_call_sid} to play message and hang up.")
+        get_call_controller().redirect(twilio_call_sid, redirect_url)
+        print(f"Twilio CallSid {twilio_call_sid} redirected to {redirect_url}")
+
+    # The two legs are independent, so stop Bland AI and redirect Twilio at the same time
+    (_, bland_ai_error), (_, twilio_error) = run_concurrently([stop_bland_ai_call, redirect_twilio_call])
+
+    if bland_ai_error is not None:
+        bland_ai_error_message = f"Failed to stop Bland AI call: {bland_ai_error}"
+        response = getattr(bland_ai_error, 'response', None)
+        if response is not None:
             try:
-                error_json = e.response.json()
+                error_json = response.json()
                 bland_ai_error_message += f" - Bland AI response: {error_json}"
             except ValueError:
-                bland_ai_error_message += f" - Bland AI raw response: {e.response.text}"
+                bland_ai_error_message += f" - Bland AI raw response: {response.text}"
         print(bland_ai_error_message)
 
-    try:
-        print(f"Attempting to redirect Twilio CallSid {twilio_call_sid} to play message and hang up.")
-        redirect_url = f"{get_base_url()}/twilio/message_and_hangup?message={urllib.parse.quote(message_to_speak)}"
-        twilio_client.calls(twilio_call_sid).update(method='POST', url=redirect_url)
-        print(f"Twilio CallSid {twilio_call_sid} redirected to {redirect_url}")
+    if twilio_error is not None:
+        error_message = f"Error redirecting Twilio call: {twilio_error}"
+        print(error_message)
+        return jsonify({"status": "error", "message": error_message}), 500
 
-        # Removed active_calls cleanup for debugging recursion
-        # if bland_ai_call_id in active_calls:
-        #     del active_calls[bland_ai_call_id]
+    active_calls.remove(bland_ai_call_id)
 
-        status_message = "Call redirected and termination attempted."
+    status_message = "Call redirected and termination attempted."
 
-        return jsonify({"status": "success", "message": status_message}), 200
+    return jsonify({"status": "success", "message": status_message}), 200
 
-    except Exception as e:
-        error_message = f"Error redirecting Twilio call: {e}"
-        print(error_message)
-        return jsonify({"status": "error", "message": error_message}), 500
+@app.route('/bland-ai/calls/end_all', methods=['POST'])
+def end_all_calls():
+    """
+    Wind down live calls at once (end of business hours, incidents): each call's Bland AI leg is
+    stopped and its Twilio leg redirected to say `message` and hang up, or hung up straight away
+    with "action": "hangup". Covers every active call unless `call_ids` names some. Twilio updates
+    run TWILIO_MAX_CONCURRENT_UPDATES at a time; the response reports each call's outcome.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action', 'redirect')
+    message = data.get('message', 'Thank you for calling. Goodbye!')
+    call_ids = data.get('call_ids')
+
+    if action not in ('redirect', 'hangup'):
+        return jsonify({"error": "action must be 'redirect' or 'hangup'"}), 400
+    if call_ids is not None and (not isinstance(call_ids, list) or not all(isinstance(c, str) and c for c in call_ids)):
+        return jsonify({"error": "call_ids must be a list of Bland AI call IDs"}), 400
+
+    if call_ids is None:
+        calls = active_calls.list_active()
+    else:
+        calls = [active_calls.get(call_id) or {'call_id': call_id} for call_id in dict.fromkeys(call_ids)]
+    controller = get_call_controller()
+    redirect_url = message_and_hangup_url(message) if action == 'redirect' else None
+
+    def wind_down(call):
+        call_id = call['call_id']
+        twilio_call_sid = call.get('twilio_call_sid')
+        outcome = {"call_id": call_id, "twilio_call_sid": twilio_call_sid}
+
+        def update_twilio_leg():
+            if redirect_url:
+                controller.redirect(twilio_call_sid, redirect_url)
+            else:
+                controller.hang_up(twilio_call_sid)
+
+        legs = [lambda: get_bland_client().stop_call(call_id)]
+        if twilio_call_sid:
+            legs.append(update_twilio_leg)
+        results = run_concurrently(legs)
+
+        bland_ai_error = results[0][1]
+        outcome["bland_ai"] = "stopped" if bland_ai_error is None else f"error: {bland_ai_error}"
+        if not twilio_call_sid:
+            outcome["twilio"] = "skipped: no Twilio CallSid recorded"
+            outcome["ok"] = bland_ai_error is None
+        else:
+            twilio_error = results[1][1]
+            if twilio_error is None:
+                outcome["twilio"] = "redirected" if redirect_url else "ended"
+            elif call_already_ended(twilio_error):
+                outcome["twilio"] = "already ended"
+            else:
+                outcome["twilio"] = f"error: {twilio_error}"
+            outcome["ok"] = twilio_error is None or call_already_ended(twilio_error)
+        if outcome["ok"]:
+            active_calls.remove(call_id)
+        return outcome
+
+    outcomes = []
+    for call, (outcome, error) in zip(calls, controller.run_all([lambda call=call: wind_down(call) for call in calls])):
+        if error is not None:
+            logging.error(f"Winding down call {call['call_id']} failed: {error}")
+            outcome = {"call_id": call['call_id'], "twilio_call_sid": call.get('twilio_call_sid'), "ok": False, "error": str(error)}
+        outcomes.append(outcome)
+    failed = sum(1 for outcome in outcomes if not outcome["ok"])
+    logging.info(f"Wound down {len(outcomes) - failed} of {len(outcomes)} calls ({action}).")
+    return jsonify({"action": action, "requested": len(outcomes), "failed": failed, "calls": outcomes}), 200
 
 @app.route('/bland-ai/list_calls', methods=['GET', 'OPTIONS'])
 def list_bland_ai_calls():
@@ -392,10 +873,49 @@ def list_bland_ai_calls():
     if request.method == 'OPTIONS':
         logging.info("Handling CORS preflight OPTIONS request.")
         return '', 200
-    
-    # Temporarily returning a static response to debug recursion
-    logging.info("Returning static response for /bland-ai/list_calls to debug recursion.")
-    return jsonify({"active_inbound_calls": []}), 200
+
+    calls = []
+    for call in active_calls.list_active():
+        for key in ('created_at', 'last_seen'):
+            if key in call:
+                call[key] = datetime.datetime.fromtimestamp(call[key], UTC).isoformat()
+        calls.append(call)
+    return jsonify({"active_inbound_calls": calls}), 200
+
+def process_bland_ai_event(data):
+    """Runs on a webhook queue worker for every accepted Bland AI webhook payload."""
+    call_id = data.get('call_id')
+    logging.info(f"Processing Bland AI webhook event for call_id {call_id}")
+    logging.debug(f"Bland AI webhook payload for call_id {call_id}: {data}")
+
+    if call_id:
+        active_calls.record(
+            call_id,
+            twilio_call_sid=data.get('sid'),
+            from_number=data.get('from'),
+            to_number=data.get('to'),
+            status=data.get('status'),
+        )
+
+    record_history(call_store.record_call_event, data)
+
+    campaign_dispatcher.call_event(data)
+
+    # Push only what changed, and only to dashboards subscribed to this call
+    delta = transcripts.apply_event(data)
+    if delta and (delta['lines'] or delta['replace']):
+        record_history(call_store.record_transcript_lines, call_id, delta['offset'], delta['lines'], replace=delta['replace'])
+    if delta:
+        socketio.emit('transcript_delta', delta, to=call_room(call_id), namespace='/')
+
+webhook_queue = WebhookQueue(
+    process_bland_ai_event,
+    maxsize=config.WEBHOOK_QUEUE_MAXSIZE,
+    workers=config.WEBHOOK_QUEUE_WORKERS,
+    dedup_ttl=config.WEBHOOK_DEDUP_TTL_SECONDS,
+    start_worker=socketio.start_background_task,
+    create_queue=socketio.server.eio.create_queue,
+)
 
 @app.route('/bland-ai/webhook', methods=['POST']) # webhook for call events
 def bland_ai_webhook():
@@ -417,42 +937,68 @@ def bland_ai_webhook():
     data = request.json
     if not data:
         return jsonify({"error": "Invalid JSON payload"}), 400
-    
-    call_id = data.get('call_id')
-    from_number = data.get('from')
-    twilio_call_sid = data.get('sid')
-
-    print(f"Received Bland AI webhook data for call_id {call_id}: {data}")
 
-    # Removed active_calls logic for debugging recursion
-    # if call_id:
-    #     active_calls[call_id] = {
-    #         'twilio_sid': twilio_call_sid,
-    #         'from_number': from_number
-    #     }
-
-    emit('transcript', data, broadcast=True, namespace='/') # Emit transcript data via WebSocket
+    # Fan-out and bookkeeping happen on background workers (process_bland_ai_event) so the ack is immediate
+    outcome = webhook_queue.enqueue(data, raw_data)
+    if outcome == FULL:
+        return jsonify({"error": "Webhook queue is full, retry later"}), 503, {'Retry-After': '1'}
 
     # Bland AI expects a 200 OK response
-    return jsonify({"status": "success"}), 200
+    return jsonify({"status": "success", "duplicate": outcome == DUPLICATE}), 200
+
+@app.route('/bland-ai/calls/history', methods=['GET'])
+def bland_ai_call_history():
+    phone_number = request.args.get('phone_number')
+    limit = request.args.get('limit', 50, type=int)
+    if limit <= 0:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if phone_number:
+        return jsonify({"calls": call_store.calls_by_number(phone_number, limit)}), 200
+    return jsonify({"calls": call_store.recent_calls(limit)}), 200
+
+@app.route('/bland-ai/calls/<call_id>/history', methods=['GET'])
+def bland_ai_single_call_history(call_id):
+    history = call_store.call_history(call_id)
+    if history['call'] is None and not history['events']:
+        return jsonify({"error": "No history found for the given Bland AI Call ID."}), 404
+    return jsonify(history), 200
+
+@app.route('/bland-ai/webhook/stats', methods=['GET'])
+def bland_ai_webhook_stats():
+    return jsonify(webhook_queue.stats()), 200
 
 @socketio.on('connect')
 def test_connect():
+    metrics.socketio_connections.inc()
     print('Client connected')
 
 @socketio.on('disconnect')
 def test_disconnect():
+    metrics.socketio_connections.dec()
     print('Client disconnected')
 
+def call_room(call_id):
+    return f"call:{call_id}"
+
+@socketio.on('subscribe')
+def subscribe_to_call(data):
+    call_id = (data or {}).get('call_id')
+    if not call_id:
+        return
+    join_room(call_room(call_id))
+    # Catch the new subscriber up; after this it only receives transcript_delta messages
+    emit('transcript_snapshot', transcripts.snapshot(call_id))
+
+@socketio.on('unsubscribe')
+def unsubscribe_from_call(data):
+    call_id = (data or {}).get('call_id')
+    if call_id:
+        leave_room(call_room(call_id))
+
 @app.route('/bland-ai/transcript/<call_id>', methods=['GET']) # this is used to get the live transcript of a call
 def get_bland_ai_transcript(call_id):
-    headers = {
-        'Authorization': BLAND_AI_API_KEY,
-    }
     try:
-        response = requests.get(f'https://api.bland.ai/v1/calls/{call_id}', headers=headers)
-        response.raise_for_status()
-        return jsonify(response.json()), 200
+        cached = transcript_cache.get(call_id)
     except requests.exceptions.RequestException as e:
         error_message = f"Failed to retrieve transcript from Bland AI: {e}"
         if e.response is not None:
@@ -464,7 +1010,12 @@ def get_bland_ai_transcript(call_id):
         print(error_message)
         return jsonify({"error": error_message}), e.response.status_code if e.response is not None else 500
 
+    response = jsonify(cached.data)
+    response.set_etag(cached.etag)
+    response.last_modified = cached.last_modified
+    response.cache_control.no_cache = True # Clients must revalidate, which is a cheap 304 when nothing changed
+    return response.make_conditional(request)
+
 if __name__ == '__main__':
-    # Use eventlet for production
-    eventlet.monkey_patch()
+    # Use eventlet for production (the standard library is already monkey-patched at the top of this module)
     socketio.run(app, host='0.0.0.0', port=8000)
\ No newline at end of file
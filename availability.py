@@ -0,0 +1,129 @@
+import datetime
+import threading
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+from event_cache import parse_event_span
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+_BUSY = b'\x01'
+_FREE = b'\x00'
+
+
+class AvailabilityGrid:
+    """
+    Busy/free bitmap of one calendar over a rolling window, maintained from the EventCache as
+    events are stored and discarded (an EventCache listener, like PhoneIndex).
+
+    The window starts at UTC midnight of the current day and spans `days` + 1 days, cut into
+    cells of `granularity`. Each cell counts the events overlapping it, so an event can be
+    removed again without rescanning the others, and a byte per cell mirrors "count > 0" so
+    busy runs are found with bytes.find at C speed. A cell partly covered by an event counts
+    as busy, so busy intervals read from the grid are rounded out to cell boundaries.
+    """
+
+    def __init__(self, days: int = 14, granularity: datetime.timedelta = datetime.timedelta(minutes=15), clock=None):
+        self.days = days
+        self.granularity = granularity
+        self._clock = clock or (lambda: datetime.datetime.now(datetime.timezone.utc))
+        self._spans: Dict[str, Interval] = {}
+        self._lock = threading.Lock()
+        # False until a sync has filled the grid, and again while a full resync rebuilds it.
+        self.ready = False
+        self._reset_cells(self._window_origin())
+
+    def _window_origin(self) -> datetime.datetime:
+        now = self._clock()
+        return datetime.datetime.combine(now.date(), datetime.time(0), tzinfo=datetime.timezone.utc)
+
+    def _reset_cells(self, origin: datetime.datetime):
+        self.origin = origin
+        self.end = origin + datetime.timedelta(days=self.days + 1)
+        cell_count = (self.end - origin) // self.granularity
+        self._counts = array('H', bytes(2 * cell_count))
+        self._busy = bytearray(cell_count)
+
+    def _cells(self, start: datetime.datetime, end: datetime.datetime) -> Tuple[int, int]:
+        """Indexes of the cells overlapping [start, end), clipped to the window."""
+        first = max(0, (start - self.origin) // self.granularity)
+        last = min(len(self._counts), -((self.origin - end) // self.granularity))
+        return first, last
+
+    def _mark(self, span: Interval, delta: int):
+        first, last = self._cells(*span)
+        counts, busy = self._counts, self._busy
+        for index in range(first, last):
+            counts[index] += delta
+            busy[index] = 1 if counts[index] else 0
+
+    def roll(self) -> bool:
+        """Move the window forward once the day has changed; returns True if it was rebuilt."""
+        origin = self._window_origin()
+        if origin <= self.origin:
+            return False
+        with self._lock:
+            if origin <= self.origin:
+                return False
+            self._reset_cells(origin)
+            for span in self._spans.values():
+                self._mark(span, 1)
+        return True
+
+    def covers(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        return self.ready and self.origin <= start and end <= self.end
+
+    def busy_intervals(self, start: datetime.datetime, end: datetime.datetime) -> Optional[Iterator[Interval]]:
+        """
+        Lazily yield the sorted, disjoint busy intervals overlapping [start, end) as UTC datetimes,
+        or return None if the grid is not ready or the range falls outside the window (callers then
+        ask the cache). Reads a snapshot, so later changes do not affect an iterator in progress.
+        """
+        self.roll()
+        if not self.covers(start, end):
+            return None
+        with self._lock:
+            first, last = self._cells(start, end)
+            snapshot = bytes(self._busy[first:last])
+            origin = self.origin + first * self.granularity
+        return self._runs(snapshot, origin)
+
+    def _runs(self, busy: bytes, origin: datetime.datetime) -> Iterator[Interval]:
+        index = busy.find(_BUSY)
+        while index != -1:
+            run_end = busy.find(_FREE, index)
+            if run_end == -1:
+                run_end = len(busy)
+            yield origin + index * self.granularity, origin + run_end * self.granularity
+            index = busy.find(_BUSY, run_end)
+
+    # --- EventCache listener ---
+
+    def event_stored(self, event: dict):
+        span = parse_event_span(event)
+        with self._lock:
+            previous = self._spans.pop(event['id'], None)
+            if previous:
+                self._mark(previous, -1)
+            if span:
+                self._spans[event['id']] = span
+                self._mark(span, 1)
+
+    def event_discarded(self, event_id: str):
+        with self._lock:
+            previous = self._spans.pop(event_id, None)
+            if previous:
+                self._mark(previous, -1)
+
+    def cache_reset(self):
+        with self._lock:
+            self.ready = False
+            self._spans.clear()
+            self._reset_cells(self._window_origin())
+
+    def sync_started(self):
+        pass
+
+    def sync_finished(self, success: bool):
+        if success:
+            self.ready = True
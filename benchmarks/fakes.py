@@ -0,0 +1,439 @@
+"""
+In-process stand-ins for Google Calendar, Bland AI and Twilio, so the benchmarks run offline.
+"""
+import datetime
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.auth.credentials import AnonymousCredentials
+
+import google_calendar
+from google_http import build_calendar_service
+
+
+class _Request:
+    def __init__(self, api, fn):
+        self._api = api
+        self._fn = fn
+
+    def execute(self):
+        self._api._round_trip()
+        return self._fn()
+
+
+class _Batch:
+    """All added requests cost a single round trip, like a real batch HTTP request."""
+
+    def __init__(self, api, callback):
+        self._api = api
+        self._callback = callback
+        self._items = []
+
+    def add(self, request, request_id):
+        self._items.append((request, request_id))
+
+    def execute(self, http=None):
+        self._api._round_trip()
+        for request, request_id in self._items:
+            try:
+                self._callback(request_id, request._fn(), None)
+            except Exception as e:
+                self._callback(request_id, None, e)
+
+
+class FakeCalendarApi:
+    """
+    Enough of the googleapiclient Calendar v3 surface for GoogleCalendarService: events().list
+    (with pageToken/syncToken), get/insert/update/delete/watch, channels().stop, freebusy().query
+    and batch requests.
+    `latency` seconds are slept per HTTP round trip to mimic the network; `page_size` is the most
+    events one events().list page returns, whatever maxResults asks for. `other_calendars` maps
+    calendar IDs to their events for freebusy().query; any other ID reports the primary's events.
+    """
+
+    def __init__(self, events=None, page_size: int = 250, latency: float = 0.0, other_calendars: dict = None):
+        self.events_by_id = {event['id']: event for event in (events or [])}
+        self.other_calendars = other_calendars or {}
+        self.page_size = page_size
+        self.latency = latency
+        self.round_trips = 0
+        self._ids = itertools.count(len(self.events_by_id) + 1)
+        self._changed = set()
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def events(self):
+        return _Events(self)
+
+    def freebusy(self):
+        return _FreeBusy(self)
+
+    def channels(self):
+        return _Channels(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+
+class _Events:
+    def __init__(self, api: FakeCalendarApi):
+        self.api = api
+
+    def list(self, calendarId='primary', syncToken=None, pageToken=None, timeMin=None, timeMax=None,
+             maxResults=None, orderBy=None, **kwargs):
+        api = self.api
+        page_size = min(maxResults or api.page_size, api.page_size)
+
+        def run():
+            if syncToken:
+                items = [api.events_by_id.get(event_id, {'id': event_id, 'status': 'cancelled'}) for event_id in api._changed]
+                api._changed = set()
+            else:
+                items = list(api.events_by_id.values())
+            if timeMin or timeMax:
+                items = [event for event in items if (not timeMax or event['start']['dateTime'] < timeMax)
+                         and (not timeMin or event['end']['dateTime'] > timeMin)]
+            if orderBy == 'startTime':
+                items.sort(key=lambda event: event['start']['dateTime'])
+            offset = int(pageToken or 0)
+            page = items[offset:offset + page_size]
+            result = {'items': page}
+            if offset + page_size < len(items):
+                result['nextPageToken'] = str(offset + page_size)
+            else:
+                result['nextSyncToken'] = f"sync-{api.round_trips}"
+            return result
+
+        return _Request(api, run)
+
+    def watch(self, calendarId, body):
+        api = self.api
+        expiration = int((time.time() + int(body.get('params', {}).get('ttl', 604800))) * 1000)
+        return _Request(api, lambda: {'id': body['id'], 'resourceId': 'resource-primary', 'expiration': str(expiration)})
+
+    def get(self, calendarId, eventId, **kwargs):
+        return _Request(self.api, lambda: self.api.events_by_id[eventId])
+
+    def insert(self, calendarId, body):
+        api = self.api
+
+        def run():
+            event = dict(body, id=f"evt{next(api._ids)}", htmlLink='https://calendar.example/event')
+            api.events_by_id[event['id']] = event
+            api._changed.add(event['id'])
+            return event
+
+        return _Request(api, run)
+
+    def update(self, calendarId, eventId, body):
+        api = self.api
+
+        def run():
+            event = dict(body, id=eventId)
+            api.events_by_id[eventId] = event
+            api._changed.add(eventId)
+            return event
+
+        return _Request(api, run)
+
+    def delete(self, calendarId, eventId):
+        api = self.api
+
+        def run():
+            del api.events_by_id[eventId]
+            api._changed.add(eventId)
+            return ''
+
+        return _Request(api, run)
+
+
+class _Channels:
+    def __init__(self, api: FakeCalendarApi):
+        self.api = api
+
+    def stop(self, body):
+        return _Request(self.api, lambda: '')
+
+
+class _FreeBusy:
+    def __init__(self, api: FakeCalendarApi):
+        self.api = api
+
+    def query(self, body):
+        api = self.api
+
+        def busy(events):
+            return sorted(
+                ({'start': event['start']['dateTime'], 'end': event['end']['dateTime']}
+                 for event in events
+                 if body['timeMin'] < event['end']['dateTime'] and event['start']['dateTime'] < body['timeMax']),
+                key=lambda interval: interval['start']
+            )
+
+        def run():
+            return {'calendars': {
+                item['id']: {'busy': busy(api.other_calendars.get(item['id'], api.events_by_id.values()))}
+                for item in body['items']
+            }}
+
+        return _Request(api, run)
+
+
+def generate_events(count: int, start: datetime.datetime, days: int, seed: int = 42, phone_numbers: int = 500):
+    """`count` 15-90 minute events spread over `days` days from `start`, each tagged with a phone number."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        event_start = start + datetime.timedelta(minutes=rng.randrange(0, days * 24 * 60, 15))
+        event_end = event_start + datetime.timedelta(minutes=rng.choice((15, 30, 45, 60, 90)))
+        events.append({
+            'id': f"seed{i}",
+            'summary': 'Appointment',
+            'description': f"Phone Number: +9190000{rng.randrange(phone_numbers):05d}",
+            'start': {'dateTime': event_start.astimezone(datetime.timezone.utc).isoformat()},
+            'end': {'dateTime': event_end.astimezone(datetime.timezone.utc).isoformat()},
+        })
+    return events
+
+
+def install_fake_calendar(api: FakeCalendarApi) -> google_calendar.GoogleCalendarService:
+    """Make google_calendar's module-level functions use `api` instead of Google."""
+
+    class FakeGoogleCalendarService(google_calendar.GoogleCalendarService):
+        def _authenticate(self):
+            return AnonymousCredentials()
+
+        def _build_service(self):
+            return api
+
+    service = FakeGoogleCalendarService()
+    google_calendar._calendar_service_instance = service
+    return service
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 stalls load tests on SYN retransmits (about 1s each)
+    request_queue_size = 1024
+
+
+class FakeGoogleServer:
+    """
+    Local HTTP server speaking just enough Calendar v3 for freebusy().query and events().list,
+    for exercising the real googleapiclient/httplib2 transport. Each response waits `latency`
+    seconds; `max_in_flight` records how many requests were ever being served at once.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload: dict):
+                server.requests += 1
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                finally:
+                    server.in_flight -= 1
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+
+            def do_GET(self):
+                self._reply({'items': [], 'nextSyncToken': 'sync-0'})
+
+            def do_POST(self):
+                query = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                busy = [{'start': query.get('timeMin'), 'end': query.get('timeMin')}] if query.get('timeMin') else []
+                self._reply({'calendars': {item['id']: {'busy': busy} for item in query.get('items', [])}})
+
+        self._httpd = _HTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def install_http_calendar(base_url: str) -> google_calendar.GoogleCalendarService:
+    """Make google_calendar use the real Google client and transport, pointed at a FakeGoogleServer."""
+
+    class HttpGoogleCalendarService(google_calendar.GoogleCalendarService):
+        def _authenticate(self):
+            return AnonymousCredentials()
+
+        def _build_service(self):
+            return build_calendar_service(self.http_pool, api_endpoint=base_url)
+
+    service = HttpGoogleCalendarService()
+    google_calendar._calendar_service_instance = service
+    return service
+
+
+class FakeBlandServer:
+    """
+    Local HTTP server answering the Bland AI endpoints the app uses, with optional per-response
+    latency. Speaks HTTP/1.1 keep-alive so pooled clients can reuse connections.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Buffer the response so headers and body leave in one write (avoids delayed-ACK stalls).
+            wbufsize = -1
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, payload: dict):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+
+            def do_GET(self):
+                call_id = self.path.rstrip('/').split('/')[-1]
+                self._reply({'call_id': call_id, 'status': 'in-progress', 'transcripts': []})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                if self.path.endswith('/stop'):
+                    self._reply({'status': 'success'})
+                else:
+                    self._reply({'status': 'success', 'call_id': f"call-{server.requests}"})
+
+        self._httpd = _HTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeTwilioServer:
+    """
+    Local HTTP server answering Twilio's call update (POST .../Calls/{CallSid}.json) after
+    `latency` seconds. Call SIDs in `ended` get Twilio's 21220 "not in progress" error; `connections`
+    and `max_in_flight` show how the client pooled and bounded its requests.
+    """
+
+    def __init__(self, latency: float = 0.0, ended=()):
+        self.latency = latency
+        self.ended = set(ended)
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                call_sid = self.path.rstrip('/').split('/')[-1].split('.')[0]
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+                if call_sid in server.ended:
+                    status, payload = 400, {'code': 21220, 'message': 'Call is not in-progress. Cannot redirect.', 'status': 400}
+                else:
+                    status, payload = 200, {'sid': call_sid, 'status': 'in-progress'}
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+
+        self._httpd = _HTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
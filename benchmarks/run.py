@@ -0,0 +1,586 @@
+"""
+Offline benchmarks for the scheduling and webhook hot paths.
+
+    python -m benchmarks.run [--quick] [--output results.json] [--only NAME ...]
+
+Google Calendar and Bland AI are replaced by the fakes in benchmarks/fakes.py, so nothing leaves
+the machine. Results are written as JSON (one record per benchmark and parameter set) so runs from
+different releases can be diffed to catch regressions.
+The cold_start benchmark doubles as an import-time budget check: the run exits non-zero when it fails.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# The app reads these at import time; keep the run self-contained.
+os.environ.setdefault('BLAND_AI_WEBHOOK_SECRET', 'benchmark-secret')
+os.environ.setdefault('BLAND_AI_API_KEY', 'benchmark-key')
+os.environ.setdefault('CALL_STORE_DB_PATH', ':memory:')
+os.environ.setdefault('SLOT_LOCK_DB_PATH', ':memory:')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google_calendar  # noqa: E402
+from benchmarks.fakes import (  # noqa: E402
+    FakeBlandServer, FakeCalendarApi, FakeGoogleServer, FakeTwilioServer, generate_events, install_fake_calendar,
+    install_http_calendar
+)
+from time_parsing import get_timezone, parse_datetimes  # noqa: E402
+
+IST = get_timezone('Asia/Kolkata')
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(fn, repeat: int, warmup: int = 1) -> dict:
+    """Run fn `repeat` times and summarise wall-clock durations in microseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        'unit': 'us',
+        'n': repeat,
+        'min': round(samples[0], 2),
+        'median': round(statistics.median(samples), 2),
+        'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'max': round(samples[-1], 2),
+    }
+
+
+def window_start() -> datetime.datetime:
+    # Tomorrow, so short ranges fall inside the availability grid's rolling window
+    tomorrow = datetime.datetime.now(IST).date() + datetime.timedelta(days=1)
+    return datetime.datetime.combine(tomorrow, datetime.time(0), tzinfo=IST)
+
+
+def fake_calendar(event_count: int, days: int) -> FakeCalendarApi:
+    api = FakeCalendarApi(generate_events(event_count, window_start(), days))
+    service = install_fake_calendar(api)
+    service.cache.max_staleness = float('inf')  # measure the in-memory path, not the initial sync
+    service.cache.ensure_fresh()
+    return api
+
+
+@benchmark('find_free_slots')
+def bench_find_free_slots(quick: bool):
+    """Busy times from the availability grid against the event cache (ranges past the grid's window use the cache)."""
+    import config
+    results = []
+    for event_count in ((10, 1000) if quick else (10, 100, 1000, 10000)):
+        for days in ((1, 7) if quick else (1, 7, 30)):
+            fake_calendar(event_count, days)
+            start = window_start()
+            end = start + datetime.timedelta(days=days)
+            for backend in ('grid', 'cache'):
+                config.FREE_BUSY_BACKEND = backend
+                for limit in (3, None):
+                    stats = measure(
+                        lambda: google_calendar.find_free_slots(start, end, duration_minutes=30, limit=limit),
+                        repeat=20 if quick else 50,
+                    )
+                    results.append({'params': {'events': event_count, 'days': days, 'backend': backend, 'limit': limit}, **stats})
+            config.FREE_BUSY_BACKEND = 'grid'
+    return results
+
+
+@benchmark('cold_find_free_slots')
+def bench_cold_find_free_slots(quick: bool):
+    """
+    First 3 slots over the next 30 days of a calendar holding a year of events, from a process that
+    has not synced it yet: the window's events streamed page by page (what the app does until its
+    first sync lands) against waiting for a full sync. 10 ms per Google round trip.
+    """
+    import config
+    results = []
+    for event_count in ((1000, 10000) if quick else (1000, 5000, 10000, 50000)):
+        for path in ('stream', 'full_sync'):
+            timings, round_trips = [], []
+            for _ in range(3 if quick else 5):
+                api = FakeCalendarApi(generate_events(event_count, window_start(), 365), latency=0.01)
+                service = install_fake_calendar(api)
+                service.cache.refresh_in_background = lambda: None  # keep the background sync out of the timing
+                start = window_start()
+                began = time.perf_counter()
+                if path == 'full_sync':
+                    service.cache.ensure_fresh()
+                    config.FREE_BUSY_BACKEND = 'cache'
+                google_calendar.find_free_slots(start, start + datetime.timedelta(days=30), duration_minutes=30, limit=3)
+                timings.append((time.perf_counter() - began) * 1000)
+                round_trips.append(api.round_trips)
+                config.FREE_BUSY_BACKEND = 'grid'
+            results.append({
+                'params': {'events': event_count, 'path': path},
+                'unit': 'ms',
+                'median': round(statistics.median(timings), 1),
+                'round_trips': max(round_trips),
+            })
+    return results
+
+
+@benchmark('common_slots')
+def bench_common_slots(quick: bool):
+    """
+    find_common_slots over 30 days for N attendees (calendar_ids) plus any one of 5 rooms, each
+    calendar with 150 events: earliest 3 slots against 3 slots ranked by a late-afternoon window.
+    """
+    results = []
+    start = window_start()
+    end = start + datetime.timedelta(days=30)
+    rooms = [f"room-{i}@example.com" for i in range(5)]
+    for attendees in ((5, 20) if quick else (5, 20, 50)):
+        people = [f"person-{i}@example.com" for i in range(attendees)]
+        other_calendars = {
+            calendar_id: generate_events(150, start, 30, seed=seed)
+            for seed, calendar_id in enumerate(people + rooms)
+        }
+        install_fake_calendar(FakeCalendarApi(other_calendars=other_calendars))
+        for ranked in (False, True):
+            windows = [(datetime.time(16), datetime.time(18))] if ranked else []
+            stats = measure(
+                lambda: google_calendar.find_common_slots(start, end, duration_minutes=30, calendar_ids=people,
+                                                          any_of=[rooms], limit=3, preferred_windows=windows),
+                repeat=10 if quick else 30,
+            )
+            results.append({'params': {'attendees': attendees, 'rooms': len(rooms), 'days': 30, 'ranked': ranked}, **stats})
+    return results
+
+
+@benchmark('get_events_by_phone_number')
+def bench_get_events_by_phone_number(quick: bool):
+    results = []
+    for event_count in ((100, 10000) if quick else (100, 1000, 10000, 50000)):
+        fake_calendar(event_count, 365)
+        service = google_calendar.get_calendar_service_instance()
+        stats = measure(lambda: service.get_events_by_phone_number('+919000000042'), repeat=50 if quick else 200)
+        results.append({'params': {'events': event_count}, **stats})
+    return results
+
+
+@benchmark('webhook_ack')
+def bench_webhook_ack(quick: bool):
+    """Signed POSTs to /bland-ai/webhook through the Flask test client: HMAC check plus enqueue."""
+    import api
+    client = api.app.test_client()
+    secret = os.environ['BLAND_AI_WEBHOOK_SECRET'].encode('utf-8')
+    count = 500 if quick else 5000
+    bodies = []
+    for i in range(count):
+        raw = json.dumps({'call_id': f"call-{i % 50}", 'user': 'user', 'text': f"line {i}", 'status': 'in-progress'}).encode('utf-8')
+        bodies.append((raw, hmac.new(secret, raw, hashlib.sha256).hexdigest()))
+
+    start = time.perf_counter()
+    for raw, signature in bodies:
+        response = client.post('/bland-ai/webhook', data=raw, headers={
+            'X-Bland-Signature': signature, 'Content-Type': 'application/json'
+        })
+        assert response.status_code == 200, response.status_code
+    elapsed = time.perf_counter() - start
+
+    # Let the background workers drain the queue before reading its stats.
+    deadline = time.monotonic() + 30
+    while api.webhook_queue.stats()['depth'] and time.monotonic() < deadline:
+        eventlet.sleep(0.01)
+    return [{
+        'params': {'requests': count},
+        'unit': 'req/s',
+        'throughput': round(count / elapsed, 1),
+        'mean_ack_us': round(elapsed / count * 1e6, 2),
+        'queue': api.webhook_queue.stats(),
+    }]
+
+
+@benchmark('freebusy_endpoint')
+def bench_freebusy_endpoint(quick: bool):
+    """End-to-end POST /calendar/v3/freeBusy through the Flask test client with a warm event cache."""
+    import api
+    client = api.app.test_client()
+    results = []
+    for event_count in ((100, 10000) if quick else (100, 1000, 10000)):
+        fake_calendar(event_count, 30)
+        payload = {
+            'timeMin': window_start().isoformat(),
+            'timeMax': (window_start() + datetime.timedelta(days=14)).isoformat(),
+            'meeting_duration': 30,
+            'timeZone': 'Asia/Kolkata',
+        }
+
+        def request():
+            response = client.post('/calendar/v3/freeBusy', json=payload)
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        stats = measure(request, repeat=50 if quick else 200)
+        results.append({'params': {'events': event_count, 'days': 14}, **stats})
+    return results
+
+
+@benchmark('freebusy_batch')
+def bench_freebusy_batch(quick: bool):
+    """
+    N candidate days for a shared calendar: N POST /calendar/v3/freeBusy requests one after
+    another against one POST /calendar/v3/freeBusy/batch. 10 ms per Google round trip.
+    """
+    import api
+    client = api.app.test_client()
+    results = []
+    start = window_start()
+    calendar_ids = ['team@example.com']
+    for days in ((3, 7) if quick else (2, 3, 4, 7, 14)):
+        fake = FakeCalendarApi(latency=0.01, other_calendars={calendar_ids[0]: generate_events(1000, start, 30)})
+        install_fake_calendar(fake)
+        queries = [
+            {
+                'timeMin': (start + datetime.timedelta(days=day)).isoformat(),
+                'timeMax': (start + datetime.timedelta(days=day + 1)).isoformat(),
+                'meeting_duration': 30,
+                'timeZone': 'Asia/Kolkata',
+            }
+            for day in range(days)
+        ]
+
+        def one_by_one():
+            for query in queries:
+                response = client.post('/calendar/v3/freeBusy', json={**query, 'calendar_ids': calendar_ids})
+                assert response.status_code == 200, response.get_data(as_text=True)
+
+        def batched():
+            response = client.post('/calendar/v3/freeBusy/batch', json={'queries': queries, 'calendar_ids': calendar_ids})
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        for mode, fn in (('sequential', one_by_one), ('batch', batched)):
+            fake.round_trips = 0
+            stats = measure(fn, repeat=5 if quick else 20, warmup=0)
+            results.append({
+                'params': {'queries': days, 'mode': mode, 'upstream_latency_ms': 10},
+                'round_trips_per_call': fake.round_trips // (5 if quick else 20),
+                **stats,
+            })
+    return results
+
+
+@benchmark('freebusy_concurrency')
+def bench_freebusy_concurrency(quick: bool):
+    """
+    Load test: N simultaneous POST /calendar/v3/freeBusy requests for non-primary calendars, each
+    a real googleapiclient freebusy query to a local server that takes 50 ms to answer. With green
+    I/O the wall time stays near one round trip instead of N of them.
+    """
+    import api
+    client = api.app.test_client()
+    latency = 0.05
+    payload = {
+        'timeMin': window_start().isoformat(),
+        'timeMax': (window_start() + datetime.timedelta(days=7)).isoformat(),
+        'meeting_duration': 30,
+        'timeZone': 'Asia/Kolkata',
+        'calendar_ids': ['team-a@example.com', 'team-b@example.com'],
+    }
+
+    def request(_):
+        response = client.post('/calendar/v3/freeBusy', json=payload)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    results = []
+    with FakeGoogleServer(latency=latency) as server:
+        install_http_calendar(server.base_url)
+        for concurrency in ((1, 10, 50) if quick else (1, 10, 50, 200)):
+            server.max_in_flight = 0
+            pool = eventlet.GreenPool(concurrency)
+            start = time.perf_counter()
+            list(pool.imap(request, range(concurrency)))
+            elapsed = time.perf_counter() - start
+            results.append({
+                'params': {'concurrent_requests': concurrency, 'upstream_latency_ms': latency * 1000},
+                'unit': 'ms',
+                'wall': round(elapsed * 1000, 1),
+                'serialized_estimate': round(concurrency * latency * 1000, 1),
+                'max_upstream_in_flight': server.max_in_flight,
+            })
+    return results
+
+
+@benchmark('bland_client_keepalive')
+def bench_bland_client_keepalive(quick: bool):
+    """Pooled BlandAIClient against a bare requests.get per call, both hitting a local fake Bland AI."""
+    import requests
+    from bland_client import BlandAIClient
+
+    results = []
+    with FakeBlandServer() as server:
+        client = BlandAIClient(api_key='benchmark-key', base_url=server.base_url)
+        repeat = 100 if quick else 500
+
+        connections_before = server.connections
+        stats = measure(lambda: client.get_call('call-1'), repeat=repeat)
+        results.append({'params': {'client': 'pooled'}, 'connections': server.connections - connections_before, **stats})
+
+        connections_before = server.connections
+        stats = measure(
+            lambda: requests.get(f"{server.base_url}/v1/calls/call-1", headers={'Authorization': 'benchmark-key'}, timeout=5).json(),
+            repeat=repeat,
+        )
+        results.append({'params': {'client': 'bare requests'}, 'connections': server.connections - connections_before, **stats})
+    return results
+
+
+@benchmark('end_all_calls')
+def bench_end_all_calls(quick: bool):
+    """
+    POST /bland-ai/calls/end_all for N live calls against local fake Bland AI and Twilio servers
+    that take 50 ms per request: wall time against doing the calls one by one, and how many Twilio
+    connections and requests in flight the bounded, pooled call controller used.
+    """
+    import api
+    import bland_client
+    import call_control
+    import config
+
+    latency = 0.05
+    client = api.app.test_client()
+    results = []
+    with FakeBlandServer(latency=latency) as bland, FakeTwilioServer(latency=latency) as twilio:
+        bland_client._bland_client_instance = bland_client.BlandAIClient(api_key='benchmark-key', base_url=bland.base_url)
+        for calls in ((10, 50) if quick else (10, 50, 200)):
+            controller = call_control.CallController('AC' + '0' * 32, 'benchmark-token')
+            controller.client.api.base_url = twilio.base_url
+            call_control._call_controller_instance = controller
+            for i in range(calls):
+                api.active_calls.record(f"bench-call-{i}", twilio_call_sid=f"CA{i:032d}", status='in-progress')
+            twilio.connections = twilio.max_in_flight = 0
+            start = time.perf_counter()
+            response = client.post('/bland-ai/calls/end_all', json={'message': 'We are closing for the day.'})
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200 and response.json['failed'] == 0, response.get_data(as_text=True)
+            results.append({
+                'params': {'calls': calls, 'max_concurrency': config.TWILIO_MAX_CONCURRENT_UPDATES, 'upstream_latency_ms': latency * 1000},
+                'unit': 'ms',
+                'wall': round(elapsed * 1000, 1),
+                'serialized_estimate': round(calls * latency * 1000, 1),
+                'twilio_connections': twilio.connections,
+                'twilio_max_in_flight': twilio.max_in_flight,
+            })
+        bland_client._bland_client_instance = None
+        call_control._call_controller_instance = None
+    return results
+
+
+@benchmark('metrics_overhead')
+def bench_metrics_overhead(quick: bool):
+    """Cost of recording one histogram observation and one counter increment, as done per request."""
+    import metrics
+    histogram = metrics.Histogram('benchmark_duration_seconds', 'Benchmark only.', ('method', 'route', 'status'))
+    counter = metrics.Counter('benchmark_total', 'Benchmark only.', ('cache', 'result'))
+    metrics.REGISTRY.remove(histogram)
+    metrics.REGISTRY.remove(counter)
+    repeat = 10000 if quick else 100000
+    return [
+        {'params': {'metric': 'histogram'}, **measure(lambda: histogram.observe(0.0123, method='GET', route='/metrics', status=200), repeat=repeat)},
+        {'params': {'metric': 'counter'}, **measure(lambda: counter.inc(cache='events', result='hit'), repeat=repeat)},
+    ]
+
+
+@benchmark('profiling_overhead')
+def bench_profiling_overhead(quick: bool):
+    """
+    POST /calendar/v3/freeBusy with profiling compiled in but not asked for, against the same
+    request run under the per-request cProfile hook.
+    """
+    import api
+    import config
+    client = api.app.test_client()
+    fake_calendar(1000, 30)
+    payload = {
+        'timeMin': window_start().isoformat(),
+        'timeMax': (window_start() + datetime.timedelta(days=14)).isoformat(),
+        'meeting_duration': 30,
+        'timeZone': 'Asia/Kolkata',
+    }
+    token = config.PROFILING_TOKEN
+    config.PROFILING_TOKEN = 'benchmark-profiling-token'
+    results = []
+    try:
+        for mode, headers in (('off', {}), ('cprofile', {'X-Profile': '1', 'X-Profile-Token': config.PROFILING_TOKEN})):
+            def request():
+                response = client.post('/calendar/v3/freeBusy', json=payload, headers=headers)
+                assert response.status_code == 200, response.get_data(as_text=True)
+                assert ('X-Profile-Id' in response.headers) == (mode == 'cprofile')
+
+            results.append({'params': {'profiling': mode}, **measure(request, repeat=50 if quick else 200)})
+    finally:
+        config.PROFILING_TOKEN = token
+    return results
+
+
+@benchmark('datetime_parse')
+def bench_datetime_parse(quick: bool):
+    """Zone lookup plus parsing a request's start and end, as the calendar routes do."""
+    values = {
+        'utc_z': ('2025-07-01T09:00:00Z', '2025-07-01T18:00:00Z'),
+        'offset': ('2025-07-01T09:00:00+05:30', '2025-07-01T18:00:00+05:30'),
+        'naive': ('2025-07-01T09:00:00', '2025-07-01T18:00:00'),
+    }
+    repeat = 10000 if quick else 100000
+    results = []
+    for case, (start, end) in values.items():
+        stats = measure(lambda: parse_datetimes(get_timezone('Asia/Kolkata'), start, end), repeat=repeat)
+        results.append({'params': {'input': case, 'parser': 'time_parsing'}, **stats})
+
+    try:
+        import pytz
+    except ImportError:
+        return results
+
+    def legacy(value, tz):
+        # The per-route parsing this replaced (note it treated 'Z' as local time)
+        if value.endswith('Z'):
+            return tz.localize(datetime.datetime.fromisoformat(value.replace('Z', '')))
+        parsed = datetime.datetime.fromisoformat(value)
+        return tz.localize(parsed) if parsed.tzinfo is None else parsed.astimezone(tz)
+
+    for case, (start, end) in values.items():
+        def parse_legacy():
+            tz = pytz.timezone('Asia/Kolkata')
+            return legacy(start, tz), legacy(end, tz)
+        stats = measure(parse_legacy, repeat=repeat)
+        results.append({'params': {'input': case, 'parser': 'pytz_legacy'}, **stats})
+    return results
+
+
+# Cold start: `import api` plus the first signed webhook, in a fresh interpreter each time
+COLD_START_BUDGET_MS = 1500
+# Must stay unimported until a route actually needs them
+LAZY_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'google.auth.transport.requests', 'httplib2', 'twilio')
+COLD_START_SCRIPT = """
+import hashlib, hmac, json, os, sys, tempfile, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+created = sorted(os.listdir('.')) + sorted(os.listdir(tempfile.gettempdir()))
+raw = json.dumps({'call_id': 'cold-start', 'text': 'hello', 'status': 'in-progress'}).encode('utf-8')
+signature = hmac.new(os.environ['BLAND_AI_WEBHOOK_SECRET'].encode('utf-8'), raw, hashlib.sha256).hexdigest()
+response = api.app.test_client().post('/bland-ai/webhook', data=raw, headers={
+    'X-Bland-Signature': signature, 'Content-Type': 'application/json'
+})
+assert response.status_code == 200, response.status_code
+answered = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_webhook_ms': (answered - imported) * 1000,
+    'eager_modules': [name for name in sys.argv[1:] if name in sys.modules],
+    'files_created_by_import': created,
+}))
+"""
+
+
+@benchmark('cold_start')
+def bench_cold_start(quick: bool):
+    """
+    Import-time budget check: each run is a fresh interpreter importing the app and answering one
+    webhook, as a serverless cold start does, with the shipped defaults (not this harness's
+    in-memory databases) from an empty working and temp directory. Fails the run (see main) if the
+    median exceeds COLD_START_BUDGET_MS, any of LAZY_MODULES was imported along the way, or the
+    import created files (it must work on a read-only filesystem).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {name: value for name, value in os.environ.items() if name not in ('CALL_STORE_DB_PATH', 'SLOT_LOCK_DB_PATH')}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    runs = []
+    for _ in range(3 if quick else 10):
+        with tempfile.TemporaryDirectory() as workdir, tempfile.TemporaryDirectory() as tmpdir:
+            completed = subprocess.run(
+                [sys.executable, '-W', 'ignore', '-c', COLD_START_SCRIPT, *LAZY_MODULES],
+                cwd=workdir, env=dict(env, TMPDIR=tmpdir), capture_output=True, text=True, check=True,
+            )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    total = statistics.median(run['import_ms'] + run['first_webhook_ms'] for run in runs)
+    eager = sorted({name for run in runs for name in run['eager_modules']})
+    created = sorted({name for run in runs for name in run['files_created_by_import']})
+    failures = []
+    if total > COLD_START_BUDGET_MS:
+        failures.append(f"cold start took {total:.0f} ms, budget is {COLD_START_BUDGET_MS} ms")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if created:
+        failures.append(f"importing the app created files: {', '.join(created)}")
+    return [{
+        'params': {'runs': len(runs)},
+        'unit': 'ms',
+        'import': round(statistics.median(run['import_ms'] for run in runs), 1),
+        'first_webhook': round(statistics.median(run['first_webhook_ms'] for run in runs), 1),
+        'total': round(total, 1),
+        'budget': COLD_START_BUDGET_MS,
+        'eager_modules': eager,
+        'files_created_by_import': created,
+        'failures': failures,
+    }]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='smaller parameter grid for a fast smoke run')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='run only these benchmarks')
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'quick': args.quick,
+        },
+        'benchmarks': {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        report['benchmarks'][name] = BENCHMARKS[name](args.quick)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+    # Benchmarks that double as checks (cold_start) list what went wrong under 'failures'
+    failures = [
+        f"{name}: {failure}"
+        for name, results in report['benchmarks'].items()
+        for result in results
+        for failure in result.get('failures', ())
+    ]
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
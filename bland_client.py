@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+
+# Statuses worth retrying for idempotent requests; everything else is returned to the caller as-is
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# POST /v1/calls body used for every outbound call; `build_call_data` fills in the number and any overrides
+DEFAULT_CALL_DATA = {
+    "voice": "June",
+    "wait_for_greeting": False,
+    "record": True,
+    "answered_by_enabled": True,
+    "noise_cancellation": False,
+    "interruption_threshold": 100,
+    "block_interruptions": False,
+    "max_duration": 12,
+    "model": "base",
+    "language": "en",
+    "background_track": "none",
+    "endpoint": "https://api.bland.ai",
+    "voicemail_action": "hangup",
+    "pathway_id": "c1496235-5736-44c5-b940-f10e37fd0d5b",
+    "pathway_version": 2,
+}
+# Fields callers may override per call or per campaign
+CALL_OVERRIDE_FIELDS = ('pathway_id', 'pathway_version', 'voice', 'max_duration')
+
+
+def build_call_data(phone_number: str, overrides: Optional[dict] = None) -> dict:
+    call_data = {"phone_number": phone_number, **DEFAULT_CALL_DATA}
+    for field in CALL_OVERRIDE_FIELDS:
+        if overrides and overrides.get(field) is not None:
+            call_data[field] = overrides[field]
+    return call_data
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failures in a row the circuit
+    opens and calls fail fast for `reset_timeout` seconds; then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class BlandAIClient:
+    """
+    Shared HTTP client for api.bland.ai: one keep-alive connection pool, connect/read timeouts on
+    every request, jittered exponential-backoff retries for idempotent requests, and a circuit
+    breaker so an unhealthy Bland AI fails fast instead of tying up greenlets.
+
+    Errors surface as the usual requests exceptions (HTTPError carries the response), so callers
+    handle them exactly as they did with bare requests.post/get.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, connect_timeout: float = None,
+                 read_timeout: float = None, max_retries: int = None, backoff_base: float = None,
+                 pool_size: int = None, breaker: CircuitBreaker = None):
+        self.api_key = api_key if api_key is not None else config.BLAND_AI_API_KEY
+        self.base_url = (base_url or config.BLAND_AI_BASE_URL).rstrip('/')
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else config.BLAND_AI_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else config.BLAND_AI_READ_TIMEOUT,
+        )
+        self.max_retries = max_retries if max_retries is not None else config.BLAND_AI_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else config.BLAND_AI_BACKOFF_BASE_SECONDS
+        self.breaker = breaker or CircuitBreaker(
+            config.BLAND_AI_CIRCUIT_FAILURE_THRESHOLD, config.BLAND_AI_CIRCUIT_RESET_SECONDS
+        )
+
+        pool_size = pool_size or config.BLAND_AI_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Authorization'] = self.api_key or ''
+
+    def _backoff(self, attempt: int):
+        # "Full jitter": a random delay up to the exponential cap, so retries from many greenlets spread out.
+        time.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method: str, path: str, idempotent: bool = False, operation: str = 'other', **kwargs) -> requests.Response:
+        """
+        Send a request and return the response; raises for HTTP errors like response.raise_for_status().
+        `operation` names the call in the upstream latency metrics (paths carry call IDs, so are not used).
+        """
+        with metrics.track_upstream('bland_ai', operation):
+            return self._request(method, path, idempotent, **kwargs)
+
+    def _request(self, method: str, path: str, idempotent: bool, **kwargs) -> requests.Response:
+        url = f"{self.base_url}{path}"
+        kwargs.setdefault('timeout', self.timeout)
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Bland AI circuit is open; not calling {method} {path}")
+            last_attempt = attempt == attempts - 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+                self._backoff(attempt)
+                continue
+            except BaseException:
+                # Any other RequestException (TooManyRedirects, InvalidURL, ...) or an eventlet.Timeout
+                # cancelling this greenlet: still an outcome, or a half-open trial would never end.
+                self.breaker.record_failure()
+                raise
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code in RETRYABLE_STATUS_CODES and not last_attempt:
+                self._backoff(attempt)
+                continue
+            response.raise_for_status()
+            return response
+
+    def create_call(self, call_data: dict) -> dict:
+        # Not idempotent: a retry after a lost response could place a second call.
+        return self.request('POST', '/v1/calls', operation='calls.create', json=call_data).json()
+
+    def stop_call(self, call_id: str) -> dict:
+        return self.request('POST', f'/v1/calls/{call_id}/stop', idempotent=True, operation='calls.stop').json()
+
+    def get_call(self, call_id: str) -> dict:
+        return self.request('GET', f'/v1/calls/{call_id}', idempotent=True, operation='calls.get').json()
+
+
+_bland_client_instance = None
+_bland_client_lock = threading.Lock()
+
+
+def get_bland_client() -> BlandAIClient:
+    global _bland_client_instance
+    if _bland_client_instance is None:
+        with _bland_client_lock:
+            if _bland_client_instance is None:
+                _bland_client_instance = BlandAIClient()
+    return _bland_client_instance
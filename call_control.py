@@ -0,0 +1,90 @@
+"""
+Twilio call control: redirecting or hanging up the Twilio leg of live calls, one at a time or all at once.
+
+Every update goes through one Twilio REST client whose requests session keeps a keep-alive pool of
+TWILIO_MAX_CONCURRENT_UPDATES connections, and bulk updates run at most that many at a time, so
+winding down every live call overlaps the round trips without a connection (and TLS handshake) per
+call or a burst that Twilio would answer with 429s. The twilio package is imported on first use.
+"""
+import functools
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+from concurrency import run_concurrently
+
+# Twilio error codes meaning the call has already finished, so there is nothing left to update
+CALL_ALREADY_ENDED_CODES = {20404, 21220}
+
+
+@functools.lru_cache(maxsize=256)
+def message_and_hangup_twiml(message: str) -> str:
+    """TwiML that says `message` and hangs up; built once per distinct message."""
+    from twilio.twiml.voice_response import VoiceResponse
+
+    response = VoiceResponse()
+    response.say(message)
+    response.hangup()
+    return str(response)
+
+
+def call_already_ended(error: Exception) -> bool:
+    return getattr(error, 'code', None) in CALL_ALREADY_ENDED_CODES or getattr(error, 'status', None) == 404
+
+
+class CallController:
+    def __init__(self, account_sid: str = None, auth_token: str = None, max_concurrency: int = None,
+                 timeout: float = None, client=None):
+        self.account_sid = account_sid if account_sid is not None else config.TWILIO_ACCOUNT_SID
+        self.auth_token = auth_token if auth_token is not None else config.TWILIO_AUTH_TOKEN
+        self.max_concurrency = max_concurrency or config.TWILIO_MAX_CONCURRENT_UPDATES
+        self.timeout = timeout if timeout is not None else config.TWILIO_TIMEOUT_SECONDS
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def _build_client(self):
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        http_client = TwilioHttpClient(pool_connections=True, timeout=self.timeout)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=0)
+        http_client.session.mount('https://', adapter)
+        http_client.session.mount('http://', adapter)
+        return Client(self.account_sid, self.auth_token, http_client=http_client)
+
+    def redirect(self, call_sid: str, url: str):
+        """Point a live call at new TwiML (fetched by Twilio with a POST to `url`)."""
+        with metrics.track_upstream('twilio', 'calls.update'):
+            return self.client.calls(call_sid).update(method='POST', url=url)
+
+    def hang_up(self, call_sid: str):
+        with metrics.track_upstream('twilio', 'calls.update'):
+            return self.client.calls(call_sid).update(status='completed')
+
+    def run_all(self, tasks: List[Callable[[], Any]]) -> List[Tuple[Any, Optional[Exception]]]:
+        """run_concurrently, at most max_concurrency at a time (one Twilio update per task)."""
+        return run_concurrently(tasks, limit=self.max_concurrency)
+
+
+_call_controller_instance = None
+_call_controller_lock = threading.Lock()
+
+
+def get_call_controller() -> CallController:
+    global _call_controller_instance
+    if _call_controller_instance is None:
+        with _call_controller_lock:
+            if _call_controller_instance is None:
+                _call_controller_instance = CallController()
+    return _call_controller_instance
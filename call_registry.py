@@ -0,0 +1,149 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+
+# Bland AI call statuses after which a call is no longer listed as active
+TERMINAL_STATUSES = {'completed', 'ended', 'failed', 'canceled'}
+
+
+class CallRegistry:
+    """
+    Bland AI call_id -> call state (Twilio CallSid, from/to number, status, timestamps).
+
+    Entries that have not been touched for `ttl` seconds are evicted. Subclasses decide where the
+    state lives; every record is a flat dict of strings/floats so it round-trips through Redis.
+    """
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+
+    def record(self, call_id: str, **fields) -> dict:
+        """Merge the non-None fields into the call's state, refresh last_seen and return the state."""
+        raise NotImplementedError
+
+    def get(self, call_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def remove(self, call_id: str):
+        raise NotImplementedError
+
+    def all_calls(self) -> List[dict]:
+        raise NotImplementedError
+
+    def list_active(self) -> List[dict]:
+        """Calls that have not reached a terminal status, most recently created first."""
+        calls = [call for call in self.all_calls() if call.get('status') not in TERMINAL_STATUSES]
+        calls.sort(key=lambda call: call.get('created_at', 0), reverse=True)
+        return calls
+
+
+class InMemoryCallRegistry(CallRegistry):
+    """Process-local registry; fine for a single worker."""
+
+    def __init__(self, ttl: float = 3600.0):
+        super().__init__(ttl)
+        self._calls: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now: float):
+        expired = [call_id for call_id, call in self._calls.items() if now - call['last_seen'] > self.ttl]
+        for call_id in expired:
+            del self._calls[call_id]
+
+    def record(self, call_id: str, **fields) -> dict:
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            call = self._calls.setdefault(call_id, {'call_id': call_id, 'created_at': now})
+            call.update({key: value for key, value in fields.items() if value is not None})
+            call['last_seen'] = now
+            return dict(call)
+
+    def get(self, call_id: str) -> Optional[dict]:
+        with self._lock:
+            self._evict_expired(time.time())
+            call = self._calls.get(call_id)
+            return dict(call) if call else None
+
+    def remove(self, call_id: str):
+        with self._lock:
+            self._calls.pop(call_id, None)
+
+    def all_calls(self) -> List[dict]:
+        with self._lock:
+            self._evict_expired(time.time())
+            return [dict(call) for call in self._calls.values()]
+
+
+class RedisCallRegistry(CallRegistry):
+    """
+    Registry shared by every worker through any Redis-protocol server. Each call is a hash with a
+    TTL, and a sorted set scored by last_seen lets workers list calls without a KEYS scan.
+
+    `client` is a redis-py compatible client created with decode_responses=True.
+    """
+
+    def __init__(self, client, ttl: float = 3600.0, prefix: str = 'calls:'):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+
+    def _key(self, call_id: str) -> str:
+        return f"{self.prefix}{call_id}"
+
+    @staticmethod
+    def _decode(raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        call = dict(raw)
+        for key in ('created_at', 'last_seen'):
+            if key in call:
+                call[key] = float(call[key])
+        return call
+
+    def record(self, call_id: str, **fields) -> dict:
+        now = time.time()
+        key = self._key(call_id)
+        mapping = {name: str(value) for name, value in fields.items() if value is not None}
+        mapping.update({'call_id': call_id, 'last_seen': str(now)})
+
+        pipe = self.client.pipeline()
+        pipe.hsetnx(key, 'created_at', str(now))
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, max(1, int(self.ttl)))
+        pipe.zadd(self.index_key, {call_id: now})
+        pipe.zremrangebyscore(self.index_key, '-inf', now - self.ttl)
+        pipe.hgetall(key)
+        return self._decode(pipe.execute()[-1])
+
+    def get(self, call_id: str) -> Optional[dict]:
+        return self._decode(self.client.hgetall(self._key(call_id)))
+
+    def remove(self, call_id: str):
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(call_id))
+        pipe.zrem(self.index_key, call_id)
+        pipe.execute()
+
+    def all_calls(self) -> List[dict]:
+        call_ids = self.client.zrangebyscore(self.index_key, time.time() - self.ttl, '+inf')
+        if not call_ids:
+            return []
+        pipe = self.client.pipeline()
+        for call_id in call_ids:
+            pipe.hgetall(self._key(call_id))
+        return [call for call in (self._decode(raw) for raw in pipe.execute()) if call]
+
+
+def create_call_registry() -> CallRegistry:
+    if config.CALL_REGISTRY_BACKEND == 'redis':
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CALL_REGISTRY_BACKEND=redis needs the 'redis' package installed") from e
+        client = redis.Redis.from_url(config.REDIS_URL, decode_responses=True)
+        return RedisCallRegistry(client, ttl=config.CALL_REGISTRY_TTL_SECONDS)
+    return InMemoryCallRegistry(ttl=config.CALL_REGISTRY_TTL_SECONDS)
@@ -0,0 +1,262 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+import config
+from sqlite_db import open_database
+from phone_index import normalize_phone_number
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id TEXT PRIMARY KEY,
+    from_number TEXT,
+    to_number TEXT,
+    status TEXT,
+    twilio_call_sid TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_from_number ON calls (from_number, last_seen);
+CREATE INDEX IF NOT EXISTS calls_to_number ON calls (to_number, last_seen);
+CREATE INDEX IF NOT EXISTS calls_last_seen ON calls (last_seen);
+
+CREATE TABLE IF NOT EXISTS call_events (
+    id INTEGER PRIMARY KEY,
+    call_id TEXT,
+    event TEXT,
+    status TEXT,
+    received_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS call_events_call_id ON call_events (call_id, received_at);
+CREATE INDEX IF NOT EXISTS call_events_received_at ON call_events (received_at);
+
+CREATE TABLE IF NOT EXISTS transcript_lines (
+    call_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    speaker TEXT,
+    text TEXT,
+    received_at REAL NOT NULL,
+    PRIMARY KEY (call_id, line_no)
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY,
+    outcome TEXT NOT NULL,
+    event_id TEXT,
+    event_link TEXT,
+    phone_number TEXT,
+    summary TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    error TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bookings_phone_number ON bookings (phone_number, recorded_at);
+CREATE INDEX IF NOT EXISTS bookings_start_time ON bookings (start_time);
+"""
+
+_UPSERT_CALL = """
+INSERT INTO calls (call_id, from_number, to_number, status, twilio_call_sid, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (call_id) DO UPDATE SET
+    from_number = COALESCE(excluded.from_number, calls.from_number),
+    to_number = COALESCE(excluded.to_number, calls.to_number),
+    status = COALESCE(excluded.status, calls.status),
+    twilio_call_sid = COALESCE(excluded.twilio_call_sid, calls.twilio_call_sid),
+    last_seen = excluded.last_seen
+"""
+
+
+def _column_value(value: Any):
+    """A value SQLite can bind: None, numbers and strings as they are, anything else as JSON text."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, default=str)
+
+
+class CallStore:
+    """
+    Local SQLite record of call events, transcripts and booking outcomes.
+
+    The database runs in WAL mode so reads do not wait on writes. Writes are buffered and flushed
+    as one transaction once `batch_size` are pending, when the oldest is `flush_interval` seconds
+    old, or before any query (so reads always see earlier writes from this process).
+
+    The store is a log, so it never fails its callers: a batch that fails is retried row by row,
+    rows SQLite rejects are logged and dropped, and while the database itself is unavailable (locked,
+    read-only) the writes wait, at most `max_pending` of them (the oldest are dropped first).
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0, max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        self._oldest_pending: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use (always under self._lock): importing the app must not create files
+        if self._connection is None:
+            self._connection = open_database(self.path, SCHEMA, ['journal_mode=WAL', 'synchronous=NORMAL'])
+            self._connection.row_factory = sqlite3.Row
+        return self._connection
+
+    def _write(self, sql: str, params: tuple):
+        params = tuple(_column_value(value) for value in params)
+        with self._lock:
+            if not self._pending:
+                self._oldest_pending = time.monotonic()
+            self._pending.append((sql, params))
+            if len(self._pending) > self.max_pending:
+                dropped = len(self._pending) - self.max_pending
+                del self._pending[:dropped]
+                logging.warning(f"Call store has {self.max_pending} writes pending; dropped the {dropped} oldest")
+            due = (
+                len(self._pending) >= self.batch_size
+                or time.monotonic() - self._oldest_pending >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            try:
+                with self._conn:
+                    for sql, params in self._pending:
+                        self._conn.execute(sql, params)
+            except sqlite3.Error as e:
+                if not self._writable():
+                    logging.warning(f"Call store is unavailable ({e}); keeping {len(self._pending)} writes pending")
+                    return
+                logging.warning(f"Call store batch of {len(self._pending)} writes failed ({e}); retrying one at a time")
+                self._flush_one_by_one(self._pending)
+            self._pending = []
+
+    def _writable(self) -> bool:
+        """Whether the database takes writes at all (not locked, opened read-only or unreadable)."""
+        try:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _flush_one_by_one(self, pending: List[tuple]):
+        """Write each row in its own transaction, logging and dropping those SQLite rejects."""
+        for sql, params in pending:
+            try:
+                with self._conn:
+                    self._conn.execute(sql, params)
+            except sqlite3.Error as e:
+                logging.error(f"Call store dropped a write it cannot store ({e}): {sql.split('(')[0].strip()} {params!r}")
+
+    def run_flusher(self, sleep: Callable[[float], None]):
+        """Background loop that flushes writes left pending during quiet periods."""
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[dict]:
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    # --- Writes ---
+
+    def record_call_event(self, data: dict):
+        now = time.time()
+        call_id = data.get('call_id')
+        status = data.get('status')
+        self._write(
+            'INSERT INTO call_events (call_id, event, status, received_at, payload) VALUES (?, ?, ?, ?, ?)',
+            (call_id, data.get('event'), status, now, json.dumps(data))
+        )
+        if call_id:
+            self._write(_UPSERT_CALL, (
+                call_id,
+                normalize_phone_number(data.get('from')),
+                normalize_phone_number(data.get('to')),
+                status,
+                data.get('sid'),
+                now,
+                now,
+            ))
+
+    def record_transcript_lines(self, call_id: str, offset: int, lines: List[dict], replace: bool = False):
+        """Store lines from line number `offset` on; with `replace`, drop any stored lines after them."""
+        now = time.time()
+        if replace:
+            self._write('DELETE FROM transcript_lines WHERE call_id = ? AND line_no >= ?', (call_id, offset))
+        for line_no, line in enumerate(lines, start=offset):
+            self._write(
+                'INSERT OR REPLACE INTO transcript_lines (call_id, line_no, speaker, text, received_at) VALUES (?, ?, ?, ?, ?)',
+                (call_id, line_no, line.get('user'), line.get('text'), now)
+            )
+
+    def record_booking(self, outcome: str, phone_number: str = None, event_id: str = None, event_link: str = None,
+                       summary: str = None, start_time=None, end_time=None, error: str = None):
+        """Record a booking outcome ('booked', 'updated', 'deleted' or 'failed')."""
+        self._write(
+            'INSERT INTO bookings (outcome, event_id, event_link, phone_number, summary, start_time, end_time, error, recorded_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                outcome, event_id, event_link, normalize_phone_number(phone_number), summary,
+                start_time.isoformat() if start_time else None,
+                end_time.isoformat() if end_time else None,
+                error, time.time(),
+            )
+        )
+
+    # --- Queries ---
+
+    def calls_by_number(self, phone_number: str, limit: int = 50) -> List[dict]:
+        normalized = normalize_phone_number(phone_number)
+        return self._query(
+            'SELECT * FROM calls WHERE from_number = ? '
+            'UNION SELECT * FROM calls WHERE to_number = ? '
+            'ORDER BY last_seen DESC LIMIT ?',
+            (normalized, normalized, limit)
+        )
+
+    def recent_calls(self, limit: int = 50) -> List[dict]:
+        return self._query('SELECT * FROM calls ORDER BY last_seen DESC LIMIT ?', (limit,))
+
+    def call_history(self, call_id: str) -> dict:
+        calls = self._query('SELECT * FROM calls WHERE call_id = ?', (call_id,))
+        events = self._query(
+            'SELECT event, status, received_at FROM call_events WHERE call_id = ? ORDER BY received_at', (call_id,)
+        )
+        lines = self._query(
+            'SELECT line_no, speaker AS user, text FROM transcript_lines WHERE call_id = ? ORDER BY line_no', (call_id,)
+        )
+        return {'call': calls[0] if calls else None, 'events': events, 'transcript': lines}
+
+    def bookings_per_day(self, start_day: str, end_day: str) -> List[dict]:
+        """Booking outcomes per appointment day (the local date in start_time), days inclusive."""
+        return self._query(
+            "SELECT substr(start_time, 1, 10) AS day, "
+            "SUM(outcome = 'booked') AS booked, SUM(outcome = 'updated') AS updated "
+            "FROM bookings WHERE start_time >= ? AND start_time < ? AND outcome IN ('booked', 'updated') "
+            "GROUP BY day ORDER BY day",
+            # '~' sorts after any 'T...' time suffix, so the whole of end_day is included
+            (start_day, end_day + '~')
+        )
+
+
+def create_call_store() -> CallStore:
+    return CallStore(
+        config.CALL_STORE_DB_PATH,
+        batch_size=config.CALL_STORE_BATCH_SIZE,
+        flush_interval=config.CALL_STORE_FLUSH_INTERVAL_SECONDS,
+        max_pending=config.CALL_STORE_MAX_PENDING,
+    )
@@ -0,0 +1,335 @@
+import csv
+import io
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import metrics
+from bland_client import CALL_OVERRIDE_FIELDS, CircuitOpenError, build_call_data
+from call_registry import TERMINAL_STATUSES
+from phone_index import normalize_phone_number
+
+# Per-number dispatch states, in the order a number normally moves through them
+PENDING = 'pending'
+RETRYING = 'retrying'
+DISPATCHING = 'dispatching'
+DISPATCHED = 'dispatched'      # Bland AI accepted the call; it is ringing or in progress
+COMPLETED = 'completed'        # the call reached a terminal status (see the webhook)
+FAILED = 'failed'
+INVALID = 'invalid'            # not a usable phone number; never dispatched
+CANCELED = 'canceled'
+
+_OPEN_STATES = {PENDING, RETRYING, DISPATCHING}
+
+# Bland AI did not act on the request, so placing the call again cannot create a duplicate
+_RETRYABLE_HTTP_STATUSES = {429, 503}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Only failures where the call was certainly not placed: an open circuit, a connect timeout, or
+    a 429/503. A read timeout or another error may mean Bland AI did place it, so those are final.
+    """
+    if isinstance(error, (CircuitOpenError, requests.exceptions.ConnectTimeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None and response.status_code in _RETRYABLE_HTTP_STATUSES
+
+
+def parse_call_overrides(data) -> dict:
+    """Pick and validate the per-campaign call settings from a JSON body or form; raises ValueError."""
+    overrides = {}
+    for field in CALL_OVERRIDE_FIELDS:
+        value = data.get(field)
+        if value is None or value == '':
+            continue
+        if field in ('pathway_version', 'max_duration'):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be an integer")
+            if value <= 0:
+                raise ValueError(f"{field} must be positive")
+        elif not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        overrides[field] = value
+    return overrides
+
+
+def numbers_from_csv(text: str) -> List[str]:
+    """
+    Phone numbers from CSV text: the column headed phone_number, phone or number if there is one,
+    otherwise the first column (a first row without digits in it is taken as a header).
+    """
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    column = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in ('phone_number', 'phone', 'number'):
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+    else:
+        if not any(ch.isdigit() for ch in rows[0][0]):
+            rows = rows[1:]
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class Campaign:
+    def __init__(self, phone_numbers: List[str], overrides: dict, name: str = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.overrides = overrides
+        self.created_at = time.time()
+        self.canceled = False
+        # Normalized number -> progress entry; duplicates collapse onto the first occurrence
+        self.numbers: 'OrderedDict[str, dict]' = OrderedDict()
+        for raw in phone_numbers:
+            normalized = normalize_phone_number(raw)
+            key = normalized or raw
+            if key in self.numbers:
+                continue
+            self.numbers[key] = {
+                'phone_number': key,
+                'status': PENDING if normalized else INVALID,
+                'attempts': 0,
+                'call_id': None,
+                'call_status': None,
+                'error': None if normalized else 'Not a valid phone number',
+                'updated_at': self.created_at,
+            }
+
+    def summary(self) -> dict:
+        counts = {}
+        for entry in self.numbers.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return {
+            'campaign_id': self.id,
+            'name': self.name,
+            'overrides': self.overrides,
+            'created_at': self.created_at,
+            'canceled': self.canceled,
+            'total': len(self.numbers),
+            'counts': counts,
+            'done': not any(status in _OPEN_STATES for status in counts),
+        }
+
+
+class CampaignDispatcher:
+    """
+    Places the calls of bulk outbound campaigns through Bland AI without exceeding its limits.
+
+    `workers` background tasks take numbers off a shared queue. Before each call they take a token
+    from a bucket refilled at `calls_per_second` (bursts up to `burst`) and wait while
+    `max_concurrent_calls` placed calls are still live; a call stops counting once a webhook reports
+    a terminal status for it, or after `call_slot_timeout` seconds if that webhook never arrives.
+    Failures that certainly did not place a call are retried up to `max_attempts` times with
+    exponential backoff starting at `retry_backoff` seconds.
+    """
+
+    def __init__(self, create_call: Callable[[dict], dict], calls_per_second: float = 1.0, burst: int = 5,
+                 max_concurrent_calls: int = 10, workers: int = 4, max_attempts: int = 3,
+                 retry_backoff: float = 5.0, call_slot_timeout: float = 1800.0, max_campaigns: int = 100,
+                 start_worker: Optional[Callable] = None, create_queue: Optional[Callable] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.create_call = create_call
+        self.max_concurrent_calls = max_concurrent_calls
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.call_slot_timeout = call_slot_timeout
+        self.max_campaigns = max_campaigns
+        self.bucket = TokenBucket(calls_per_second, burst, sleep=sleep)
+        # Same defaults as WebhookQueue: api.py passes the Socket.IO server's green factories
+        self._start_worker = start_worker or self._start_thread
+        self._create_queue = create_queue or queue.Queue
+        self._sleep = sleep
+        self._queue = None
+        self._campaigns: 'OrderedDict[str, Campaign]' = OrderedDict()
+        # call_id (or a placeholder while the request is in flight) -> when its slot expires
+        self._live_calls: Dict[str, float] = {}
+        self._call_owners: Dict[str, tuple] = {}
+        self._slot_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _start_thread(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        with self._lock:
+            if self._queue is not None:
+                return
+            self._queue = self._create_queue()
+            for _ in range(self.workers):
+                self._start_worker(self._work)
+
+    # --- Campaigns ---
+
+    def start(self, phone_numbers: List[str], overrides: dict, name: str = None) -> Campaign:
+        self._ensure_started()
+        campaign = Campaign(phone_numbers, overrides, name)
+        with self._lock:
+            self._campaigns[campaign.id] = campaign
+            self._evict_finished()
+        for phone_number, entry in campaign.numbers.items():
+            if entry['status'] == PENDING:
+                self._queue.put((campaign.id, phone_number))
+        return campaign
+
+    def _evict_finished(self):
+        for campaign_id in list(self._campaigns):
+            if len(self._campaigns) <= self.max_campaigns:
+                return
+            if self._campaigns[campaign_id].summary()['done']:
+                del self._campaigns[campaign_id]
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        return self._campaigns.get(campaign_id)
+
+    def list_campaigns(self) -> List[dict]:
+        return [campaign.summary() for campaign in reversed(list(self._campaigns.values()))]
+
+    def cancel(self, campaign_id: str) -> Optional[Campaign]:
+        """Stop dispatching a campaign; numbers not yet handed to Bland AI are marked canceled."""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        with self._lock:
+            campaign.canceled = True
+            for entry in campaign.numbers.values():
+                if entry['status'] in (PENDING, RETRYING):
+                    self._update(entry, status=CANCELED)
+        return campaign
+
+    @staticmethod
+    def _update(entry: dict, **fields):
+        entry.update(fields, updated_at=time.time())
+
+    # --- Live call slots ---
+
+    def _reserve_slot(self) -> str:
+        """Block until fewer than max_concurrent_calls are live, then hold a slot."""
+        slot = f"pending:{next(self._slot_ids)}"
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                for call_id, expires_at in list(self._live_calls.items()):
+                    if expires_at <= now:
+                        del self._live_calls[call_id]
+                        self._call_owners.pop(call_id, None)
+                if len(self._live_calls) < self.max_concurrent_calls:
+                    self._live_calls[slot] = now + self.call_slot_timeout
+                    return slot
+            self._sleep(0.5)
+
+    def _release_slot(self, slot: str, call_id: str = None):
+        with self._lock:
+            expires_at = self._live_calls.pop(slot, None)
+            if call_id and expires_at is not None:
+                self._live_calls[call_id] = expires_at
+
+    def live_calls(self) -> int:
+        return len(self._live_calls)
+
+    def call_event(self, data: dict):
+        """Webhook hook: record the call's status and free its slot once it has ended."""
+        call_id = data.get('call_id')
+        status = data.get('status')
+        owner = self._call_owners.get(call_id)
+        if owner is None:
+            return
+        ended = data.get('completed') is True or status in TERMINAL_STATUSES
+        with self._lock:
+            campaign = self._campaigns.get(owner[0])
+            entry = campaign.numbers.get(owner[1]) if campaign else None
+            if entry is not None:
+                self._update(entry, call_status=status or entry['call_status'], status=COMPLETED if ended else entry['status'])
+            if ended:
+                self._live_calls.pop(call_id, None)
+                self._call_owners.pop(call_id, None)
+
+    # --- Workers ---
+
+    def _work(self):
+        while True:
+            campaign_id, phone_number = self._queue.get()
+            try:
+                self._dispatch(campaign_id, phone_number)
+            except Exception:
+                logging.exception(f"Campaign {campaign_id}: unexpected error dispatching {phone_number}")
+
+    def _dispatch(self, campaign_id: str, phone_number: str):
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None or campaign.canceled:
+            return
+        entry = campaign.numbers[phone_number]
+
+        slot = self._reserve_slot()
+        self.bucket.acquire()
+        if campaign.canceled:
+            self._release_slot(slot)
+            return
+        self._update(entry, status=DISPATCHING, attempts=entry['attempts'] + 1)
+        try:
+            response = self.create_call(build_call_data(phone_number, campaign.overrides))
+        except Exception as e:
+            self._release_slot(slot)
+            metrics.errors.inc(source='campaign', type=type(e).__name__)
+            if is_retryable(e) and entry['attempts'] < self.max_attempts:
+                self._update(entry, status=RETRYING, error=str(e))
+                self._start_worker(self._retry_later, campaign_id, phone_number, self.retry_backoff * 2 ** (entry['attempts'] - 1))
+            else:
+                self._update(entry, status=FAILED, error=str(e))
+            return
+
+        call_id = response.get('call_id')
+        self._release_slot(slot, call_id)
+        if call_id:
+            self._call_owners[call_id] = (campaign_id, phone_number)
+        self._update(entry, status=DISPATCHED, call_id=call_id, error=None)
+
+    def _retry_later(self, campaign_id: str, phone_number: str, delay: float):
+        self._sleep(delay)
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is not None and campaign.numbers[phone_number]['status'] == RETRYING:
+            self._queue.put((campaign_id, phone_number))
@@ -0,0 +1,42 @@
+"""
+Fan-out helper for independent upstream calls.
+
+The app runs under eventlet with the standard library monkey-patched (see the top of api.py), so
+sockets, sleeps and locks are green and the calls below overlap on the network instead of running
+one after another.
+"""
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+import eventlet
+
+
+def _capture(call: Callable[[], Any]) -> Tuple[Any, Optional[Exception]]:
+    try:
+        return call(), None
+    except Exception as e:
+        return None, e
+
+
+def run_concurrently(calls: List[Callable[[], Any]], limit: Optional[int] = None) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Run each zero-argument callable in its own greenthread and wait for all of them, with at most
+    `limit` running at once if given. Returns a (result, error) pair per call, in order; one
+    failure does not cancel the others.
+    """
+    if len(calls) == 1:
+        return [_capture(calls[0])]
+    if limit is not None and limit < len(calls):
+        return list(eventlet.GreenPool(limit).imap(_capture, calls))
+    threads = [eventlet.spawn(_capture, call) for call in calls]
+    return [thread.wait() for thread in threads]
+
+
+def spawn_background(fn: Callable[..., Any], *args):
+    """Fire-and-forget: run fn in a greenthread, logging (not raising) anything it throws."""
+    def run():
+        try:
+            fn(*args)
+        except Exception:
+            logging.exception(f"Background task {getattr(fn, '__qualname__', fn)} failed")
+    eventlet.spawn_n(run)
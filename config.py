@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 import json
 from datetime import datetime
@@ -16,8 +17,27 @@ SCOPES = [
 ]
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
-WORK_START_HOUR=8
-WORK_END_HOUR= 19
+WORK_START_HOUR = int(os.getenv("WORK_START_HOUR", "8"))
+WORK_END_HOUR = int(os.getenv("WORK_END_HOUR", "19"))
+# Free-slot search: align offered slot starts to this many minutes (e.g. 15); unset packs slots back to back
+FREE_SLOT_STEP_MINUTES = int(os.getenv("FREE_SLOT_STEP_MINUTES", "0")) or None
+# Where busy times for the primary calendar come from: "grid" (precomputed availability bitmap, falling back to the
+# cache outside its window), "cache" (local event cache), "events" (events().list pages streamed per request; also
+# used by grid and cache until the first sync completes) or "freebusy" (native freebusy query).
+# Requests naming several calendars always use the freebusy query.
+FREE_BUSY_BACKEND = os.getenv("FREE_BUSY_BACKEND", "grid")
+# Availability grid: rolling window (days), cell size (minutes), and how old (seconds) the calendar copy behind it may
+# get before a request syncs first instead of answering from the grid (it is refreshed in the background before then)
+AVAILABILITY_WINDOW_DAYS = int(os.getenv("AVAILABILITY_WINDOW_DAYS", "14"))
+AVAILABILITY_GRANULARITY_MINUTES = int(os.getenv("AVAILABILITY_GRANULARITY_MINUTES", "15"))
+AVAILABILITY_MAX_STALENESS_SECONDS = float(os.getenv("AVAILABILITY_MAX_STALENESS_SECONDS", "300"))
+# Local calendar cache: how old (in seconds) the in-memory copy may get before a read triggers an incremental sync
+EVENT_CACHE_MAX_STALENESS_SECONDS = float(os.getenv("EVENT_CACHE_MAX_STALENESS_SECONDS", "30"))
+# Phone number index: set a path to persist it in SQLite across restarts (in-memory only when unset)
+PHONE_INDEX_DB_PATH = os.getenv("PHONE_INDEX_DB_PATH")
+# Country code assumed for phone numbers given without one when matching them to calendar events
+# and call records (India by default); campaigns only accept numbers in E.164 and never assume one
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "91")
 # System Prompt for the AI Agent
 SYSTEM_PROMPT = """You are a Smart Scheduler AI Agent. Your primary goal is to assist users in managing their calendar.
     You have access to the following tools:
@@ -62,3 +82,77 @@ BLAND_AI_INBOUND_NUMBER=os.getenv("BLAND_AI_INBOUND_NUMBER")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+# Twilio call control (call_control.py): live-call updates in flight at once (also the size of the HTTP connection pool),
+# and the timeout for each Twilio request (seconds)
+TWILIO_MAX_CONCURRENT_UPDATES = int(os.getenv("TWILIO_MAX_CONCURRENT_UPDATES", "10"))
+TWILIO_TIMEOUT_SECONDS = float(os.getenv("TWILIO_TIMEOUT_SECONDS", "10"))
+# Bland AI HTTP client: pooled keep-alive session, timeouts (seconds), retries for idempotent calls and circuit breaker
+BLAND_AI_BASE_URL = os.getenv("BLAND_AI_BASE_URL", "https://api.bland.ai")
+BLAND_AI_CONNECT_TIMEOUT = float(os.getenv("BLAND_AI_CONNECT_TIMEOUT", "3.05"))
+BLAND_AI_READ_TIMEOUT = float(os.getenv("BLAND_AI_READ_TIMEOUT", "10"))
+BLAND_AI_MAX_RETRIES = int(os.getenv("BLAND_AI_MAX_RETRIES", "2"))
+BLAND_AI_BACKOFF_BASE_SECONDS = float(os.getenv("BLAND_AI_BACKOFF_BASE_SECONDS", "0.2"))
+BLAND_AI_POOL_SIZE = int(os.getenv("BLAND_AI_POOL_SIZE", "20"))
+BLAND_AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("BLAND_AI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+BLAND_AI_CIRCUIT_RESET_SECONDS = float(os.getenv("BLAND_AI_CIRCUIT_RESET_SECONDS", "30"))
+# Bland AI webhook ingestion: bounded queue size, background worker count and retry de-duplication window (seconds)
+WEBHOOK_QUEUE_MAXSIZE = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", "1000"))
+WEBHOOK_QUEUE_WORKERS = int(os.getenv("WEBHOOK_QUEUE_WORKERS", "2"))
+WEBHOOK_DEDUP_TTL_SECONDS = float(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "600"))
+# Active call registry: "memory" (single process) or "redis" (shared by all workers; needs the redis package)
+CALL_REGISTRY_BACKEND = os.getenv("CALL_REGISTRY_BACKEND", "memory")
+CALL_REGISTRY_TTL_SECONDS = float(os.getenv("CALL_REGISTRY_TTL_SECONDS", "3600"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Socket.IO message queue URL for multi-worker deployments (unset for a single worker)
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+# How long (seconds) /bland-ai/transcript serves a cached copy of a call that is still in progress
+TRANSCRIPT_CACHE_TTL_SECONDS = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", "2"))
+# Local SQLite store for call events, transcripts and booking outcomes (":memory:" keeps it in-process only). The
+# default is in the temp directory, the one writable place on read-only hosts such as Vercel
+CALL_STORE_DB_PATH = os.getenv("CALL_STORE_DB_PATH", os.path.join(tempfile.gettempdir(), "call_store.db"))
+CALL_STORE_BATCH_SIZE = int(os.getenv("CALL_STORE_BATCH_SIZE", "100"))
+CALL_STORE_FLUSH_INTERVAL_SECONDS = float(os.getenv("CALL_STORE_FLUSH_INTERVAL_SECONDS", "1"))
+# Writes kept while the call store database is unavailable; beyond this the oldest are dropped
+CALL_STORE_MAX_PENDING = int(os.getenv("CALL_STORE_MAX_PENDING", "10000"))
+# Google API transport: idle keep-alive connections kept for reuse, and per-request socket timeout (seconds)
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "10"))
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "30"))
+# Google credentials, first match wins: a service account key (the JSON itself, handy where there is no filesystem, or
+# a file path) optionally impersonating a Workspace user via domain-wide delegation; a user token stored as JSON (create
+# it with `python google_credentials.py`); or, only when GOOGLE_OAUTH_INTERACTIVE is true, the browser consent flow.
+# Access tokens are refreshed in the background this many seconds before they expire.
+GOOGLE_SERVICE_ACCOUNT_INFO = os.getenv("GOOGLE_SERVICE_ACCOUNT_INFO")
+GOOGLE_SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE")
+GOOGLE_DELEGATED_USER = os.getenv("GOOGLE_DELEGATED_USER")
+GOOGLE_TOKEN_PATH = os.getenv("GOOGLE_TOKEN_PATH", "token.json")
+GOOGLE_OAUTH_INTERACTIVE = os.getenv("GOOGLE_OAUTH_INTERACTIVE", "false").lower() in ("1", "true", "yes")
+GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS", "600"))
+# Calendar push notifications: public HTTPS URL of /calendar/v3/notifications (unset disables the watch channel),
+# the token Google echoes back on every notification, and how long (seconds) each channel lives before renewal
+CALENDAR_WEBHOOK_URL = os.getenv("CALENDAR_WEBHOOK_URL")
+CALENDAR_WEBHOOK_TOKEN = os.getenv("CALENDAR_WEBHOOK_TOKEN")
+CALENDAR_WATCH_TTL_SECONDS = int(os.getenv("CALENDAR_WATCH_TTL_SECONDS", "604800"))
+# Outbound call campaigns: dispatch rate (calls/second) and burst, live calls allowed at once (Bland AI concurrency
+# limit), dispatcher workers, attempts per number for failures that did not place a call, and first retry delay (seconds)
+CAMPAIGN_CALLS_PER_SECOND = float(os.getenv("CAMPAIGN_CALLS_PER_SECOND", "1"))
+CAMPAIGN_BURST = int(os.getenv("CAMPAIGN_BURST", "5"))
+CAMPAIGN_MAX_CONCURRENT_CALLS = int(os.getenv("CAMPAIGN_MAX_CONCURRENT_CALLS", "10"))
+CAMPAIGN_WORKERS = int(os.getenv("CAMPAIGN_WORKERS", "4"))
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3"))
+CAMPAIGN_RETRY_BACKOFF_SECONDS = float(os.getenv("CAMPAIGN_RETRY_BACKOFF_SECONDS", "5"))
+CAMPAIGN_MAX_NUMBERS = int(os.getenv("CAMPAIGN_MAX_NUMBERS", "5000"))
+# Slot locks (SQLite, in the temp directory by default; share the path between workers on one host): how long offered
+# slots stay held for the caller, how long a booking in flight holds its slot, and how long Idempotency-Key responses
+# are kept for replay (seconds)
+SLOT_LOCK_DB_PATH = os.getenv("SLOT_LOCK_DB_PATH", os.path.join(tempfile.gettempdir(), "slot_locks.db"))
+SLOT_HOLD_TTL_SECONDS = float(os.getenv("SLOT_HOLD_TTL_SECONDS", "120"))
+# Most slots one reservation holds at once (a caller asking again replaces its earlier holds)
+SLOT_HOLD_MAX_PER_RESERVATION = int(os.getenv("SLOT_HOLD_MAX_PER_RESERVATION", "10"))
+BOOKING_LOCK_TTL_SECONDS = float(os.getenv("BOOKING_LOCK_TTL_SECONDS", "60"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Profiling (profiling.py): off unless PROFILING_TOKEN is set; callers send it as X-Profile-Token. Sampling sessions
+# last at most PROFILING_MAX_SECONDS, and the last PROFILING_KEEP profiles are kept for download
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "10"))
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "20"))
@@ -0,0 +1,241 @@
+import datetime
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from concurrency import spawn_background
+from time_parsing import parse_utc
+
+
+def http_error_status(error: BaseException) -> Optional[int]:
+    """
+    The HTTP status of a googleapiclient HttpError, or None for any other exception. googleapiclient
+    is loaded by the first request, so the error class is looked up, not imported (cold starts).
+    """
+    errors = sys.modules.get('googleapiclient.errors')
+    if errors is not None and isinstance(error, errors.HttpError):
+        return error.resp.status
+    return None
+
+
+def parse_event_span(event: dict) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+    """Return the (start, end) of a timed event as aware UTC datetimes, or None for all-day events."""
+    start = event.get('start', {}).get('dateTime')
+    end = event.get('end', {}).get('dateTime')
+    if not start or not end:
+        return None
+    return parse_utc(start), parse_utc(end)
+
+
+# Event properties the app reads (partial responses keep pages, and the cache, small)
+EVENT_FIELDS = 'id,status,summary,description,start,end'
+# Events per events().list page: large for full syncs (fewer round trips); streaming reads, which
+# usually stop after a page or two, start small and grow
+SYNC_PAGE_SIZE = 2500
+STREAM_PAGE_SIZE = 100
+
+
+def iter_event_pages(service, calendar_id: str, fields: str = EVENT_FIELDS, page_size: int = SYNC_PAGE_SIZE,
+                     max_page_size: Optional[int] = None, **params) -> Iterator[dict]:
+    """
+    Lazily yield events().list result pages, following nextPageToken. A page is requested only when
+    the previous one has been consumed, so a caller that stops early never fetches the rest. With
+    `max_page_size`, each page asks for twice as many events as the last (up to it), so a caller
+    that reads everything after all needs only a few more round trips than with large pages.
+    """
+    params = dict(params, calendarId=calendar_id, fields=f"nextPageToken,nextSyncToken,items({fields})")
+    while True:
+        params['maxResults'] = page_size
+        with metrics.track_upstream('google', 'events.list'):
+            page = service.events().list(**params).execute()
+        yield page
+        if not page.get('nextPageToken'):
+            return
+        params['pageToken'] = page['nextPageToken']
+        if max_page_size:
+            page_size = min(page_size * 2, max_page_size)
+
+
+def iter_events(service, calendar_id: str, fields: str = EVENT_FIELDS, page_size: int = STREAM_PAGE_SIZE,
+                max_page_size: Optional[int] = SYNC_PAGE_SIZE, **params) -> Iterator[dict]:
+    """Lazily yield the events of every page of an events().list query (see iter_event_pages)."""
+    for page in iter_event_pages(service, calendar_id, fields, page_size, max_page_size, **params):
+        yield from page.get('items', [])
+
+
+class EventCache:
+    """
+    In-process copy of a calendar kept current with Calendar API incremental sync.
+
+    The first read does a full `events().list` and keeps the `nextSyncToken`; later reads
+    only pull what changed since that token, and only once the copy is older than
+    `max_staleness` seconds or has been invalidated by a local write. A full resync replaces
+    the copy only once it has all arrived, so readers never see a half-filled calendar.
+    """
+
+    def __init__(self, service, calendar_id: str = 'primary', max_staleness: float = 30.0, listeners: list = None):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.max_staleness = max_staleness
+        self._events: Dict[str, dict] = {}
+        self._spans: Dict[str, Tuple[datetime.datetime, datetime.datetime]] = {}
+        self._sync_token: Optional[str] = None
+        self._last_sync: Optional[float] = None
+        self._dirty = True
+        # Bumped by every invalidate(), so a sync can tell whether one landed while it was fetching.
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        # Derived indexes (e.g. PhoneIndex) that are told about every change to the cache.
+        self.listeners = list(listeners or [])
+
+    def invalidate(self):
+        """Force the next read to sync with Google before answering."""
+        self._invalidations += 1
+        self._dirty = True
+
+    def has_synced(self) -> bool:
+        return self._last_sync is not None
+
+    def age(self) -> Optional[float]:
+        """Seconds since the last successful sync, or None before the first one."""
+        if self._last_sync is None:
+            return None
+        return time.monotonic() - self._last_sync
+
+    def is_fresh(self) -> bool:
+        if self._dirty or self._last_sync is None:
+            return False
+        return time.monotonic() - self._last_sync < self.max_staleness
+
+    def ensure_fresh(self):
+        if self.is_fresh():
+            metrics.cache_requests.inc(cache='events', result='hit')
+            return
+        with self._lock:
+            # Another greenlet may have synced while we were waiting for the lock.
+            if self.is_fresh():
+                metrics.cache_requests.inc(cache='events', result='coalesced')
+                return
+            metrics.cache_requests.inc(cache='events', result='miss')
+            self._sync()
+
+    def refresh_in_background(self):
+        """Start a sync in a greenthread if one is due and none is running; readers are not held up."""
+        if self.is_fresh() or self._lock.locked():
+            return
+        spawn_background(self.ensure_fresh)
+
+    def _sync(self):
+        invalidations = self._invalidations
+        for listener in self.listeners:
+            listener.sync_started()
+        try:
+            if self._sync_token:
+                try:
+                    self._fetch(sync_token=self._sync_token)
+                except Exception as e:
+                    if http_error_status(e) != 410:
+                        raise
+                    # 410 GONE: the sync token expired, start over with a full sync.
+                    print(f"Sync token for calendar {self.calendar_id} expired, doing a full sync.")
+                    self._fetch(sync_token=None)
+            else:
+                self._fetch(sync_token=None)
+        except Exception:
+            for listener in self.listeners:
+                listener.sync_finished(False)
+            raise
+        self._last_sync = time.monotonic()
+        # A write that landed mid-sync may not be in what we fetched, so it keeps us dirty.
+        if self._invalidations == invalidations:
+            self._dirty = False
+        for listener in self.listeners:
+            listener.sync_finished(True)
+
+    def _fetch(self, sync_token: Optional[str]):
+        if sync_token is None:
+            self._fetch_all()
+            return
+        pages = iter_event_pages(self.service, self.calendar_id, singleEvents=True, showDeleted=True, syncToken=sync_token)
+        for page in pages:
+            for event in page.get('items', []):
+                if event.get('status') == 'cancelled':
+                    self._discard(event['id'])
+                else:
+                    self._store(event)
+            if not page.get('nextPageToken'):
+                self._sync_token = page.get('nextSyncToken')
+
+    def _fetch_all(self):
+        """
+        Full sync: collect every page into new tables and swap them in (and have the listeners
+        rebuild from them) only once the last page, with the new sync token, has arrived. Until then
+        readers keep the previous copy, and a failure part-way through leaves it untouched.
+        """
+        events: Dict[str, dict] = {}
+        sync_token = None
+        for page in iter_event_pages(self.service, self.calendar_id, singleEvents=True, showDeleted=True):
+            for event in page.get('items', []):
+                if event.get('status') == 'cancelled':
+                    events.pop(event['id'], None)
+                else:
+                    events[event['id']] = event
+            if not page.get('nextPageToken'):
+                sync_token = page.get('nextSyncToken')
+        spans = {}
+        for event_id, event in events.items():
+            span = parse_event_span(event)
+            if span:
+                spans[event_id] = span
+        self._events, self._spans, self._sync_token = events, spans, sync_token
+        for listener in self.listeners:
+            listener.cache_reset()
+            for event in events.values():
+                listener.event_stored(event)
+
+    def _store(self, event: dict):
+        event_id = event['id']
+        self._events[event_id] = event
+        span = parse_event_span(event)
+        if span:
+            self._spans[event_id] = span
+        else:
+            self._spans.pop(event_id, None)
+        for listener in self.listeners:
+            listener.event_stored(event)
+
+    def _discard(self, event_id: str):
+        self._events.pop(event_id, None)
+        self._spans.pop(event_id, None)
+        for listener in self.listeners:
+            listener.event_discarded(event_id)
+
+    def upsert(self, event: dict):
+        """Record an event this process just created or updated, and invalidate."""
+        with self._lock:
+            self._store(event)
+        self.invalidate()
+
+    def remove(self, event_id: str):
+        """Record an event this process just deleted, and invalidate."""
+        with self._lock:
+            self._discard(event_id)
+        self.invalidate()
+
+    def get(self, event_id: str) -> Optional[dict]:
+        return self._events.get(event_id)
+
+    def span(self, event_id: str) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        return self._spans.get(event_id)
+
+    def busy_spans(self, start_time: datetime.datetime, end_time: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """Timed events overlapping [start_time, end_time), sorted by start, as UTC datetimes."""
+        self.ensure_fresh()
+        spans = [
+            (start, end) for start, end in list(self._spans.values())
+            if start < end_time and end > start_time
+        ]
+        spans.sort()
+        return spans
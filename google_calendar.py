@@ -1,182 +1,461 @@
 import datetime
-from typing import List, Tuple
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-import os
-import pickle
-import pytz
-import json
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 import config
+import metrics
+from concurrency import run_concurrently, spawn_background
+from availability import AvailabilityGrid
+from event_cache import EVENT_FIELDS, EventCache, http_error_status, iter_events, parse_event_span
+from google_credentials import create_credential_manager, load_credentials
+from phone_index import create_phone_index
+from slot_engine import BusyLookup, intersect_busy, iter_free_slots, merge_intervals, top_slots, union_busy
+from time_parsing import UTC, get_timezone, parse_utc
 
 load_dotenv()
 
 # Constants
 SCOPES = ['https://www.googleapis.com/auth/calendar']
-IST = pytz.timezone('Asia/Kolkata')
-WORK_START_HOUR = 9
-WORK_END_HOUR = 19    
+IST = get_timezone('Asia/Kolkata')
+WORK_START_HOUR = config.WORK_START_HOUR
+WORK_END_HOUR = config.WORK_END_HOUR
+
+# freebusy().query accepts at most this many calendars per request
+FREE_BUSY_MAX_CALENDARS = 50
+# Calendar API requests per batch HTTP request (Google allows up to 1000 but recommends staying small)
+BATCH_MAX_REQUESTS = 50
 
 # --- API Keys and Clients ---
 DEEPGRAM_API_KEY = config.DEEPGRAM_API_KEY  # (Unused, but left for config completeness)
 
+class FreeBusyError(Exception):
+    """Google reported an error for one of the calendars in a freebusy query (e.g. unknown calendar ID)."""
+
+
 class GoogleCalendarService:
     def __init__(self):
-        self.service = self._authenticate()
+        # The Google client libraries are imported here, not at module level, so that importing the
+        # app (a serverless cold start) does not pay for them until the calendar is first used.
+        from google_http import create_http_pool
+        # Refreshed in the background ahead of expiry, so requests do not wait on the token endpoint
+        self.credentials = create_credential_manager(self._authenticate())
+        self.credentials.ensure_valid()
+        spawn_background(self.credentials.keep_fresh)
+        # Each request borrows its own connection from the pool; httplib2 connections are not green-safe to share
+        self.http_pool = create_http_pool(self.credentials)
+        self.service = self._build_service()
+        self.phone_index = create_phone_index()
+        self.availability = AvailabilityGrid(
+            days=config.AVAILABILITY_WINDOW_DAYS,
+            granularity=datetime.timedelta(minutes=config.AVAILABILITY_GRANULARITY_MINUTES),
+        )
+        self.cache = EventCache(
+            self.service, 'primary',
+            max_staleness=config.EVENT_CACHE_MAX_STALENESS_SECONDS,
+            listeners=[self.phone_index, self.availability]
+        )
+        # The Calendar push notification channel currently open for the primary calendar, if any
+        self.watch_channel: Optional[dict] = None
 
     def _authenticate(self):
-        creds = None
-        if os.path.exists('token.json'):
-            try:
-                with open('token.json', 'rb') as token:
-                    creds = pickle.load(token)
-            except pickle.UnpicklingError:
-                print("Warning: token.json is corrupted. Deleting and re-authenticating.")
-                os.remove('token.json')
-                creds = None # Force re-authentication
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-                # Use a fixed port and explicitly set the redirect URI
-                creds = flow.run_local_server(
-                    port=5000,
-                    authorization_prompt_message='Please visit this URL: {url}',
-                    success_message='The auth flow is complete; you may close this window.',
-                    open_browser=True
-                )
-
-            with open('token.json', 'wb') as token:
-                pickle.dump(creds, token)
-
-        return build('calendar', 'v3', credentials=creds)
+        # Service account, stored JSON user token, or (only if GOOGLE_OAUTH_INTERACTIVE) the browser flow
+        return load_credentials(SCOPES)
+
+    def _build_service(self):
+        from google_http import build_calendar_service
+        return build_calendar_service(self.http_pool)
 
     def get_busy_events_for_day(self, start_time: datetime.datetime, end_time: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
-        time_min = start_time.astimezone(pytz.UTC).isoformat()
-        time_max = end_time.astimezone(pytz.UTC).isoformat()
+        # Served from the local event cache; it syncs incrementally with Google when stale.
+        return [
+            (start_dt_utc.astimezone(IST), end_dt_utc.astimezone(IST))
+            for start_dt_utc, end_dt_utc in self.cache.busy_spans(start_time, end_time)
+        ]
 
-        events_result = self.service.events().list(
-            calendarId='primary',
-            timeMin=time_min,
-            timeMax=time_max,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        events = events_result.get('items', [])
-        
-        busy_slots = []
+    def stream_busy_intervals(self, start_time: datetime.datetime, end_time: datetime.datetime) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+        """
+        Busy intervals straight from events().list, sorted by start as UTC datetimes, fetching a page
+        of STREAM_PAGE_SIZE events at a time only as the caller asks for more: a slot search that
+        finds its slots in the first page never requests the second.
+        """
+        events = iter_events(
+            self.service, 'primary', fields='id,start,end',
+            timeMin=start_time.astimezone(UTC).isoformat(), timeMax=end_time.astimezone(UTC).isoformat(),
+            singleEvents=True, orderBy='startTime',
+        )
         for event in events:
-            start = event['start'].get('dateTime')
-            end = event['end'].get('dateTime')
+            span = parse_event_span(event)
+            if span:
+                yield span
+
+    def grid_busy_intervals(self, start_time: datetime.datetime, end_time: datetime.datetime) -> Optional[Iterator[Tuple[datetime.datetime, datetime.datetime]]]:
+        """
+        Busy intervals from the availability grid, without touching the network. None when the grid
+        cannot answer: not built yet, range outside its window, or the calendar copy behind it is
+        older than AVAILABILITY_MAX_STALENESS_SECONDS. A stale or invalidated copy is refreshed in
+        the background while the grid keeps answering.
+        """
+        age = self.cache.age()
+        if age is None or age > config.AVAILABILITY_MAX_STALENESS_SECONDS:
+            return None
+        self.cache.refresh_in_background()
+        return self.availability.busy_intervals(start_time, end_time)
+
+    def watch_events(self, address: str, token: str, ttl_seconds: int) -> dict:
+        """Open a push notification channel on the primary calendar, then close the one it replaces."""
+        with metrics.track_upstream('google', 'events.watch'):
+            channel = self.service.events().watch(calendarId='primary', body={
+                'id': str(uuid.uuid4()),
+                'type': 'web_hook',
+                'address': address,
+                'token': token,
+                'params': {'ttl': str(ttl_seconds)},
+            }).execute()
+        previous, self.watch_channel = self.watch_channel, channel
+        if previous:
+            try:
+                with metrics.track_upstream('google', 'channels.stop'):
+                    self.service.channels().stop(body={'id': previous['id'], 'resourceId': previous['resourceId']}).execute()
+            except Exception as e:
+                if http_error_status(e) is None:
+                    raise
+                print(f"Failed to stop calendar watch channel {previous['id']}: {e}")
+        return channel
 
-            if start and end:
-                start_dt_utc = datetime.datetime.fromisoformat(start.replace('Z', '+00:00'))
-                end_dt_utc = datetime.datetime.fromisoformat(end.replace('Z', '+00:00'))
+    def watch_expires_in(self) -> Optional[float]:
+        """Seconds until the current push channel expires, or None if there is none."""
+        if not self.watch_channel or not self.watch_channel.get('expiration'):
+            return None
+        return int(self.watch_channel['expiration']) / 1000 - time.time()
 
-                busy_slots.append((
-                    start_dt_utc.astimezone(IST),
-                    end_dt_utc.astimezone(IST)
-                ))
-        return busy_slots
+    def handle_push_notification(self, resource_state: str):
+        # 'sync' only confirms a new channel; anything else means the calendar changed
+        if resource_state == 'sync':
+            return
+        self.cache.invalidate()
+        self.cache.refresh_in_background()
+
+    def query_free_busy(self, calendar_ids: List[str], start_time: datetime.datetime, end_time: datetime.datetime) -> Dict[str, List[Tuple[datetime.datetime, datetime.datetime]]]:
+        """
+        Busy intervals per calendar from the native freebusy().query endpoint, which returns only
+        (start, end) pairs instead of full event bodies. All calendars go in one request (chunked
+        at FREE_BUSY_MAX_CALENDARS, chunks sent concurrently), so latency does not grow with the
+        number of calendars.
+        """
+        chunks = [calendar_ids[i:i + FREE_BUSY_MAX_CALENDARS] for i in range(0, len(calendar_ids), FREE_BUSY_MAX_CALENDARS)]
+
+        def query(chunk):
+            with metrics.track_upstream('google', 'freebusy.query'):
+                return self.service.freebusy().query(body={
+                    'timeMin': start_time.astimezone(UTC).isoformat(),
+                    'timeMax': end_time.astimezone(UTC).isoformat(),
+                    'items': [{'id': calendar_id} for calendar_id in chunk],
+                }).execute()
+
+        busy_by_calendar = {}
+        for chunk, (result, error) in zip(chunks, run_concurrently([lambda chunk=chunk: query(chunk) for chunk in chunks])):
+            if error is not None:
+                raise error
+            for calendar_id in chunk:
+                calendar = result.get('calendars', {}).get(calendar_id, {})
+                if calendar.get('errors'):
+                    reasons = ', '.join(error.get('reason', 'unknown') for error in calendar['errors'])
+                    raise FreeBusyError(f"Calendar {calendar_id}: {reasons}")
+                busy_by_calendar[calendar_id] = [
+                    (
+                        parse_utc(busy['start']).astimezone(IST),
+                        parse_utc(busy['end']).astimezone(IST),
+                    )
+                    for busy in calendar.get('busy', [])
+                ]
+        return busy_by_calendar
+
+    def execute_batch(self, requests: list) -> List[Tuple[Optional[dict], Optional[Exception]]]:
+        """
+        Run API requests through batch HTTP requests of up to BATCH_MAX_REQUESTS each, so N
+        mutations cost ceil(N / BATCH_MAX_REQUESTS) round trips, sent concurrently. Returns a
+        (response, error) pair per request, in order; one failing item does not affect the others.
+        """
+        outcomes: List[Tuple[Optional[dict], Optional[Exception]]] = [(None, None)] * len(requests)
+
+        def callback(request_id, response, exception):
+            outcomes[int(request_id)] = (response, exception)
+
+        def execute(batch):
+            # Batches would otherwise share the client's single Http object; give each its own
+            with metrics.track_upstream('google', 'batch'), self.http_pool.connection() as http:
+                batch.execute(http=http)
+
+        batches = []
+        for i in range(0, len(requests), BATCH_MAX_REQUESTS):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index in range(i, min(i + BATCH_MAX_REQUESTS, len(requests))):
+                batch.add(requests[index], request_id=str(index))
+            batches.append(batch)
+        for _, error in run_concurrently([lambda batch=batch: execute(batch) for batch in batches]):
+            if error is not None:
+                raise error
+        return outcomes
 
     def book_meeting(self, start_time: datetime.datetime, end_time: datetime.datetime, summary: str = "Appointment", phone_number: str = None) -> str:
-        event = {
-            'summary': summary,
-            'start': {
-                'dateTime': start_time.astimezone(pytz.UTC).isoformat(),
-                'timeZone': 'Asia/Kolkata'
-            },
-            'end': {
-                'dateTime': end_time.astimezone(pytz.UTC).isoformat(),
-                'timeZone': 'Asia/Kolkata'
-            },
-            'reminders': {
-                'useDefault': True,
-            }
-        }
-        if phone_number:
-            event['description'] = f"Phone Number: {phone_number}"
+        event = _appointment_body(start_time, end_time, summary, phone_number)
 
-        created_event = self.service.events().insert(calendarId='primary', body=event).execute()
+        with metrics.track_upstream('google', 'events.insert'):
+            created_event = self.service.events().insert(calendarId='primary', body=event).execute()
+        self.cache.upsert(created_event)
         return created_event.get('htmlLink', '')
 
     def get_events_by_phone_number(self, phone_number: str) -> List[dict]:
         # Search for events in a reasonable time range (e.g., 1 year in the past, 1 year in the future)
-        now = datetime.datetime.now(pytz.UTC)
-        time_min = (now - datetime.timedelta(days=365)).isoformat()
-        time_max = (now + datetime.timedelta(days=365)).isoformat()
+        now = datetime.datetime.now(UTC)
+        time_min = now - datetime.timedelta(days=365)
+        time_max = now + datetime.timedelta(days=365)
 
-        events_result = self.service.events().list(
-            calendarId='primary',
-            timeMin=time_min,
-            timeMax=time_max,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        events = events_result.get('items', [])
+        if self.cache.has_synced() or not self.phone_index.warm:
+            self.cache.ensure_fresh()
+            events = [self.cache.get(event_id) for event_id in self.phone_index.lookup(phone_number)]
+        else:
+            # Cold start with an index persisted from a previous run: fetch just the indexed
+            # events instead of waiting for the first full sync of the calendar.
+            events = []
+            for event_id in self.phone_index.lookup(phone_number):
+                try:
+                    with metrics.track_upstream('google', 'events.get'):
+                        event = self.service.events().get(calendarId='primary', eventId=event_id, fields=EVENT_FIELDS).execute()
+                except Exception as e:
+                    if http_error_status(e) not in (404, 410):
+                        raise
+                    event = None
+                if event is None or event.get('status') == 'cancelled':
+                    self.phone_index.event_discarded(event_id)
+                    continue
+                events.append(event)
 
         matching_events = []
         for event in events:
-            description = event.get('description', '')
-            if f"Phone Number: {phone_number}" in description:
-                matching_events.append(event)
-        return matching_events
+            if event is None:
+                continue
+            span = parse_event_span(event)
+            if span and not (span[0] < time_max and span[1] > time_min):
+                continue
+            matching_events.append((span[0] if span else time_min, event))
+        matching_events.sort(key=lambda item: item[0])
+        return [event for _, event in matching_events]
 
 _calendar_service_instance = None
+_calendar_service_lock = threading.Lock()
 
 def get_calendar_service_instance():
     global _calendar_service_instance
     if _calendar_service_instance is None:
-        _calendar_service_instance = GoogleCalendarService()
+        # Concurrent first requests must not each run the OAuth flow and a full sync
+        with _calendar_service_lock:
+            if _calendar_service_instance is None:
+                _calendar_service_instance = GoogleCalendarService()
     return _calendar_service_instance
 
+def keep_calendar_watch(sleep, address: str, token: str, ttl_seconds: int):
+    """Background loop keeping a push notification channel open, renewing it well before it expires."""
+    renew_margin = min(86400, ttl_seconds / 10)
+    while True:
+        try:
+            service_instance = get_calendar_service_instance()
+            expires_in = service_instance.watch_expires_in()
+            if expires_in is None or expires_in < renew_margin:
+                channel = service_instance.watch_events(address, token, ttl_seconds)
+                print(f"Opened calendar watch channel {channel.get('id')} for {address}")
+            sleep(renew_margin / 2)
+        except Exception as e:
+            print(f"Failed to open calendar watch channel: {e}")
+            sleep(60)
+
 def get_busy_events_for_day(start_time: datetime.datetime, end_time: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
     service_instance = get_calendar_service_instance()
     return service_instance.get_busy_events_for_day(start_time, end_time)
 
-def find_free_slots(start_time: datetime.datetime, end_time: datetime.datetime, duration_minutes: int = 60) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+def get_busy_intervals(start_time: datetime.datetime, end_time: datetime.datetime, calendar_ids: Optional[List[str]] = None) -> Tuple[Iterable[Tuple[datetime.datetime, datetime.datetime]], bool]:
+    """
+    Busy intervals across the given calendars, and whether they are already sorted.
+
+    The primary calendar on its own is answered from the availability grid (busy times rounded
+    out to its cells) or the local event cache unless FREE_BUSY_BACKEND is 'freebusy'; anything
+    else goes through one native freebusy query. Before the cache's first full sync has finished,
+    and always with FREE_BUSY_BACKEND 'events', the primary calendar's events in the range are
+    streamed page by page instead, so a search for the first few slots reads only what it needs.
     """
-    Find all available time slots for a meeting of the specified duration within a given time range.
-    
+    service_instance = get_calendar_service_instance()
+    if not calendar_ids:
+        calendar_ids = ['primary']
+    if calendar_ids == ['primary'] and config.FREE_BUSY_BACKEND != 'freebusy':
+        if config.FREE_BUSY_BACKEND == 'events' or not service_instance.cache.has_synced():
+            if config.FREE_BUSY_BACKEND != 'events':
+                # Cold cache: answer now and let the full sync run in the background
+                service_instance.cache.refresh_in_background()
+            return service_instance.stream_busy_intervals(start_time, end_time), True
+        if config.FREE_BUSY_BACKEND == 'grid':
+            busy = service_instance.grid_busy_intervals(start_time, end_time)
+            if busy is not None:
+                return busy, True
+        return service_instance.get_busy_events_for_day(start_time, end_time), True
+    busy_by_calendar = service_instance.query_free_busy(calendar_ids, start_time, end_time)
+    return [interval for intervals in busy_by_calendar.values() for interval in intervals], len(busy_by_calendar) == 1
+
+def find_free_slots(start_time: datetime.datetime, end_time: datetime.datetime, duration_minutes: int = 60,
+                    limit: Optional[int] = None, step_minutes: Optional[int] = None,
+                    calendar_ids: Optional[List[str]] = None,
+                    also_busy: Optional[List[Tuple[datetime.datetime, datetime.datetime]]] = None) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    Find available time slots for a meeting of the specified duration within a given time range.
+
+    Busy events are merged into disjoint intervals and swept once against the working-hours
+    windows (WORK_START_HOUR to WORK_END_HOUR, in the timezone of start_time), stopping as soon
+    as `limit` slots have been found.
+
     Args:
-        start_time: Start of the time range (datetime object in IST).
-        end_time: End of the time range (datetime object in IST).
+        start_time: Start of the time range (timezone-aware datetime).
+        end_time: End of the time range (timezone-aware datetime).
         duration_minutes: Duration of the meeting in minutes.
-        
+        limit: Maximum number of slots to return (all of them if None).
+        step_minutes: Align slot starts to multiples of this many minutes and advance by it.
+            Defaults to config.FREE_SLOT_STEP_MINUTES; if that is unset too, slots are packed
+            back to back from the start of each free gap.
+        calendar_ids: Calendars that must all be free (defaults to ['primary']).
+        also_busy: Extra intervals to treat as busy, sorted by start (e.g. slots held for other callers).
+
+    Returns:
+        Chronologically ordered list of (start_time, end_time) tuples in the timezone of start_time
+    """
+    if step_minutes is None:
+        step_minutes = config.FREE_SLOT_STEP_MINUTES
+    busy_slots, busy_is_sorted = get_busy_intervals(start_time, end_time, calendar_ids)
+    if also_busy:
+        busy_slots = heapq.merge(busy_slots, also_busy) if busy_is_sorted else itertools.chain(busy_slots, also_busy)
+    slots = iter_free_slots(
+        start_time, end_time, busy_slots,
+        duration=datetime.timedelta(minutes=duration_minutes),
+        step=datetime.timedelta(minutes=step_minutes) if step_minutes else None,
+        work_start_hour=WORK_START_HOUR,
+        work_end_hour=WORK_END_HOUR,
+        busy_is_sorted=busy_is_sorted,
+    )
+    with metrics.stage_duration.time(stage='slot_search'):
+        return list(itertools.islice(slots, limit))
+
+def find_free_slots_batch(windows: List[Tuple[datetime.datetime, datetime.datetime, int]], limit: Optional[int] = None,
+                          step_minutes: Optional[int] = None, calendar_ids: Optional[List[str]] = None,
+                          also_busy: Optional[List[Tuple[datetime.datetime, datetime.datetime]]] = None) -> List[List[Tuple[datetime.datetime, datetime.datetime]]]:
+    """
+    find_free_slots for several (start, end, duration_minutes) windows from one read of the busy
+    times: a single fetch covering the earliest start to the latest end, coalesced once, then each
+    window sweeps only the busy intervals from its own start on (found by bisection).
+
+    Returns:
+        One list of slots per window, in the same order, each in the timezone of its window's start.
+    """
+    if not windows:
+        return []
+    if step_minutes is None:
+        step_minutes = config.FREE_SLOT_STEP_MINUTES
+    busy_slots, busy_is_sorted = get_busy_intervals(
+        min(start for start, _, _ in windows), max(end for _, end, _ in windows), calendar_ids
+    )
+    if also_busy:
+        busy_slots = heapq.merge(busy_slots, also_busy) if busy_is_sorted else itertools.chain(busy_slots, also_busy)
+    with metrics.stage_duration.time(stage='slot_search'):
+        busy = BusyLookup(merge_intervals(busy_slots, assume_sorted=busy_is_sorted))
+        results = []
+        for start_time, end_time, duration_minutes in windows:
+            slots = iter_free_slots(
+                start_time, end_time, busy.after(start_time),
+                duration=datetime.timedelta(minutes=duration_minutes),
+                step=datetime.timedelta(minutes=step_minutes) if step_minutes else None,
+                work_start_hour=WORK_START_HOUR,
+                work_end_hour=WORK_END_HOUR,
+                busy_is_sorted=True,
+            )
+            results.append(list(itertools.islice(slots, limit)))
+        return results
+
+def find_common_slots(start_time: datetime.datetime, end_time: datetime.datetime, duration_minutes: int = 30,
+                      calendar_ids: Optional[List[str]] = None, any_of: Optional[List[List[str]]] = None,
+                      limit: Optional[int] = 3, step_minutes: Optional[int] = None,
+                      preferred_windows: Iterable[Tuple[datetime.time, datetime.time]] = (),
+                      also_busy: Optional[List[Tuple[datetime.datetime, datetime.datetime]]] = None) -> List[Tuple[datetime.datetime, datetime.datetime, List[str]]]:
+    """
+    Slots when every calendar in `calendar_ids` is free and, for each group in `any_of` (e.g. the
+    rooms that would do), at least one of its calendars is free for the whole slot.
+
+    Busy times come from one freebusy query for all the calendars (the primary one from the local
+    grid or cache, plus `also_busy`). Each calendar's busy list is coalesced once; the required
+    calendars are k-way merged, and each group contributes the times when all of its calendars are
+    busy (a k-way boundary sweep), so building the busy set stays O(N log k) in the N busy
+    intervals. Candidate slots are then checked against the group members by bisection, and only
+    until `limit` slots are found unless `preferred_windows` asks for ranking: then slots closest
+    to a window (time of day, in the timezone of start_time) come first, earliest among equals.
+
     Returns:
-        List of (start_time, end_time) tuples in the local timezone (IST)
+        (start, end, calendar IDs used) tuples: the required calendars plus the first free
+        calendar of each group.
     """
-    busy_slots = get_busy_events_for_day(start_time, end_time)
-    busy_slots.sort()
-    
-    # Calculate slot duration
-    slot_duration = datetime.timedelta(minutes=duration_minutes)
-    
-    # Filter out slots that overlap with busy times
-    free_slots = []
-    current_time = start_time
-
-    for busy_start, busy_end in busy_slots:
-        # Add free slots before the current busy slot, within the requested range
-        while current_time + slot_duration <= busy_start and current_time + slot_duration <= end_time:
-            free_slots.append((current_time, current_time + slot_duration))
-            current_time += slot_duration # Move to next interval by slot_duration
-        
-        # Move current_time past the busy slot
-        current_time = max(current_time, busy_end)
-
-    # Add free slots after the last busy slot until the end of the requested range
-    while current_time + slot_duration <= end_time:
-        free_slots.append((current_time, current_time + slot_duration))
-        current_time += slot_duration # Move to next interval by slot_duration
-    
-    # Remove duplicates and sort - this step is still necessary if intervals overlap or due to logic
-    free_slots = sorted(list(set(free_slots)))
-    
-    return free_slots
+    if step_minutes is None:
+        step_minutes = config.FREE_SLOT_STEP_MINUTES
+    required = list(dict.fromkeys(calendar_ids or []))
+    groups = [list(dict.fromkeys(group)) for group in any_of or [] if group]
+    if not required and not groups:
+        required = ['primary']
+    all_ids = list(dict.fromkeys(required + [calendar_id for group in groups for calendar_id in group]))
+
+    busy_by_calendar: Dict[str, Iterable[Tuple[datetime.datetime, datetime.datetime]]] = {}
+    remote_ids = [calendar_id for calendar_id in all_ids if calendar_id != 'primary']
+    if remote_ids:
+        busy_by_calendar.update(get_calendar_service_instance().query_free_busy(remote_ids, start_time, end_time))
+    primary_is_sorted = False
+    if 'primary' in all_ids:
+        primary, primary_is_sorted = get_busy_intervals(start_time, end_time, ['primary'])
+        if also_busy:
+            primary = heapq.merge(primary, also_busy) if primary_is_sorted else itertools.chain(primary, also_busy)
+        busy_by_calendar['primary'] = primary
+
+    def coalesced(calendar_id):
+        # freebusy lists come back sorted, so the sort inside merge_intervals is linear for them
+        return merge_intervals(busy_by_calendar.get(calendar_id, ()), assume_sorted=calendar_id == 'primary' and primary_is_sorted)
+
+    with metrics.stage_duration.time(stage='slot_search'):
+        lookups = {calendar_id: BusyLookup(coalesced(calendar_id)) for group in groups for calendar_id in group}
+        streams = [lookups[calendar_id].intervals if calendar_id in lookups else coalesced(calendar_id) for calendar_id in required]
+        streams += [intersect_busy([lookups[calendar_id].intervals for calendar_id in group]) for group in groups]
+        candidates = iter_free_slots(
+            start_time, end_time, union_busy(streams),
+            duration=datetime.timedelta(minutes=duration_minutes),
+            step=datetime.timedelta(minutes=step_minutes) if step_minutes else None,
+            work_start_hour=WORK_START_HOUR,
+            work_end_hour=WORK_END_HOUR,
+            busy_is_sorted=True,
+        )
+
+        def with_resources():
+            # Some member of each group is free at every moment of a candidate, but one of them
+            # has to be free for all of it
+            for slot_start, slot_end in candidates:
+                chosen = []
+                for group in groups:
+                    calendar_id = next((c for c in group if lookups[c].is_free(slot_start, slot_end)), None)
+                    if calendar_id is None:
+                        break
+                    chosen.append(calendar_id)
+                else:
+                    yield slot_start, slot_end, list(dict.fromkeys(required + chosen))
+
+        return top_slots(with_resources(), limit, list(preferred_windows))
+
+def is_slot_free(start_time: datetime.datetime, end_time: datetime.datetime) -> bool:
+    """True if no event in the (freshly synced) primary calendar cache overlaps [start_time, end_time)."""
+    service_instance = get_calendar_service_instance()
+    return not service_instance.cache.busy_spans(start_time, end_time)
 
 def format_slots(slots: List[Tuple[datetime.datetime, datetime.datetime]]) -> List[str]:
     return [f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}" for start, end in slots]
@@ -185,16 +464,15 @@ def book_meeting(start_time: datetime.datetime, end_time: datetime.datetime, sum
     service_instance = get_calendar_service_instance()
     return service_instance.book_meeting(start_time, end_time, summary, phone_number)
 
-def update_appointment(event_id: str, new_start_time: datetime.datetime, new_end_time: datetime.datetime, new_summary: str = "Appointment", phone_number: str = None) -> str:
-    service_instance = get_calendar_service_instance()
-    updated_event_body = {
-        'summary': new_summary,
+def _appointment_body(start_time: datetime.datetime, end_time: datetime.datetime, summary: str, phone_number: str = None) -> dict:
+    body = {
+        'summary': summary,
         'start': {
-            'dateTime': new_start_time.astimezone(pytz.UTC).isoformat(),
+            'dateTime': start_time.astimezone(UTC).isoformat(),
             'timeZone': 'Asia/Kolkata'
         },
         'end': {
-            'dateTime': new_end_time.astimezone(pytz.UTC).isoformat(),
+            'dateTime': end_time.astimezone(UTC).isoformat(),
             'timeZone': 'Asia/Kolkata'
         },
         'reminders': {
@@ -202,38 +480,88 @@ def update_appointment(event_id: str, new_start_time: datetime.datetime, new_end
         }
     }
     if phone_number:
-        updated_event_body['description'] = f"Phone Number: {phone_number}"
+        body['description'] = f"Phone Number: {phone_number}"
+    return body
+
+def update_appointment(event_id: str, new_start_time: datetime.datetime, new_end_time: datetime.datetime, new_summary: str = "Appointment", phone_number: str = None) -> str:
+    service_instance = get_calendar_service_instance()
+    updated_event_body = _appointment_body(new_start_time, new_end_time, new_summary, phone_number)
     try:
-        service_instance.service.events().update(
-            calendarId='primary',
-            eventId=event_id,
-            body=updated_event_body
-        ).execute()
+        with metrics.track_upstream('google', 'events.update'):
+            updated_event = service_instance.service.events().update(
+                calendarId='primary',
+                eventId=event_id,
+                body=updated_event_body
+            ).execute()
+        service_instance.cache.upsert(updated_event)
         return "Appointment updated successfully."
     except Exception as e:
         return f"Error updating appointment: {e}"
 
-def delete_appointment(phone_number: str, summary: str = None) -> str:
+def bulk_update_appointments(updates: List[dict]) -> List[dict]:
+    """
+    Update many events in as few round trips as possible (one per BATCH_MAX_REQUESTS events).
+
+    Each update is a dict with event_id, start, end, summary and optionally phone_number.
+    Returns one {"event_id", "status": "updated"|"failed", "error"} result per update, in order.
+    """
+    service_instance = get_calendar_service_instance()
+    outcomes = service_instance.execute_batch([
+        service_instance.service.events().update(
+            calendarId='primary',
+            eventId=update['event_id'],
+            body=_appointment_body(update['start'], update['end'], update['summary'], update.get('phone_number'))
+        )
+        for update in updates
+    ])
+    results = []
+    for update, (response, error) in zip(updates, outcomes):
+        if error is None:
+            service_instance.cache.upsert(response)
+            results.append({"event_id": update['event_id'], "status": "updated"})
+        else:
+            print(f"Failed to update event {update['event_id']}: {error}")
+            results.append({"event_id": update['event_id'], "status": "failed", "error": str(error)})
+    return results
+
+def bulk_delete_appointments(event_ids: List[str]) -> List[dict]:
+    """Delete many events in batched round trips; one {"event_id", "status", "error"} result per ID."""
+    service_instance = get_calendar_service_instance()
+    outcomes = service_instance.execute_batch([
+        service_instance.service.events().delete(calendarId='primary', eventId=event_id)
+        for event_id in event_ids
+    ])
+    results = []
+    for event_id, (_, error) in zip(event_ids, outcomes):
+        if error is None:
+            service_instance.cache.remove(event_id)
+            results.append({"event_id": event_id, "status": "deleted"})
+        else:
+            print(f"Error deleting event {event_id}: {error}")
+            results.append({"event_id": event_id, "status": "failed", "error": str(error)})
+    return results
+
+def delete_appointments(phone_number: str, summary: str = None) -> Tuple[str, List[dict]]:
+    """Delete the appointments booked for phone_number (optionally only those whose title contains summary)."""
     service_instance = get_calendar_service_instance()
     matching_events = service_instance.get_events_by_phone_number(phone_number)
     if not matching_events:
-        return "No appointments found for the given phone number."
+        return "No appointments found for the given phone number.", []
     if summary:
         lower_summary = summary.lower()
         filtered_events = [event for event in matching_events if lower_summary in event.get('summary', '').lower()]
     else:
         filtered_events = matching_events
     if not filtered_events:
-        return "No appointments found with that phone number and matching title."
-    deleted_count = 0
-    for event in filtered_events:
-        event_id = event['id']
-        try:
-            service_instance.service.events().delete(
-                calendarId='primary',
-                eventId=event_id
-            ).execute()
-            deleted_count += 1
-        except Exception as e:
-            print(f"Error deleting event {event_id}: {e}")
-    return f"Successfully deleted {deleted_count} appointment(s)."
\ No newline at end of file
+        return "No appointments found with that phone number and matching title.", []
+    results = bulk_delete_appointments([event['id'] for event in filtered_events])
+    deleted_count = sum(1 for result in results if result['status'] == 'deleted')
+    message = f"Successfully deleted {deleted_count} appointment(s)."
+    failed_count = len(results) - deleted_count
+    if failed_count:
+        message += f" Failed to delete {failed_count} appointment(s)."
+    return message, results
+
+def delete_appointment(phone_number: str, summary: str = None) -> str:
+    message, _ = delete_appointments(phone_number, summary)
+    return message
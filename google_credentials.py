@@ -0,0 +1,186 @@
+"""
+Google API credentials: loading, storage and refresh.
+
+Credentials come from, in order:
+  1. a service account (GOOGLE_SERVICE_ACCOUNT_INFO holding the key JSON, or GOOGLE_SERVICE_ACCOUNT_FILE), optionally
+     impersonating GOOGLE_DELEGATED_USER through domain-wide delegation;
+  2. a user token stored as JSON at GOOGLE_TOKEN_PATH, created once with `python google_credentials.py`;
+  3. the interactive browser flow, only if GOOGLE_OAUTH_INTERACTIVE is set (never on a production worker).
+
+CredentialManager keeps the access token valid: a background task refreshes it GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS
+before it expires, so requests do not wait on the token endpoint, and a refresh that does end up on the request path
+runs once under a lock however many greenlets need it.
+"""
+import datetime
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional
+
+import config
+import metrics
+
+
+class CredentialsError(Exception):
+    """No usable Google credentials are configured."""
+
+
+def _utcnow() -> datetime.datetime:
+    # google-auth keeps expiry as a naive UTC datetime
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def save_user_token(credentials, path: str):
+    """Write user credentials as JSON, atomically and readable by the owner only."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.token-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(credentials.to_json())
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _load_user_token(path: str, scopes: List[str]):
+    from google.oauth2.credentials import Credentials
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        return Credentials.from_authorized_user_info(json.loads(raw), scopes)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        pass
+    if not raw.startswith(b'\x80'):
+        raise CredentialsError(f"{path} is not a JSON user token; run `python google_credentials.py` to create one")
+    # A pickled token from before tokens were stored as JSON: it is our own file, so convert it once
+    credentials = pickle.loads(raw)
+    save_user_token(credentials, path)
+    logging.warning(f"Converted the pickled Google token in {path} to JSON")
+    return credentials
+
+
+def authorize_interactively(scopes: List[str], token_path: str = None):
+    """Run the browser consent flow on this machine and store the resulting user token."""
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    flow = InstalledAppFlow.from_client_secrets_file(config.GOOGLE_CALENDAR_CREDENTIALS_PATH, scopes)
+    credentials = flow.run_local_server(
+        port=5000,
+        authorization_prompt_message='Please visit this URL: {url}',
+        success_message='The auth flow is complete; you may close this window.',
+        open_browser=True
+    )
+    save_user_token(credentials, token_path or config.GOOGLE_TOKEN_PATH)
+    return credentials
+
+
+def load_credentials(scopes: List[str]):
+    """Credentials from the first configured source (see the module docstring); raises CredentialsError."""
+    if config.GOOGLE_SERVICE_ACCOUNT_INFO or config.GOOGLE_SERVICE_ACCOUNT_FILE:
+        from google.oauth2 import service_account
+
+        if config.GOOGLE_SERVICE_ACCOUNT_INFO:
+            credentials = service_account.Credentials.from_service_account_info(
+                json.loads(config.GOOGLE_SERVICE_ACCOUNT_INFO), scopes=scopes
+            )
+        else:
+            credentials = service_account.Credentials.from_service_account_file(config.GOOGLE_SERVICE_ACCOUNT_FILE, scopes=scopes)
+        if config.GOOGLE_DELEGATED_USER:
+            credentials = credentials.with_subject(config.GOOGLE_DELEGATED_USER)
+        return credentials
+
+    if os.path.exists(config.GOOGLE_TOKEN_PATH):
+        credentials = _load_user_token(config.GOOGLE_TOKEN_PATH, scopes)
+        if credentials.valid or credentials.refresh_token:
+            return credentials
+        logging.warning(f"The Google token in {config.GOOGLE_TOKEN_PATH} has expired and cannot be refreshed")
+
+    if config.GOOGLE_OAUTH_INTERACTIVE:
+        return authorize_interactively(scopes)
+    raise CredentialsError(
+        "No Google credentials: set GOOGLE_SERVICE_ACCOUNT_FILE or GOOGLE_SERVICE_ACCOUNT_INFO, or run "
+        "`python google_credentials.py` once to store a user token"
+    )
+
+
+class CredentialManager:
+    def __init__(self, credentials, refresh_margin: float = 600.0, on_refresh: Optional[Callable] = None):
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self.on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._request = None
+
+    def ensure_valid(self):
+        """Refresh now if the token is missing or expired; concurrent callers share one refresh."""
+        if self.credentials.valid:
+            return
+        with self._lock:
+            if not self.credentials.valid:
+                self._refresh()
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        if self._request is None:
+            from google.auth.transport.requests import Request
+            self._request = Request()
+        with metrics.track_upstream('google', 'oauth.refresh'):
+            self.credentials.refresh(self._request)
+        if self.on_refresh:
+            try:
+                self.on_refresh(self.credentials)
+            except Exception as e:
+                logging.warning(f"Could not store the refreshed Google token: {e}")
+
+    def seconds_until_refresh(self) -> Optional[float]:
+        """When the background refresh is due (may be negative), or None if the token never expires."""
+        expiry = getattr(self.credentials, 'expiry', None)
+        if expiry is None:
+            return None
+        return (expiry - _utcnow()).total_seconds() - self.refresh_margin
+
+    def keep_fresh(self, sleep: Callable[[float], None] = time.sleep, retry_delay: float = 30.0):
+        """Background loop: refresh ahead of every expiry. Returns if the credentials never expire."""
+        while True:
+            delay = self.seconds_until_refresh()
+            if delay is None:
+                return
+            if delay > 0:
+                sleep(delay)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Background Google token refresh failed, retrying in {retry_delay:.0f}s: {e}")
+                sleep(retry_delay)
+                continue
+            if (self.seconds_until_refresh() or 0) <= 0:
+                # A token that lives shorter than refresh_margin: do not spin on the token endpoint
+                sleep(retry_delay)
+
+
+def create_credential_manager(credentials) -> CredentialManager:
+    # Only user tokens are stored; service accounts mint a new token from their key every time
+    is_user_token = getattr(credentials, 'refresh_token', None) is not None
+    return CredentialManager(
+        credentials,
+        refresh_margin=config.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS,
+        on_refresh=(lambda refreshed: save_user_token(refreshed, config.GOOGLE_TOKEN_PATH)) if is_user_token else None,
+    )
+
+
+if __name__ == '__main__':
+    from google_calendar import SCOPES
+
+    authorize_interactively(SCOPES)
+    print(f"Stored a Google user token in {config.GOOGLE_TOKEN_PATH}")
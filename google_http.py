@@ -0,0 +1,88 @@
+"""
+Green-safe transport for the Google API client.
+
+httplib2.Http is not safe to share between threads or greenlets, but build() hands the one
+instance it was given to every request it creates. Here each request borrows an AuthorizedHttp
+from a pool for the duration of execute(), so concurrent greenlets never share a connection and
+idle connections are still reused (keep-alive) by later requests.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+
+import config
+
+
+class HttpPool:
+    def __init__(self, credentials, max_idle: int = 10, timeout: Optional[float] = None,
+                 before_use: Optional[Callable[[], None]] = None):
+        self.credentials = credentials
+        self.max_idle = max_idle
+        self.timeout = timeout
+        # Called before each connection is handed out; CredentialManager.ensure_valid, so that greenlets
+        # never each refresh an expired token inside AuthorizedHttp
+        self.before_use = before_use
+        self._idle: List[google_auth_httplib2.AuthorizedHttp] = []
+        self._lock = threading.Lock()
+
+    def new_http(self) -> google_auth_httplib2.AuthorizedHttp:
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+
+    @contextmanager
+    def connection(self):
+        if self.before_use is not None:
+            self.before_use()
+        with self._lock:
+            http = self._idle.pop() if self._idle else None
+        if http is None:
+            http = self.new_http()
+        try:
+            yield http
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(http)
+
+    def request_builder(self, http, *args, **kwargs) -> 'PooledHttpRequest':
+        """`requestBuilder` for build(): requests run on a pooled connection instead of `http`."""
+        return PooledHttpRequest(self, http, *args, **kwargs)
+
+
+class PooledHttpRequest(HttpRequest):
+    def __init__(self, pool: HttpPool, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = pool
+
+    def execute(self, http=None, num_retries=0):
+        if http is not None:
+            return super().execute(http=http, num_retries=num_retries)
+        with self.pool.connection() as pooled:
+            return super().execute(http=pooled, num_retries=num_retries)
+
+
+def create_http_pool(credential_manager) -> HttpPool:
+    return HttpPool(
+        credential_manager.credentials,
+        max_idle=config.GOOGLE_HTTP_POOL_SIZE,
+        timeout=config.GOOGLE_HTTP_TIMEOUT,
+        before_use=credential_manager.ensure_valid,
+    )
+
+
+def build_calendar_service(pool: HttpPool, api_endpoint: Optional[str] = None):
+    """Calendar v3 client whose requests (but not batches, see execute_batch) draw from `pool`."""
+    client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+    return build(
+        'calendar', 'v3',
+        http=pool.new_http(),
+        requestBuilder=pool.request_builder,
+        client_options=client_options,
+        # Use the discovery document shipped with google-api-python-client instead of fetching it
+        static_discovery=True,
+        cache_discovery=False,
+    )
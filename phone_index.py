@@ -0,0 +1,168 @@
+import re
+import sqlite3
+import threading
+from typing import Dict, Optional, Set
+
+import config
+
+PHONE_IN_DESCRIPTION = re.compile(r'Phone Number:\s*(\+?[\d\s\-().]{5,})')
+E164 = re.compile(r'\+[1-9]\d{6,14}')
+
+
+def normalize_phone_number(phone_number: str, default_country_code: str = None) -> Optional[str]:
+    """
+    Normalize a phone number to E.164 ('+' followed by digits).
+
+    Numbers written without a country code (a bare 10-digit national number, optionally with
+    a leading trunk '0') get `default_country_code` prepended. Returns None if nothing usable is left.
+    """
+    if isinstance(phone_number, int):
+        phone_number = str(phone_number)
+    if not phone_number or not isinstance(phone_number, str):
+        return None
+    if default_country_code is None:
+        default_country_code = config.DEFAULT_PHONE_COUNTRY_CODE
+    raw = phone_number.strip()
+    digits = re.sub(r'\D', '', raw)
+    if not digits:
+        return None
+    if raw.startswith('+'):
+        return f"+{digits}"
+    if digits.startswith('00'):
+        return f"+{digits[2:]}"
+    if len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    if len(digits) == 10:
+        return f"+{default_country_code}{digits}"
+    return f"+{digits}"
+
+
+def is_e164(phone_number: str) -> bool:
+    """True if the number has a '+' and a country code (spaces, dashes, dots and parentheses allowed)."""
+    return bool(E164.fullmatch(re.sub(r'[\s\-().]', '', phone_number or '')))
+
+
+def phone_number_from_event(event: dict) -> Optional[str]:
+    """The normalized number written into an event's description by book_meeting, if any."""
+    match = PHONE_IN_DESCRIPTION.search(event.get('description') or '')
+    if not match:
+        return None
+    return normalize_phone_number(match.group(1))
+
+
+class PhoneIndex:
+    """
+    Normalized phone number -> event IDs, maintained from the EventCache as events are
+    stored and discarded, so lookups never have to scan the calendar.
+    """
+
+    def __init__(self):
+        self._by_phone: Dict[str, Set[str]] = {}
+        self._by_event: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # True once the index reflects the calendar, either from a sync or from disk.
+        self.warm = False
+
+    def lookup(self, phone_number: str) -> Set[str]:
+        normalized = normalize_phone_number(phone_number)
+        if not normalized:
+            return set()
+        return set(self._by_phone.get(normalized, ()))
+
+    def event_stored(self, event: dict):
+        phone = phone_number_from_event(event)
+        with self._lock:
+            self._unlink(event['id'])
+            if phone:
+                self._link(phone, event['id'])
+
+    def event_discarded(self, event_id: str):
+        with self._lock:
+            self._unlink(event_id)
+
+    def cache_reset(self):
+        with self._lock:
+            self._by_phone.clear()
+            self._by_event.clear()
+
+    def sync_started(self):
+        pass
+
+    def sync_finished(self, success: bool):
+        if success:
+            self.warm = True
+
+    def _link(self, phone: str, event_id: str):
+        self._by_phone.setdefault(phone, set()).add(event_id)
+        self._by_event[event_id] = phone
+
+    def _unlink(self, event_id: str):
+        phone = self._by_event.pop(event_id, None)
+        if phone is None:
+            return
+        event_ids = self._by_phone.get(phone)
+        if event_ids is not None:
+            event_ids.discard(event_id)
+            if not event_ids:
+                del self._by_phone[phone]
+
+
+class SqlitePhoneIndex(PhoneIndex):
+    """
+    PhoneIndex that also writes through to a SQLite file, so that after a restart update and
+    delete lookups can be answered before the first full calendar sync has finished.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS phone_index (event_id TEXT PRIMARY KEY, phone TEXT NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS phone_index_phone ON phone_index (phone)')
+        self._conn.commit()
+        for event_id, phone in self._conn.execute('SELECT event_id, phone FROM phone_index'):
+            self._link(phone, event_id)
+        self.warm = bool(self._by_event)
+        # During a sync, writes are batched into one transaction committed by sync_finished.
+        self._in_sync = False
+
+    def _write(self, sql: str, params: tuple = ()):
+        with self._lock:
+            self._conn.execute(sql, params)
+            if not self._in_sync:
+                self._conn.commit()
+
+    def event_stored(self, event: dict):
+        super().event_stored(event)
+        phone = self._by_event.get(event['id'])
+        if phone:
+            self._write('INSERT OR REPLACE INTO phone_index (event_id, phone) VALUES (?, ?)', (event['id'], phone))
+        else:
+            self._write('DELETE FROM phone_index WHERE event_id = ?', (event['id'],))
+
+    def event_discarded(self, event_id: str):
+        super().event_discarded(event_id)
+        self._write('DELETE FROM phone_index WHERE event_id = ?', (event_id,))
+
+    def cache_reset(self):
+        super().cache_reset()
+        self._write('DELETE FROM phone_index')
+
+    def sync_started(self):
+        self._in_sync = True
+
+    def sync_finished(self, success: bool):
+        super().sync_finished(success)
+        with self._lock:
+            self._in_sync = False
+            if success:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+
+
+def create_phone_index() -> PhoneIndex:
+    if config.PHONE_INDEX_DB_PATH:
+        return SqlitePhoneIndex(config.PHONE_INDEX_DB_PATH)
+    return PhoneIndex()
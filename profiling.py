@@ -0,0 +1,216 @@
+"""
+Opt-in profiling that is safe to leave in production builds.
+
+Nothing is profiled unless PROFILING_TOKEN is set and the caller presents it in X-Profile-Token:
+
+  - a request sent with `X-Profile: 1` (or `?_profile=1`) runs under cProfile, one request at a time
+    per worker; cProfile hooks the OS thread, so greenlets that run while the request waits on I/O
+    show up in its profile too;
+  - POST /admin/profile/sample samples, from a real OS thread every few milliseconds for N seconds,
+    the running stack of every thread plus the suspended stack of every greenlet (found through the
+    garbage collector, re-scanned every GREENLET_RESCAN_SECONDS), so a request parked on I/O shows
+    up where it waits, not only the one greenlet on the CPU.
+
+The last PROFILING_KEEP profiles are kept in memory and downloaded as pstats files (`python -m pstats`,
+snakeviz) or collapsed stacks (flamegraph.pl, speedscope).
+"""
+import cProfile
+import gc
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+import greenlet
+from eventlet import patcher
+
+import config
+
+# The sampler must keep ticking while a greenlet hogs the hub, so it gets a real thread
+_real_threading = patcher.original('threading')
+_real_time = patcher.original('time')
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+# How often the sampler looks for new greenlets; gc.get_objects() is too slow to run every sample
+GREENLET_RESCAN_SECONDS = 0.1
+
+
+def authorized(token: Optional[str]) -> bool:
+    """True if profiling is enabled and `token` is the configured PROFILING_TOKEN."""
+    return bool(config.PROFILING_TOKEN and token and hmac.compare_digest(token, config.PROFILING_TOKEN))
+
+
+class Profile:
+    def __init__(self, kind: str, label: str, duration: float, stats: Optional[dict] = None,
+                 stacks: Optional[Counter] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.label = label
+        self.created_at = time.time()
+        self.duration = duration
+        self.stats = stats  # cProfile: the dict pstats reads from a .prof file
+        self.stacks = stacks  # sampling: collapsed stack -> sample count
+
+    def summary(self) -> dict:
+        summary = {
+            'id': self.id,
+            'kind': self.kind,
+            'label': self.label,
+            'created_at': self.created_at,
+            'duration_seconds': round(self.duration, 3),
+            'formats': ['pstats', 'text'] if self.kind == CPROFILE else ['collapsed'],
+        }
+        if self.stacks is not None:
+            summary['samples'] = sum(self.stacks.values())
+        return summary
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the format cProfile.Profile.dump_stats writes."""
+        return marshal.dumps(self.stats)
+
+    def text(self, sort: str = 'cumulative', limit: int = 60) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        stats.stats = self.stats
+        stats.get_top_level_stats()
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """The most recent `max_entries` profiles, by ID."""
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self._profiles: 'OrderedDict[str, Profile]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> Profile:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(list(self._profiles.values()))]
+
+
+class RequestProfiler:
+    """cProfile for one request at a time; a request that finds it busy simply runs unprofiled."""
+
+    def __init__(self, store: ProfileStore):
+        self.store = store
+        self._busy = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) owns the hook
+            self._busy.release()
+            return None
+        return profiler
+
+    def stop(self, profiler: cProfile.Profile, label: str, duration: float) -> Profile:
+        profiler.disable()
+        self._busy.release()
+        profiler.create_stats()
+        return self.store.add(Profile(CPROFILE, label, duration, stats=profiler.stats))
+
+    def abandon(self, profiler: cProfile.Profile):
+        """Stop a profile whose request ended in an unhandled exception."""
+        profiler.disable()
+        self._busy.release()
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame, names: Dict) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        name = names.get(code)
+        if name is None:
+            name = names[code] = _frame_name(code)
+        stack.append(name)
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+def _live_greenlets() -> 'weakref.WeakSet':
+    return weakref.WeakSet(obj for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet))
+
+
+class StackSampler:
+    """Wall-clock sampling of every thread's and every greenlet's Python stack, one session at a time."""
+
+    def __init__(self, store: ProfileStore, interval: float = 0.01):
+        self.store = store
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def _run(self, stop, stacks: Counter, interval: float):
+        own_ident = _real_threading.get_ident()
+        names = {}
+        greenlets, rescan_at = None, 0.0
+        while not stop.is_set():
+            now = _real_time.monotonic()
+            if now >= rescan_at:
+                greenlets, rescan_at = _live_greenlets(), now + GREENLET_RESCAN_SECONDS
+            frames = [frame for ident, frame in sys._current_frames().items() if ident != own_ident]
+            # A running greenlet has no gr_frame (its stack is its thread's, above); a suspended one
+            # keeps its innermost frame there
+            frames.extend(frame for frame in (g.gr_frame for g in list(greenlets)) if frame is not None)
+            for frame in frames:
+                stacks[_collapse(frame, names)] += 1
+            frames = frame = None  # do not keep the sampled frames alive while sleeping
+            _real_time.sleep(interval)
+
+    def sample(self, seconds: float, interval: Optional[float] = None, label: str = 'all greenlets') -> Optional[Profile]:
+        """Sample for `seconds` (waiting green) and store the result; None if a session is already running."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            stacks = Counter()
+            stop = _real_threading.Event()
+            thread = _real_threading.Thread(
+                target=self._run, args=(stop, stacks, interval or self.interval), name='stack-sampler', daemon=True
+            )
+            started = time.perf_counter()
+            thread.start()
+            try:
+                time.sleep(seconds)
+            finally:
+                stop.set()
+                while thread.is_alive():
+                    time.sleep(0.01)
+            return self.store.add(Profile(SAMPLE, label, time.perf_counter() - started, stacks=stacks))
+        finally:
+            self._busy.release()
+
+
+def create_profilers():
+    store = ProfileStore(config.PROFILING_KEEP)
+    return store, RequestProfiler(store), StackSampler(store, config.PROFILING_SAMPLE_INTERVAL_MS / 1000)
@@ -0,0 +1,193 @@
+import bisect
+import datetime
+import heapq
+import itertools
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval], assume_sorted: bool = False) -> Iterator[Interval]:
+    """Lazily coalesce overlapping or touching intervals into sorted, disjoint ones."""
+    if not assume_sorted:
+        intervals = sorted(intervals)
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is not None and start <= current_end:
+            if end > current_end:
+                current_end = end
+            continue
+        if current_end is not None:
+            yield current_start, current_end
+        current_start, current_end = start, end
+    if current_end is not None:
+        yield current_start, current_end
+
+
+def working_windows(start_time: datetime.datetime, end_time: datetime.datetime,
+                    work_start_hour: Optional[int], work_end_hour: Optional[int]) -> Iterator[Interval]:
+    """
+    Yield the parts of [start_time, end_time) that fall inside working hours, day by day, in the
+    timezone of start_time. With no working hours the whole range is a single window.
+    """
+    if work_start_hour is None or work_end_hour is None:
+        if start_time < end_time:
+            yield start_time, end_time
+        return
+
+    tz = start_time.tzinfo
+    day = start_time.date()
+    last_day = end_time.astimezone(tz).date()
+    while day <= last_day:
+        window_start = datetime.datetime.combine(day, datetime.time(work_start_hour), tzinfo=tz)
+        window_end = datetime.datetime.combine(day, datetime.time(0), tzinfo=tz) + datetime.timedelta(hours=work_end_hour)
+        window_start = max(window_start, start_time)
+        window_end = min(window_end, end_time)
+        if window_start < window_end:
+            yield window_start, window_end
+        day += datetime.timedelta(days=1)
+
+
+def free_gaps(windows: Iterable[Interval], merged_busy: Iterable[Interval]) -> Iterator[Interval]:
+    """Subtract sorted, disjoint busy intervals from sorted windows in a single lazy sweep."""
+    busy = iter(merged_busy)
+    pending = next(busy, None)
+    for window_start, window_end in windows:
+        # Busy intervals that end before this window can never matter again.
+        while pending is not None and pending[1] <= window_start:
+            pending = next(busy, None)
+        cursor = window_start
+        while pending is not None and pending[0] < window_end:
+            if pending[0] > cursor:
+                yield cursor, pending[0]
+            cursor = max(cursor, pending[1])
+            if pending[1] > window_end:
+                # Spills into the next window; keep it around.
+                break
+            pending = next(busy, None)
+        if cursor < window_end:
+            yield cursor, window_end
+
+
+def align_up(moment: datetime.datetime, step: datetime.timedelta) -> datetime.datetime:
+    """Round moment up to the next multiple of step since local midnight."""
+    midnight = datetime.datetime.combine(moment.date(), datetime.time(0), tzinfo=moment.tzinfo)
+    steps, remainder = divmod(moment - midnight, step)
+    if remainder:
+        steps += 1
+    return midnight + steps * step
+
+
+def iter_free_slots(start_time: datetime.datetime, end_time: datetime.datetime, busy: Iterable[Interval],
+                    duration: datetime.timedelta, step: Optional[datetime.timedelta] = None,
+                    work_start_hour: Optional[int] = None, work_end_hour: Optional[int] = None,
+                    busy_is_sorted: bool = False) -> Iterator[Interval]:
+    """
+    Lazily yield (start, end) slots of length `duration` that avoid every busy interval and lie within
+    working hours, in chronological order and in the timezone of start_time.
+
+    Without `step`, slots are packed back to back from the start of each free gap (the historical
+    behaviour); with `step`, slot starts are aligned to multiples of step since local midnight and
+    advance by step.
+    """
+    tz = start_time.tzinfo
+    merged_busy = merge_intervals(busy, assume_sorted=busy_is_sorted)
+    advance = step or duration
+    for gap_start, gap_end in free_gaps(working_windows(start_time, end_time, work_start_hour, work_end_hour), merged_busy):
+        slot_start = gap_start.astimezone(tz)
+        if step:
+            slot_start = align_up(slot_start, step)
+        # Step in UTC: arithmetic on datetimes in the same zone is wall-clock, which would invent a
+        # slot in the hour skipped when DST starts and lose one in the hour repeated when it ends.
+        slot_start, gap_end = slot_start.astimezone(datetime.timezone.utc), gap_end.astimezone(datetime.timezone.utc)
+        while slot_start + duration <= gap_end:
+            yield slot_start.astimezone(tz), (slot_start + duration).astimezone(tz)
+            slot_start += advance
+
+
+def union_busy(streams: Sequence[Iterable[Interval]]) -> Iterator[Interval]:
+    """
+    Lazily merge busy streams, each sorted by start, into sorted disjoint intervals: a k-way heap
+    merge and one coalescing pass, O(N log k) for N intervals across k streams.
+    """
+    return merge_intervals(heapq.merge(*streams), assume_sorted=True)
+
+
+def _boundaries(disjoint: Iterable[Interval]) -> Iterator[Tuple[datetime.datetime, int]]:
+    for start, end in disjoint:
+        yield start, 1
+        yield end, -1
+
+
+def intersect_busy(streams: Sequence[Iterable[Interval]]) -> Iterator[Interval]:
+    """
+    Lazily yield the intervals during which every stream is busy. Each stream must be sorted and
+    disjoint (e.g. from merge_intervals). One sweep over the k-way merged boundaries, counting how
+    many streams are busy; at equal times ends sort before starts, so touching intervals do not
+    count as overlapping.
+    """
+    k = len(streams)
+    if k == 0:
+        return
+    busy_count = 0
+    all_busy_since = None
+    for moment, delta in heapq.merge(*(_boundaries(stream) for stream in streams)):
+        busy_count += delta
+        if busy_count == k:
+            all_busy_since = moment
+        elif all_busy_since is not None:
+            if moment > all_busy_since:
+                yield all_busy_since, moment
+            all_busy_since = None
+
+
+class BusyLookup:
+    """Sorted disjoint busy intervals of one resource, answering "is it free for [start, end)?" by bisection."""
+
+    def __init__(self, disjoint: Iterable[Interval]):
+        self.intervals: List[Interval] = list(disjoint)
+        self._ends = [end for _, end in self.intervals]
+
+    def is_free(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        index = bisect.bisect_right(self._ends, start)
+        return index == len(self.intervals) or self.intervals[index][0] >= end
+
+    def after(self, moment: datetime.datetime) -> Iterator[Interval]:
+        """The intervals that end after `moment`, in order, skipping the earlier ones by bisection."""
+        return itertools.islice(self.intervals, bisect.bisect_right(self._ends, moment), None)
+
+
+def preference_distance(slot: Interval, windows: Sequence[Tuple[datetime.time, datetime.time]]) -> float:
+    """
+    Minutes the slot would have to move to lie inside one of the preferred time-of-day windows
+    (local to the slot), 0 if it already does. With no windows every slot scores 0.
+    """
+    if not windows:
+        return 0.0
+    start, end = slot[0], slot[1]
+    duration = (end - start).total_seconds() / 60
+    minute = start.hour * 60 + start.minute + start.second / 60
+    best = float('inf')
+    for window_start, window_end in windows:
+        earliest = window_start.hour * 60 + window_start.minute
+        latest = window_end.hour * 60 + window_end.minute - duration
+        if latest < earliest:
+            continue
+        best = min(best, earliest - minute if minute < earliest else max(0.0, minute - latest))
+    return best
+
+
+def top_slots(slots: Iterable[tuple], limit: Optional[int],
+              windows: Sequence[Tuple[datetime.time, datetime.time]] = ()) -> List[tuple]:
+    """
+    The `limit` best of the chronologically ordered slots ((start, end, ...) tuples): the earliest
+    ones, reading no further than needed, when there are no preferred windows; otherwise those
+    closest to a window, earliest first among equals (a heap of `limit`, so O(n log limit)).
+    """
+    if not windows:
+        return list(itertools.islice(slots, limit))
+
+    def rank(slot):
+        return preference_distance(slot, windows), slot[0]
+
+    return sorted(slots, key=rank) if limit is None else heapq.nsmallest(limit, slots, key=rank)
@@ -0,0 +1,218 @@
+import datetime
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+import config
+from sqlite_db import open_database
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slot_locks (
+    id INTEGER PRIMARY KEY,
+    holder TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slot_locks_start ON slot_locks (start_ts, end_ts);
+CREATE INDEX IF NOT EXISTS slot_locks_holder ON slot_locks (holder);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    request_hash TEXT NOT NULL,
+    status_code INTEGER,
+    response TEXT,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Kinds of slot lock
+OFFER = 'offer'        # slots offered by /calendar/v3/freeBusy, held for one caller for a short while
+BOOKING = 'booking'    # a booking in flight, held until the new event is in the local cache
+
+# begin_request outcomes
+NEW = 'new'
+REPLAY = 'replay'
+IN_PROGRESS = 'in_progress'
+MISMATCH = 'mismatch'
+
+
+_RESERVATION_ID = re.compile(r'[0-9a-f]{32}')
+
+
+def is_reservation_id(value) -> bool:
+    """True if value has the shape of an ID returned by hold_offers."""
+    return isinstance(value, str) and _RESERVATION_ID.fullmatch(value) is not None
+
+
+def _ts(moment: datetime.datetime) -> float:
+    return moment.timestamp()
+
+
+def _utc(ts: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+
+
+class SlotLockTable:
+    """
+    Short-lived locks on time ranges plus an Idempotency-Key record, in one SQLite table each.
+
+    Offered slots are held under a reservation ID until `offer_ttl` passes, so concurrent callers are
+    offered different slots, and a caller that books under a reservation ID can only book slots it
+    holds or no one does. Holds are opt-in: a booking without a reservation ID (a client that does
+    not echo it back) is only checked against other bookings. Bookings take a lock covering their
+    range for the duration of the Google insert; check-and-lock runs in a single IMMEDIATE
+    transaction, so with the database on a shared path it also holds across worker processes.
+    A caller that asks again under its reservation ID gets its earlier offers replaced, not
+    counted against it, and one reservation holds at most `max_offers` slots.
+    """
+
+    def __init__(self, path: str, offer_ttl: float = 120.0, booking_ttl: float = 60.0,
+                 idempotency_ttl: float = 86400.0, in_progress_ttl: float = 60.0, max_offers: int = 10):
+        self.offer_ttl = offer_ttl
+        self.max_offers = max_offers
+        self.booking_ttl = booking_ttl
+        self.idempotency_ttl = idempotency_ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use (always under self._lock): importing the app must not create files
+        if self._connection is None:
+            self._connection = open_database(self.path, SCHEMA, ['journal_mode=WAL'], isolation_level=None, timeout=10)
+        return self._connection
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(time.time())
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    # --- Slot locks ---
+
+    def hold_offers(self, slots: List[Interval], reservation_id: str = None) -> Tuple[str, float]:
+        """
+        Hold the offered slots (the first `max_offers` of them) under reservation_id, replacing
+        whatever it held before, or under a new ID if None; returns the ID and the expiry (epoch seconds).
+        """
+        reservation_id = reservation_id or uuid.uuid4().hex
+        slots = slots[:self.max_offers]
+
+        def hold(now):
+            expires_at = now + self.offer_ttl
+            self._conn.execute('DELETE FROM slot_locks WHERE holder = ? AND kind = ?', (reservation_id, OFFER))
+            self._conn.executemany(
+                'INSERT INTO slot_locks (holder, kind, start_ts, end_ts, expires_at) VALUES (?, ?, ?, ?, ?)',
+                [(reservation_id, OFFER, _ts(start), _ts(end), expires_at) for start, end in slots]
+            )
+            return expires_at
+
+        return reservation_id, self._transaction(hold)
+
+    def held_intervals(self, start: datetime.datetime, end: datetime.datetime, reservation_id: str = None) -> List[Interval]:
+        """
+        Unexpired locks overlapping [start, end), sorted by start, as UTC datetimes; the offers held
+        under reservation_id (the caller's own) are left out.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT start_ts, end_ts FROM slot_locks WHERE start_ts < ? AND end_ts > ? AND expires_at > ? '
+                'AND NOT (kind = ? AND holder IS ?) ORDER BY start_ts',
+                (_ts(end), _ts(start), time.time(), OFFER, reservation_id)
+            ).fetchall()
+        return [(_utc(start_ts), _utc(end_ts)) for start_ts, end_ts in rows]
+
+    def acquire_booking(self, start: datetime.datetime, end: datetime.datetime, reservation_id: str = None) -> Optional[int]:
+        """
+        Lock [start, end) for a booking unless an unexpired lock held by someone else overlaps it:
+        another booking always, another reservation's offer hold only if the caller presents a
+        reservation_id (its own holds never count). Returns the lock ID, or None on conflict.
+        """
+        def acquire(now):
+            self._conn.execute('DELETE FROM slot_locks WHERE expires_at <= ?', (now,))
+            conflict = self._conn.execute(
+                'SELECT 1 FROM slot_locks WHERE start_ts < ? AND end_ts > ? '
+                'AND (kind = ? OR (? IS NOT NULL AND holder IS NOT ?)) LIMIT 1',
+                (_ts(end), _ts(start), BOOKING, reservation_id, reservation_id)
+            ).fetchone()
+            if conflict:
+                return None
+            return self._conn.execute(
+                'INSERT INTO slot_locks (holder, kind, start_ts, end_ts, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (reservation_id or f"booking:{uuid.uuid4().hex}", BOOKING, _ts(start), _ts(end), now + self.booking_ttl)
+            ).lastrowid
+
+        return self._transaction(acquire)
+
+    def release(self, lock_id: int):
+        self._transaction(lambda now: self._conn.execute('DELETE FROM slot_locks WHERE id = ?', (lock_id,)))
+
+    def release_offers(self, reservation_id: str):
+        """Let go of the slots offered under reservation_id (its booking lock, if any, stays)."""
+        self._transaction(lambda now: self._conn.execute(
+            'DELETE FROM slot_locks WHERE holder = ? AND kind = ?', (reservation_id, OFFER)
+        ))
+
+    # --- Idempotency keys ---
+
+    def begin_request(self, key: str, request_hash: str) -> Tuple[str, Optional[Tuple[dict, int]]]:
+        """
+        Claim an Idempotency-Key. Returns (NEW, None) if this request should run, (REPLAY, (body,
+        status)) if it already completed, IN_PROGRESS if it is running elsewhere, or MISMATCH if the
+        key was used for a different request body.
+        """
+        def begin(now):
+            self._conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+            row = self._conn.execute(
+                'SELECT request_hash, status_code, response FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    'INSERT INTO idempotency_keys (key, request_hash, expires_at) VALUES (?, ?, ?)',
+                    (key, request_hash, now + self.in_progress_ttl)
+                )
+                return NEW, None
+            stored_hash, status_code, response = row
+            if stored_hash != request_hash:
+                return MISMATCH, None
+            if status_code is None:
+                return IN_PROGRESS, None
+            return REPLAY, (json.loads(response), status_code)
+
+        return self._transaction(begin)
+
+    def finish_request(self, key: str, body: dict, status_code: int):
+        """Store the response to replay for retries with the same key."""
+        self._transaction(lambda now: self._conn.execute(
+            'UPDATE idempotency_keys SET status_code = ?, response = ?, expires_at = ? WHERE key = ?',
+            (status_code, json.dumps(body), now + self.idempotency_ttl, key)
+        ))
+
+    def abandon_request(self, key: str):
+        """Forget a claimed key whose request failed in a way worth retrying."""
+        self._transaction(lambda now: self._conn.execute('DELETE FROM idempotency_keys WHERE key = ?', (key,)))
+
+
+def create_slot_lock_table() -> SlotLockTable:
+    return SlotLockTable(
+        config.SLOT_LOCK_DB_PATH,
+        offer_ttl=config.SLOT_HOLD_TTL_SECONDS,
+        booking_ttl=config.BOOKING_LOCK_TTL_SECONDS,
+        idempotency_ttl=config.IDEMPOTENCY_TTL_SECONDS,
+        max_offers=config.SLOT_HOLD_MAX_PER_RESERVATION,
+    )
@@ -0,0 +1,33 @@
+"""
+Opening the app's local SQLite databases.
+
+The stores open their database on first use, not at import, and a path that cannot be opened
+(the read-only filesystem of a serverless host, a missing directory) falls back to an in-memory
+database, so the app still starts; what it records then lasts only as long as the process.
+"""
+import logging
+import sqlite3
+from typing import Iterable
+
+
+def open_database(path: str, schema: str, pragmas: Iterable[str] = (), **connect_args) -> sqlite3.Connection:
+    """Connect to `path` (or to memory if that fails), apply the pragmas and create the schema."""
+    try:
+        return _connect(path, schema, pragmas, **connect_args)
+    except sqlite3.Error as e:
+        if path == ':memory:':
+            raise
+        logging.warning(f"Cannot open SQLite database {path} ({e}); keeping its data in memory for this process only")
+        return _connect(':memory:', schema, pragmas, **connect_args)
+
+
+def _connect(path: str, schema: str, pragmas: Iterable[str], **connect_args) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, **connect_args)
+    try:
+        for pragma in pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        conn.executescript(schema)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
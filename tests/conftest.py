@@ -0,0 +1,11 @@
+# Patch before anything else is imported, as api.py does, so every test runs under green I/O
+import eventlet
+eventlet.monkey_patch()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+
+# The app's modules live at the repository root and read their configuration at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CALL_STORE_DB_PATH', ':memory:')
+os.environ.setdefault('SLOT_LOCK_DB_PATH', ':memory:')
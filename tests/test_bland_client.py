@@ -0,0 +1,32 @@
+import time
+
+import requests
+
+from benchmarks.fakes import FakeBlandServer
+from bland_client import BlandAIClient, CircuitBreaker
+
+
+def test_requests_reuse_one_pooled_connection():
+    with FakeBlandServer() as server:
+        client = BlandAIClient(api_key='test-key', base_url=server.base_url)
+        for _ in range(20):
+            assert client.get_call('call-1')
+        assert server.connections == 1
+
+
+def test_half_open_trial_ends_whatever_the_request_raises():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    client = BlandAIClient(api_key='test-key', base_url='http://127.0.0.1:9', max_retries=0, breaker=breaker)
+
+    def redirect_loop(*args, **kwargs):
+        raise requests.exceptions.TooManyRedirects('redirect loop')
+
+    client.session.request = redirect_loop
+    for _ in range(2):
+        time.sleep(0.02)
+        try:
+            client.get_call('call-1')
+        except requests.exceptions.TooManyRedirects:
+            pass
+        assert breaker.state == 'open'
+        assert not breaker._trial_in_flight
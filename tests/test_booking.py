@@ -0,0 +1,67 @@
+import datetime
+
+import pytest
+
+import api
+from benchmarks.fakes import FakeCalendarApi, install_fake_calendar
+from slot_locks import SlotLockTable
+
+
+@pytest.fixture
+def client(monkeypatch):
+    install_fake_calendar(FakeCalendarApi([]))
+    monkeypatch.setattr(api, 'slot_locks', SlotLockTable(':memory:'))
+    return api.app.test_client()
+
+
+def offer(client, **extra):
+    start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time(0))
+    response = client.post('/calendar/v3/freeBusy', json={
+        'timeMin': start.isoformat(), 'timeMax': (start + datetime.timedelta(days=1)).isoformat(),
+        'timeZone': 'UTC', **extra,
+    })
+    assert response.status_code == 200
+    return response.json
+
+
+def book(client, slot, **extra):
+    return client.post('/calendar/v3/events', json={
+        'start': slot['start'], 'end': slot['end'], 'timeZone': 'UTC', 'summary': 'Intro', **extra,
+    })
+
+
+def test_booking_an_offered_slot_without_a_reservation(client):
+    offered = offer(client)
+    assert offered['reservation_id']
+    response = book(client, offered['free_slots'][0])
+    assert response.status_code == 200, response.json
+
+
+def test_booking_another_callers_held_slot_under_a_reservation(client):
+    first = offer(client)
+    second = offer(client)
+    slot = first['free_slots'][0]
+    assert slot not in second['free_slots']
+    assert book(client, slot, reservation_id=second['reservation_id']).status_code == 409
+    assert book(client, slot, reservation_id=first['reservation_id']).status_code == 200
+
+
+def test_booking_rejects_an_unknown_reservation_id(client):
+    slot = offer(client)['free_slots'][0]
+    assert book(client, slot, reservation_id='not-one-of-ours').status_code == 400
+
+
+def test_idempotency_key_is_freed_when_booking_raises(client, monkeypatch):
+    slot = offer(client)['free_slots'][0]
+    request = {'start': slot['start'], 'end': slot['end'], 'timeZone': 'UTC'}
+    headers = {'Idempotency-Key': 'retry-me'}
+    book_requested_slot = api.book_requested_slot
+
+    def fail(data):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(api, 'book_requested_slot', fail)
+    assert client.post('/calendar/v3/events', json=request, headers=headers).status_code == 500
+    monkeypatch.setattr(api, 'book_requested_slot', book_requested_slot)
+    response = client.post('/calendar/v3/events', json=request, headers=headers)
+    assert response.status_code == 200, response.json
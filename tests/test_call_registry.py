@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from call_registry import RedisCallRegistry
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def registry():
+    return RedisCallRegistry(fakeredis.FakeRedis(decode_responses=True), ttl=60)
+
+
+def test_record_creates_and_merges_fields(registry):
+    created = registry.record('c1', twilio_call_sid='CA1', status='queued', from_number=None)
+    assert created['call_id'] == 'c1'
+    assert created['twilio_call_sid'] == 'CA1'
+    assert 'from_number' not in created
+    assert created['created_at'] == created['last_seen']
+
+    updated = registry.record('c1', status='in-progress')
+    assert updated['twilio_call_sid'] == 'CA1'
+    assert updated['status'] == 'in-progress'
+    assert updated['created_at'] == created['created_at']
+    assert updated['last_seen'] >= created['last_seen']
+    assert registry.get('c1') == updated
+
+
+def test_remove(registry):
+    registry.record('c1', status='in-progress')
+    registry.remove('c1')
+    assert registry.get('c1') is None
+    assert registry.list_active() == []
+    registry.remove('c1')
+
+
+def test_list_active_skips_terminal_calls_newest_first(registry):
+    registry.record('old', status='in-progress')
+    registry.record('done', status='completed')
+    registry.record('new', status='queued')
+    assert [call['call_id'] for call in registry.list_active()] == ['new', 'old']
+
+
+def test_calls_expire_after_ttl(registry):
+    registry.ttl = 1
+    registry.record('c1', status='in-progress')
+    assert registry.client.ttl(registry._key('c1')) == 1
+    time.sleep(1.1)
+    assert registry.get('c1') is None
+    assert registry.list_active() == []
+    registry.record('c2', status='in-progress')
+    assert registry.client.zrange(registry.index_key, 0, -1) == ['c2']
@@ -0,0 +1,53 @@
+import datetime
+import sqlite3
+
+from call_store import CallStore
+
+
+def make_store(**kwargs):
+    return CallStore(':memory:', batch_size=100, flush_interval=60, **kwargs)
+
+
+def test_non_scalar_fields_are_stored_as_json():
+    store = make_store()
+    store.record_call_event({'call_id': 'c1', 'sid': {'nested': 1}, 'from': {'bad': 'number'}, 'status': 'queued'})
+    call, = store.recent_calls(10)
+    assert call['twilio_call_sid'] == '{"nested": 1}'
+    assert call['from_number'] is None
+
+
+def test_a_bad_row_is_dropped_without_blocking_later_writes():
+    store = make_store()
+    store.record_call_event({'call_id': 'c1', 'status': 'queued'})
+    store._write('INSERT INTO bookings (outcome) VALUES (?, ?)', ('booked', 'extra'))
+    store.record_call_event({'call_id': 'c2', 'status': 'queued'})
+    assert {call['call_id'] for call in store.recent_calls(10)} == {'c1', 'c2'}
+    assert store._pending == []
+    start = datetime.datetime(2024, 1, 1, 9, tzinfo=datetime.timezone.utc)
+    store.record_booking('booked', '+15550100000', summary='Intro', start_time=start, end_time=start)
+    assert [day['day'] for day in store.bookings_per_day('2024-01-01', '2024-01-01')] == ['2024-01-01']
+
+
+def test_writes_wait_while_the_database_is_unavailable():
+    store = make_store(max_pending=3)
+    store.recent_calls(10)
+    real = store._connection
+
+    class Unavailable:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, *args):
+            raise sqlite3.OperationalError('database is locked')
+
+    store._connection = Unavailable()
+    for index in range(5):
+        store.record_call_event({'status': f's{index}'})
+    store.flush()
+    assert [params[2] for _, params in store._pending] == ['s2', 's3', 's4']
+    store._connection = real
+    store.flush()
+    assert store._pending == []
@@ -0,0 +1,9 @@
+from benchmarks.run import COLD_START_BUDGET_MS, LAZY_MODULES, bench_cold_start
+
+
+def test_cold_start_stays_within_budget_and_lazy():
+    # Fresh interpreters importing the app and answering one webhook, as on a serverless cold start
+    result, = bench_cold_start(quick=True)
+    assert result['total'] <= COLD_START_BUDGET_MS
+    assert not set(result['eager_modules']) & set(LAZY_MODULES), result['eager_modules']
+    assert result['files_created_by_import'] == []
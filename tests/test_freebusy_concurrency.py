@@ -0,0 +1,37 @@
+import datetime
+import time
+
+import eventlet
+
+import api
+import google_calendar
+from benchmarks.fakes import FakeGoogleServer, install_http_calendar
+
+LATENCY = 0.2
+REQUESTS = 10
+
+
+def test_concurrent_freebusy_requests_overlap_upstream(monkeypatch):
+    monkeypatch.setattr(google_calendar, '_calendar_service_instance', google_calendar._calendar_service_instance)
+    client = api.app.test_client()
+    start = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time(0))
+    payload = {
+        'timeMin': start.isoformat(),
+        'timeMax': (start + datetime.timedelta(days=1)).isoformat(),
+        'timeZone': 'UTC',
+        'calendar_ids': ['team-a@example.com', 'team-b@example.com'],
+    }
+
+    def request(_):
+        return client.post('/calendar/v3/freeBusy', json=payload).status_code
+
+    with FakeGoogleServer(latency=LATENCY) as server:
+        install_http_calendar(server.base_url)
+        started = time.perf_counter()
+        statuses = list(eventlet.GreenPool(REQUESTS).imap(request, range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+
+    assert statuses == [200] * REQUESTS
+    assert server.max_in_flight > 1
+    # One after another this would take REQUESTS * LATENCY (2 s); overlapped it is a round trip or two
+    assert elapsed < REQUESTS * LATENCY / 2
@@ -0,0 +1,85 @@
+import datetime
+import zoneinfo
+
+from slot_engine import BusyLookup, free_gaps, iter_free_slots, merge_intervals, working_windows
+
+UTC = datetime.timezone.utc
+NEW_YORK = zoneinfo.ZoneInfo('America/New_York')
+HOUR = datetime.timedelta(hours=1)
+
+
+def at(hour, minute=0, day=1):
+    return datetime.datetime(2024, 1, day, hour, minute, tzinfo=UTC)
+
+
+def local_day(date):
+    start = datetime.datetime.combine(date, datetime.time(0), tzinfo=NEW_YORK)
+    return start, datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time(0), tzinfo=NEW_YORK)
+
+
+def test_merge_intervals_coalesces_overlapping_and_touching():
+    intervals = [(at(11), at(12)), (at(9), at(10)), (at(10), at(10, 30)), (at(9, 15), at(9, 45)), (at(13), at(14))]
+    assert list(merge_intervals(intervals)) == [(at(9), at(10, 30)), (at(11), at(12)), (at(13), at(14))]
+
+
+def test_merge_intervals_empty():
+    assert list(merge_intervals([])) == []
+
+
+def test_free_gaps_busy_touching_window_edges_leaves_no_gap():
+    windows = [(at(9), at(12))]
+    assert list(free_gaps(windows, [(at(8), at(9)), (at(9), at(10)), (at(12), at(13))])) == [(at(10), at(12))]
+    assert list(free_gaps(windows, [(at(9), at(12))])) == []
+
+
+def test_free_gaps_busy_spanning_windows():
+    windows = [(at(9), at(12)), (at(9, day=2), at(12, day=2))]
+    busy = [(at(11), at(10, day=2))]
+    assert list(free_gaps(windows, busy)) == [(at(9), at(11)), (at(10, day=2), at(12, day=2))]
+
+
+def test_free_gaps_empty_windows_or_busy():
+    assert list(free_gaps([], [(at(9), at(10))])) == []
+    assert list(free_gaps([(at(9), at(10))], [])) == [(at(9), at(10))]
+    assert list(working_windows(at(10), at(10), 9, 17)) == []
+    assert list(iter_free_slots(at(10), at(10), [], HOUR)) == []
+
+
+def test_slots_on_the_day_dst_starts_skip_the_missing_hour():
+    slots = list(iter_free_slots(*local_day(datetime.date(2024, 3, 10)), [], HOUR))
+    assert len(slots) == 23
+    assert [start.hour for start, _ in slots[:3]] == [0, 1, 3]
+    assert all(end - start == HOUR for start, end in ((s.astimezone(UTC), e.astimezone(UTC)) for s, e in slots))
+
+
+def test_slots_on_the_day_dst_ends_include_the_repeated_hour():
+    slots = list(iter_free_slots(*local_day(datetime.date(2024, 11, 3)), [], HOUR, step=HOUR))
+    assert len(slots) == 25
+    assert [(start.hour, start.utcoffset()) for start, _ in slots[1:3]] == [
+        (1, datetime.timedelta(hours=-4)), (1, datetime.timedelta(hours=-5)),
+    ]
+
+
+def test_working_windows_follow_local_hours_across_dst():
+    day = datetime.date(2024, 3, 10)
+    (start, end), = working_windows(*local_day(day), 9, 17)
+    assert (start.astimezone(UTC), end.astimezone(UTC)) == (
+        datetime.datetime(2024, 3, 10, 13, tzinfo=UTC), datetime.datetime(2024, 3, 10, 21, tzinfo=UTC),
+    )
+
+
+def test_busy_lookup_touching_intervals_are_free():
+    lookup = BusyLookup([(at(9), at(10)), (at(12), at(13))])
+    assert lookup.is_free(at(10), at(12))
+    assert lookup.is_free(at(8), at(9))
+    assert lookup.is_free(at(13), at(14))
+    assert not lookup.is_free(at(9, 59), at(10, 30))
+    assert not lookup.is_free(at(11), at(12, 1))
+    assert not lookup.is_free(at(8), at(14))
+    assert list(lookup.after(at(10))) == [(at(12), at(13))]
+
+
+def test_busy_lookup_empty():
+    lookup = BusyLookup([])
+    assert lookup.is_free(at(9), at(10))
+    assert list(lookup.after(at(9))) == []
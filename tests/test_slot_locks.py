@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from slot_locks import IN_PROGRESS, MISMATCH, NEW, REPLAY, SlotLockTable, is_reservation_id
+
+UTC = datetime.timezone.utc
+
+
+def at(hour, minute=0):
+    return datetime.datetime(2024, 1, 1, hour, minute, tzinfo=UTC)
+
+
+@pytest.fixture
+def table():
+    return SlotLockTable(':memory:')
+
+
+def test_booking_conflicts_with_another_holders_offer(table):
+    reservation_id, _ = table.hold_offers([(at(9), at(10))])
+    assert is_reservation_id(reservation_id)
+    assert table.acquire_booking(at(9, 30), at(10, 30), reservation_id='f' * 32) is None
+    assert table.acquire_booking(at(10), at(11), reservation_id='f' * 32) is not None
+
+
+def test_booking_without_a_reservation_ignores_offer_holds(table):
+    table.hold_offers([(at(9), at(10))])
+    assert table.acquire_booking(at(9), at(10)) is not None
+    assert table.acquire_booking(at(9), at(10)) is None
+
+
+def test_booking_may_take_own_offer_but_not_anothers_booking(table):
+    reservation_id, _ = table.hold_offers([(at(9), at(10))])
+    lock_id = table.acquire_booking(at(9), at(10), reservation_id=reservation_id)
+    assert lock_id is not None
+    assert table.acquire_booking(at(9), at(10), reservation_id=reservation_id) is None
+    table.release(lock_id)
+    assert table.acquire_booking(at(9), at(10), reservation_id=reservation_id) is not None
+
+
+def test_expired_holds_do_not_conflict():
+    table = SlotLockTable(':memory:', offer_ttl=0, booking_ttl=0)
+    table.hold_offers([(at(9), at(10))])
+    assert table.held_intervals(at(0), at(23)) == []
+    assert table.acquire_booking(at(9), at(10)) is not None
+    assert table.acquire_booking(at(9), at(10)) is not None
+
+
+def test_held_intervals_leave_out_the_callers_own_offers(table):
+    mine, _ = table.hold_offers([(at(9), at(10))])
+    table.hold_offers([(at(11), at(12))])
+    assert table.held_intervals(at(0), at(23)) == [(at(9), at(10)), (at(11), at(12))]
+    assert table.held_intervals(at(0), at(23), reservation_id=mine) == [(at(11), at(12))]
+    table.hold_offers([(at(13), at(14))], reservation_id=mine)
+    assert table.held_intervals(at(0), at(23)) == [(at(11), at(12)), (at(13), at(14))]
+
+
+def test_idempotency_key_states(table):
+    assert table.begin_request('key', 'hash') == (NEW, None)
+    assert table.begin_request('key', 'hash') == (IN_PROGRESS, None)
+    assert table.begin_request('key', 'other') == (MISMATCH, None)
+    table.finish_request('key', {'id': 'e1'}, 200)
+    assert table.begin_request('key', 'hash') == (REPLAY, ({'id': 'e1'}, 200))
+    assert table.begin_request('key', 'other') == (MISMATCH, None)
+
+
+def test_abandoned_or_expired_idempotency_key_runs_again():
+    table = SlotLockTable(':memory:', in_progress_ttl=0)
+    assert table.begin_request('key', 'hash') == (NEW, None)
+    assert table.begin_request('key', 'hash') == (NEW, None)
+    table = SlotLockTable(':memory:')
+    table.begin_request('key', 'hash')
+    table.abandon_request('key')
+    assert table.begin_request('key', 'hash') == (NEW, None)
@@ -0,0 +1,62 @@
+from transcript_store import TranscriptStore
+
+
+def line(user, text):
+    return {'user': user, 'text': text}
+
+
+def test_single_lines_are_appended_with_increasing_offsets():
+    store = TranscriptStore()
+    first = store.apply_event({'call_id': 'c1', 'user': 'assistant', 'text': 'Hi'})
+    second = store.apply_event({'call_id': 'c1', 'user': 'user', 'text': 'Hello'})
+    assert (first['offset'], first['lines'], first['seq']) == (0, [line('assistant', 'Hi')], 1)
+    assert (second['offset'], second['lines'], second['seq']) == (1, [line('user', 'Hello')], 2)
+
+
+def test_full_transcripts_only_send_the_new_tail():
+    store = TranscriptStore()
+    store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi')]})
+    delta = store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi'), line('user', 'Hello')]})
+    assert (delta['offset'], delta['lines']) == (1, [line('user', 'Hello')])
+    assert store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi'), line('user', 'Hello')]}) is None
+
+
+def test_status_change_without_lines_is_a_delta():
+    store = TranscriptStore()
+    store.apply_event({'call_id': 'c1', 'text': 'Hi', 'user': 'assistant'})
+    delta = store.apply_event({'call_id': 'c1', 'status': 'completed'})
+    assert (delta['offset'], delta['lines'], delta['status']) == (1, [], 'completed')
+    assert store.apply_event({'call_id': 'c1', 'status': 'completed'}) is None
+
+
+def test_snapshot_and_eviction():
+    store = TranscriptStore(max_calls=1)
+    store.apply_event({'call_id': 'c1', 'text': 'Hi', 'user': 'assistant'})
+    assert store.snapshot('c1')['lines'] == [line('assistant', 'Hi')]
+    store.apply_event({'call_id': 'c2', 'text': 'Hi', 'user': 'assistant'})
+    assert store.snapshot('c1') == {'call_id': 'c1', 'seq': 0, 'offset': 0, 'lines': [], 'replace': True, 'status': None}
+
+
+def test_full_transcript_replaces_lines_from_the_first_difference():
+    store = TranscriptStore()
+    store.apply_event({'call_id': 'c1', 'user': 'assistant', 'text': 'Hi'})
+    store.apply_event({'call_id': 'c1', 'user': 'user', 'text': 'Helo'})
+    delta = store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi'), line('user', 'Hello')]})
+    assert (delta['offset'], delta['lines'], delta['replace']) == (1, [line('user', 'Hello')], True)
+    assert store.snapshot('c1')['lines'] == [line('assistant', 'Hi'), line('user', 'Hello')]
+
+
+def test_shorter_full_transcript_truncates():
+    store = TranscriptStore()
+    store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi'), line('user', 'Hello')]})
+    delta = store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi')]})
+    assert (delta['offset'], delta['lines'], delta['replace']) == (1, [], True)
+    assert store.snapshot('c1')['lines'] == [line('assistant', 'Hi')]
+
+
+def test_single_lines_are_ignored_once_a_full_transcript_arrived():
+    store = TranscriptStore()
+    store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi')]})
+    assert store.apply_event({'call_id': 'c1', 'user': 'user', 'text': 'Hello'}) is None
+    delta = store.apply_event({'call_id': 'c1', 'transcripts': [line('assistant', 'Hi'), line('user', 'Hello')]})
+    assert (delta['offset'], delta['lines'], delta['replace']) == (1, [line('user', 'Hello')], False)
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from webhook_queue import DUPLICATE, FULL, QUEUED, WebhookQueue
+
+
+def payload(**data):
+    return data, json.dumps(data).encode()
+
+
+@pytest.fixture
+def webhooks():
+    # No workers, so queued payloads stay put
+    return WebhookQueue(handler=lambda data: None, maxsize=2, start_worker=lambda target: None)
+
+
+def test_retried_delivery_is_a_duplicate(webhooks):
+    assert webhooks.enqueue(*payload(call_id='c1', status='completed')) == QUEUED
+    assert webhooks.enqueue(*payload(call_id='c1', status='completed')) == DUPLICATE
+    assert webhooks.stats()['duplicates'] == 1
+    assert webhooks.stats()['depth'] == 1
+
+
+def test_different_events_are_not_duplicates(webhooks):
+    assert webhooks.enqueue(*payload(call_id='c1', status='in-progress')) == QUEUED
+    assert webhooks.enqueue(*payload(call_id='c1', status='completed')) == QUEUED
+
+
+def test_duplicates_are_forgotten_after_the_ttl():
+    webhooks = WebhookQueue(handler=lambda data: None, dedup_ttl=0, start_worker=lambda target: None)
+    assert webhooks.enqueue(*payload(call_id='c1', status='completed')) == QUEUED
+    assert webhooks.enqueue(*payload(call_id='c1', status='completed')) == QUEUED
+
+
+def test_rejected_delivery_is_not_remembered(webhooks):
+    webhooks.enqueue(*payload(call_id='c1', text='a'))
+    webhooks.enqueue(*payload(call_id='c1', text='b'))
+    assert webhooks.enqueue(*payload(call_id='c1', text='c')) == FULL
+    webhooks._queue.get_nowait()
+    assert webhooks.enqueue(*payload(call_id='c1', text='c')) == QUEUED
@@ -0,0 +1,98 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import metrics
+from call_registry import TERMINAL_STATUSES
+
+
+class CachedCall:
+    def __init__(self, data: dict, etag: str, last_modified: datetime.datetime, fetched_at: float, final: bool):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.final = final
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[CachedCall] = None
+        self.error: Optional[BaseException] = None
+
+
+class TranscriptCache:
+    """
+    Cache in front of Bland AI's GET /v1/calls/{id}.
+
+    Finished calls never change, so they are kept until evicted by the `max_entries` LRU bound;
+    calls still in progress are refetched once older than `ttl`. Concurrent misses for the same
+    call_id share a single upstream fetch. Each entry carries an ETag and the time its content last
+    changed, for conditional GETs.
+    """
+
+    def __init__(self, fetch: Callable[[str], dict], ttl: float = 2.0, max_entries: int = 2000):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CachedCall]' = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_final(data: dict) -> bool:
+        return data.get('completed') is True or data.get('status') in TERMINAL_STATUSES
+
+    def _usable(self, entry: Optional[CachedCall]) -> bool:
+        return entry is not None and (entry.final or time.monotonic() - entry.fetched_at < self.ttl)
+
+    def get(self, call_id: str) -> CachedCall:
+        with self._lock:
+            entry = self._entries.get(call_id)
+            if self._usable(entry):
+                self._entries.move_to_end(call_id)
+                metrics.cache_requests.inc(cache='transcript', result='hit')
+                return entry
+            in_flight = self._in_flight.get(call_id)
+            leader = in_flight is None
+            if leader:
+                in_flight = self._in_flight[call_id] = _InFlight()
+
+        metrics.cache_requests.inc(cache='transcript', result='miss' if leader else 'coalesced')
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = self._refresh(call_id, entry)
+            return in_flight.result
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(call_id, None)
+            in_flight.done.set()
+
+    def _refresh(self, call_id: str, previous: Optional[CachedCall]) -> CachedCall:
+        data = self.fetch(call_id)
+        body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        if previous is not None and previous.etag == etag:
+            last_modified = previous.last_modified
+        else:
+            last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        entry = CachedCall(data, etag, last_modified, time.monotonic(), self.is_final(data))
+        with self._lock:
+            self._entries[call_id] = entry
+            self._entries.move_to_end(call_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class TranscriptStore:
+    """
+    Per-call transcript kept from webhook events, so Socket.IO subscribers get a snapshot when they
+    join a call's room and only the new lines afterwards.
+
+    Webhooks may carry a single line (`user`/`text`) or the whole transcript so far (`transcripts`);
+    either way `apply_event` returns just the lines this process has not seen yet. Once a call has
+    sent a full list, that list is the transcript: single lines are then ignored (the next list
+    carries them), and a list that differs from what is stored, not just extends it, replaces the
+    stored lines from the first difference on (the delta's `replace` flag). Only the most recently
+    updated `max_calls` calls are kept.
+    """
+
+    def __init__(self, max_calls: int = 1000):
+        self.max_calls = max_calls
+        self._calls: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _line(entry: dict) -> dict:
+        return {'user': entry.get('user'), 'text': entry.get('text')}
+
+    def apply_event(self, data: dict) -> Optional[dict]:
+        """Fold a webhook payload into the call's transcript; returns the delta message, or None if nothing changed."""
+        call_id = data.get('call_id')
+        if not call_id:
+            return None
+        with self._lock:
+            call = self._calls.pop(call_id, None) or {'lines': [], 'status': None, 'seq': 0, 'authoritative': False}
+            self._calls[call_id] = call
+            while len(self._calls) > self.max_calls:
+                self._calls.popitem(last=False)
+
+            lines = call['lines']
+            offset, new_lines, replace = len(lines), [], False
+            if isinstance(data.get('transcripts'), list):
+                transcript = [self._line(entry) for entry in data['transcripts']]
+                call['authoritative'] = True
+                offset = self._common_prefix(lines, transcript)
+                new_lines, replace = transcript[offset:], offset < len(lines)
+            elif data.get('text') and not call['authoritative']:
+                new_lines = [self._line(data)]
+            status = data.get('status')
+            status_changed = status is not None and status != call['status']
+            if not new_lines and not replace and not status_changed:
+                return None
+
+            lines[offset:] = new_lines
+            if status is not None:
+                call['status'] = status
+            call['seq'] += 1
+            return {
+                'call_id': call_id,
+                'seq': call['seq'],
+                'offset': offset,
+                'lines': new_lines,
+                'replace': replace,
+                'status': call['status'],
+            }
+
+    @staticmethod
+    def _common_prefix(lines: List[dict], transcript: List[dict]) -> int:
+        count = 0
+        for stored, line in zip(lines, transcript):
+            if stored != line:
+                break
+            count += 1
+        return count
+
+    def snapshot(self, call_id: str) -> dict:
+        with self._lock:
+            call = self._calls.get(call_id) or {'lines': [], 'status': None, 'seq': 0}
+            return {
+                'call_id': call_id,
+                'seq': call['seq'],
+                'offset': 0,
+                'lines': list(call['lines']),
+                'replace': True,
+                'status': call['status'],
+            }
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import metrics
+
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+FULL = 'full'
+
+
+class WebhookQueue:
+    """
+    Bounded hand-off between the webhook route and background workers.
+
+    The route only verifies the signature and calls `enqueue`, so Bland AI gets its 200 right away;
+    `workers` background tasks pull payloads off the queue and run `handler` on them. A retried
+    delivery of the same event (same call_id, event type and body) within `dedup_ttl` seconds is
+    dropped, and when the queue is full `enqueue` reports FULL so the route can push back.
+    """
+
+    def __init__(self, handler: Callable[[dict], None], maxsize: int = 1000, workers: int = 2,
+                 dedup_ttl: float = 600.0, dedup_max_entries: int = 10000,
+                 start_worker: Optional[Callable] = None, create_queue: Optional[Callable] = None):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self.dedup_ttl = dedup_ttl
+        self.dedup_max_entries = dedup_max_entries
+        # Default to a daemon thread and queue.Queue; api.py passes the Socket.IO server's own
+        # factories so that under eventlet the workers are greenlets blocking on a green queue.
+        self._start_worker = start_worker or self._start_thread
+        self._create_queue = create_queue or queue.Queue
+        self._queue = None
+        self._seen: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'duplicates': 0,
+            'rejected_full': 0,
+            'high_water_mark': 0,
+        }
+        self._last_lag = 0.0
+
+    @staticmethod
+    def _start_thread(target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        with self._lock:
+            if self._queue is not None:
+                return
+            self._queue = self._create_queue(maxsize=self.maxsize)
+            for _ in range(self.workers):
+                self._start_worker(self._work)
+
+    @staticmethod
+    def dedup_key(data: dict, raw_body: bytes) -> str:
+        event = data.get('event') or data.get('status') or ''
+        return f"{data.get('call_id')}:{event}:{hashlib.sha256(raw_body).hexdigest()}"
+
+    def _is_duplicate(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                seen_at = next(iter(self._seen.values()))
+                if now - seen_at < self.dedup_ttl and len(self._seen) < self.dedup_max_entries:
+                    break
+                self._seen.popitem(last=False)
+            if key in self._seen:
+                return True
+            self._seen[key] = now
+            return False
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def enqueue(self, data: dict, raw_body: bytes) -> str:
+        """Queue a verified payload; returns QUEUED, DUPLICATE or FULL."""
+        self._ensure_started()
+        key = self.dedup_key(data, raw_body)
+        if self._is_duplicate(key):
+            self._stats['duplicates'] += 1
+            return DUPLICATE
+        try:
+            self._queue.put_nowait((time.monotonic(), data))
+        except queue.Full:
+            # Not processed, so a retry from Bland AI must not be treated as a duplicate.
+            self._forget(key)
+            self._stats['rejected_full'] += 1
+            return FULL
+        self._stats['enqueued'] += 1
+        depth = self._queue.qsize()
+        if depth > self._stats['high_water_mark']:
+            self._stats['high_water_mark'] = depth
+        return QUEUED
+
+    def _work(self):
+        while True:
+            enqueued_at, data = self._queue.get()
+            self._last_lag = time.monotonic() - enqueued_at
+            try:
+                self.handler(data)
+                self._stats['processed'] += 1
+            except Exception as e:
+                self._stats['failed'] += 1
+                metrics.errors.inc(source='webhook', type=type(e).__name__)
+                logging.exception(f"Failed to process webhook event for call_id {data.get('call_id')}")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return dict(
+            self._stats,
+            depth=self._queue.qsize() if self._queue is not None else 0,
+            maxsize=self.maxsize,
+            workers=self.workers,
+            last_queue_lag_seconds=round(self._last_lag, 6),
+        )